@@ -21,6 +21,7 @@ class TrainingAdaptiveDataset(Dataset):
         self.__global_id = f"TRAINING_ADAPTIVE: {self.__name}"
         self.__path = os.path.join(config.directories.datasets, 'training-adaptive', self.__name)
         self.__loader_split = None     # Lazy-loaded.
+        self.__sample_ids = None        # Lazy-loaded.
 
         # Check if dataset exists.
         if not os.path.exists(self.__path):
@@ -110,6 +111,14 @@ class TrainingAdaptiveDataset(Dataset):
 
         return group_ids
 
+    def has_sample(
+        self,
+        sample_id: int) -> bool:
+        # Cache sample IDs, as every sample lookup (e.g. per loader item) checks for existence.
+        if self.__sample_ids is None:
+            self.__sample_ids = set(self.list_samples())
+        return sample_id in self.__sample_ids
+
     def list_regions(self) -> List[str]:
         return list(sorted(self.params['regions']))
 
@@ -23,7 +23,7 @@ class TrainingAdaptiveSample:
         self.__spacing = self.__dataset.params['spacing']
 
         # Load sample index.
-        if self.__id not in self.__dataset.list_samples():
+        if not self.__dataset.has_sample(self.__id):
             raise ValueError(f"Sample '{self.__id}' not found for dataset '{self.__dataset}'.")
 
     @property
@@ -49,17 +49,17 @@ class TrainingAdaptiveSample:
     @property
     def fixed_input(self) -> np.ndarray:
         filepath = os.path.join(self.__dataset.path, 'data', 'inputs', f'{self.__id}-1.npz')
-        if not os.path.exists(filepath):
+        if not self.__data_exists(filepath):
             raise ValueError(f"'fixed_input' not found for sample '{self}'. Filepath: '{filepath}'.")
-        input = np.load(filepath)['data']
+        input = self.__load_data(filepath)
         return input
 
     @property
     def moving_input(self) -> np.ndarray:
         filepath = os.path.join(self.__dataset.path, 'data', 'inputs', f'{self.__id}-0.npz')
-        if not os.path.exists(filepath):
+        if not self.__data_exists(filepath):
             raise ValueError(f"'moving_input' not found for sample '{self}'. Filepath: '{filepath}'.")
-        input = np.load(filepath)['data']
+        input = self.__load_data(filepath)
         return input
 
     @property
@@ -72,9 +72,9 @@ class TrainingAdaptiveSample:
 
             # Load the label data.
             filepath = os.path.join(self.__dataset.path, 'data', 'labels', region, f'{self.__id}.npz')
-            if not os.path.exists(filepath):
+            if not self.__data_exists(filepath):
                 raise ValueError(f"Label (region={region}) not found for sample '{self}'. Filepath: '{filepath}'.")
-            region_label = np.load(filepath)['data']
+            region_label = self.__load_data(filepath)
             if label is None:
                 label = np.zeros((n_channels, *region_label.shape), dtype=np.bool_)
             label[i + 1] = region_label
@@ -91,9 +91,9 @@ class TrainingAdaptiveSample:
 
             # Load the label data.
             filepath = os.path.join(self.__dataset.path, 'data', 'inputs', region, f'{self.__id}.npz')
-            if not os.path.exists(filepath):
+            if not self.__data_exists(filepath):
                 raise ValueError(f"Label (region={region}) not found for sample '{self}'. Filepath: '{filepath}'.")
-            region_label = np.load(filepath)['data']
+            region_label = self.__load_data(filepath)
             if label is None:
                 label = np.zeros((n_channels, *region_label.shape), dtype=np.bool_)
             label[i + 1] = region_label
@@ -102,20 +102,25 @@ class TrainingAdaptiveSample:
 
     @property
     def input(self) -> np.ndarray:
+        return self.load_input()
+
+    def load_input(
+        self,
+        dtype: np.dtype = np.float32) -> np.ndarray:
         # Load first 2 channels.
         filepath = os.path.join(self.__dataset.path, 'data', 'inputs', f'{self.__id}-0.npz')
-        if not os.path.exists(filepath):
+        if not self.__data_exists(filepath):
             raise ValueError(f"Input (channel=0) data not found for sample '{self}'. Filepath: '{filepath}'.")
-        input_0 = np.load(filepath)['data']
+        input_0 = self.__load_data(filepath)
         filepath = os.path.join(self.__dataset.path, 'data', 'inputs', f'{self.__id}-1.npz')
-        if not os.path.exists(filepath):
+        if not self.__data_exists(filepath):
             raise ValueError(f"Input (channel=1) data not found for sample '{self}'. Filepath: '{filepath}'.")
-        input_1 = np.load(filepath)['data']
+        input_1 = self.__load_data(filepath)
         
         # Create input holder.
         all_regions = self.__dataset.list_regions()
         n_channels = len(all_regions) + 2
-        input = np.zeros((n_channels, *input_0.shape), dtype=np.float32)
+        input = np.zeros((n_channels, *input_0.shape), dtype=dtype)
         input[0] = input_0
         input[1] = input_1
 
@@ -127,9 +132,9 @@ class TrainingAdaptiveSample:
 
             # Load channel data.
             filepath = os.path.join(folderpath, region, f'{self.__id}.npz')
-            if not os.path.exists(filepath):
+            if not self.__data_exists(filepath):
                 raise ValueError(f"Input (region={region}) data not found for sample '{self}'. Filepath: '{filepath}'.")
-            input_region = np.load(filepath)['data']
+            input_region = self.__load_data(filepath)
             input[i + 2] = input_region
 
         return input
@@ -202,9 +207,9 @@ class TrainingAdaptiveSample:
 
             # Load the label data.
             filepath = os.path.join(self.__dataset.path, 'data', 'labels', region, f'{self.__id}.npz')
-            if not os.path.exists(filepath):
+            if not self.__data_exists(filepath):
                 raise ValueError(f"Label (region={region}) not found for sample '{self}'. Filepath: '{filepath}'.")
-            region_label = np.load(filepath)['data']
+            region_label = self.__load_data(filepath)
             if label is None:
                 label = np.zeros((n_channels, *region_label.shape), dtype=np.bool_)
             label[i + 1] = region_label
@@ -215,6 +220,26 @@ class TrainingAdaptiveSample:
     def pair(self) -> Tuple[np.ndarray, np.ndarray]:
         return self.input, self.label
 
+    def __data_exists(
+        self,
+        filepath: str) -> bool:
+        return os.path.exists(self.__npy_filepath(filepath)) or os.path.exists(filepath)
+
+    def __load_data(
+        self,
+        filepath: str) -> np.ndarray:
+        # Uncompressed '.npy' files are memory-mapped (copy-on-write, so callers can still modify
+        # them), so data is paged in as it's used rather than decompressed into a temporary array.
+        npy_filepath = self.__npy_filepath(filepath)
+        if os.path.exists(npy_filepath):
+            return np.load(npy_filepath, mmap_mode='c')
+        return np.load(filepath)['data']
+
+    def __npy_filepath(
+        self,
+        filepath: str) -> str:
+        return f'{os.path.splitext(filepath)[0]}.npy'
+
     def __load_index(self) -> None:
         index = self.__dataset.index
         index = index[index['sample-id'] == self.__id]
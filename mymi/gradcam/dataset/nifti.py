@@ -1,3 +1,4 @@
+from concurrent.futures import Future, ThreadPoolExecutor
 import numpy as np
 import os
 import torch
@@ -26,7 +27,8 @@ def create_multi_segmenter_heatmap(
     layer: Union[str, List[str]],
     layer_spacing: Union[ImageSpacing3D, List[ImageSpacing3D]],
     device: torch.device = torch.device('cpu'),
-    **kwargs) -> Union[np.ndarray, List[np.ndarray]]:
+    executor: Optional[ThreadPoolExecutor] = None,
+    **kwargs) -> Optional[List[Future]]:
     model_name = model if isinstance(model, tuple) else model.name
     logging.arg_log('Creating heatmap', ('dataset', 'pat_id', 'model', 'model_region', 'model_spacing', 'target_region', 'layer', 'layer_spacing'), (dataset, pat_id, model_name, model_region, model_spacing, target_region, layer, layer_spacing))
     pat_ids = arg_to_list(pat_id, (int, str), out_type=str)
@@ -49,19 +51,19 @@ def create_multi_segmenter_heatmap(
         model.to(device)
 
     # Get heatmaps.
+    futures = []
     for dataset, pat_id in zip(datasets, pat_ids):
         heatmap = get_multi_segmenter_heatmap(dataset, pat_id, model, model_region, model_spacing, target_region, layer, layer_spacing, device=device, **kwargs)
 
-        # Save heatmaps.
-        layers = arg_to_list(layer, str)
-        heatmaps = arg_to_list(heatmap, np.ndarray)
-        logging.info(f"got {len(heatmap)} heatmaps")
-        for layer, heatmap in zip(layers, heatmaps):
-            logging.info(f"saving heatmap for layer {layer}")
-            filepath = os.path.join(config.directories.heatmaps, dataset, pat_id, *model_name, f'{target_region}-layer-{layer}.npz')
-            logging.info(f"filepath: {filepath}")
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            np.savez_compressed(filepath, data=heatmap)
+        # Save heatmaps. If an executor is passed, compression/writing runs in the background
+        # while the next patient is processed on the device.
+        if executor is not None:
+            futures.append(executor.submit(__save_multi_segmenter_heatmap, dataset, pat_id, model_name, target_region, layer, heatmap))
+        else:
+            __save_multi_segmenter_heatmap(dataset, pat_id, model_name, target_region, layer, heatmap)
+
+    if executor is not None:
+        return futures
 
 def create_multi_segmenter_heatmaps(
     dataset: Union[str, List[str]],
@@ -97,17 +99,25 @@ def create_multi_segmenter_heatmaps(
     # Create test loader.
     _, _, test_loader = MultiLoader.build_loaders(dataset, load_all_samples=load_all_samples, n_folds=n_folds, region=model_region, test_fold=test_fold, use_split_file=use_loader_split_file) 
 
-    # Make predictions.
+    # Make predictions. Heatmaps are saved in a background thread.
     n_pat_count = 0
-    for pat_desc_b in tqdm(iter(test_loader)):
-        if type(pat_desc_b) == torch.Tensor:
-            pat_desc_b = pat_desc_b.tolist()
-        for pat_desc in pat_desc_b:
-            dataset, pat_id = pat_desc.split(':')
-            create_multi_segmenter_heatmap(dataset, pat_id, model, model_region, model_spacing, target_region, layer, layer_spacing, device=device, **kwargs)
-            n_pat_count += 1
-            if n_pats is not None and n_pat_count >= n_pats:
-                return
+    futures = []
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        for pat_desc_b in tqdm(iter(test_loader)):
+            if type(pat_desc_b) == torch.Tensor:
+                pat_desc_b = pat_desc_b.tolist()
+            for pat_desc in pat_desc_b:
+                dataset, pat_id = pat_desc.split(':')
+                futures += create_multi_segmenter_heatmap(dataset, pat_id, model, model_region, model_spacing, target_region, layer, layer_spacing, device=device, executor=executor, **kwargs)
+                n_pat_count += 1
+                if n_pat_count == n_pats:
+                    break
+            if n_pat_count == n_pats:
+                break
+
+    # Raise any saving errors.
+    for f in futures:
+        f.result()
 
 def get_multi_segmenter_heatmap(
     dataset: str,
@@ -175,3 +185,20 @@ def load_multi_segmenter_heatmap(
         return heatmaps[0]
     else:
         return heatmaps
+
+def __save_multi_segmenter_heatmap(
+    dataset: str,
+    pat_id: str,
+    model: ModelName,
+    target_region: str,
+    layer: Union[str, List[str]],
+    heatmap: Union[np.ndarray, List[np.ndarray]]) -> None:
+    layers = arg_to_list(layer, str)
+    heatmaps = arg_to_list(heatmap, np.ndarray)
+    logging.info(f"got {len(heatmaps)} heatmaps")
+    for layer, heatmap in zip(layers, heatmaps):
+        logging.info(f"saving heatmap for layer {layer}")
+        filepath = os.path.join(config.directories.heatmaps, dataset, pat_id, *model, f'{target_region}-layer-{layer}.npz')
+        logging.info(f"filepath: {filepath}")
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        np.savez_compressed(filepath, data=heatmap)
@@ -1,8 +1,8 @@
 import numpy as np
 import os
 import torch
-from torch.nn.functional import one_hot
-from typing import List, Optional, Union
+from torch.nn.functional import grid_sample, one_hot
+from typing import List, Optional, Tuple, Union
 from tqdm import tqdm
 
 from mymi.geometry import get_extent
@@ -10,7 +10,7 @@ from mymi import logging
 from mymi.models import replace_ckpt_alias
 from mymi.models.systems import MultiSegmenter
 from mymi.regions import region_to_list
-from mymi.transforms import centre_crop_3D, centre_pad_3D, crop_3D, pad_3D, resample
+from mymi.transforms import resample
 from mymi.types import ImageSpacing3D, Model, ModelName, PatientRegions
 from mymi.utils import arg_to_list
 
@@ -68,19 +68,20 @@ def get_multi_segmenter_heatmap(
         handle = layer.register_full_backward_hook(get_gradients(layer_name))
         gradient_handles.append(handle)
 
-    # Resample input to model spacing.
-    logging.info('resampling input')
+    # Get input size at model spacing.
     input_size = input.shape
-    input = resample(input, spacing=input_spacing, output_spacing=model_spacing) 
-    input_size_after_resample = input.shape
+    scaling = np.array(input_spacing, dtype=float) / np.array(model_spacing, dtype=float)
+    input_size_after_resample = tuple(int(s * d) for s, d in zip(scaling, input_size))
 
     if use_crop == 'naive':
         # Apply 'naive' cropping.
         logging.info('naive cropping')
         # This value used for MICCAI-2015 multi-segmenter only.
         crop_mm = (250, 400, 500)   # With 60 mm margin (30 mm either end) for each axis.
-        crop = tuple(np.round(np.array(crop_mm) / model_spacing).astype(int))
-        input = centre_crop_3D(input, crop)
+        crop_size = tuple(np.round(np.array(crop_mm) / model_spacing).astype(int))
+        to_crop = np.array(input_size_after_resample) - crop_size
+        crop_min = np.sign(to_crop) * np.ceil(np.abs(to_crop / 2)).astype(int)
+        crop = (crop_min, crop_min + crop_size)
     elif use_crop == 'brain':
         assert brain_label is not None
         # Convert to voxel crop.
@@ -102,25 +103,28 @@ def get_multi_segmenter_heatmap(
             (int(crop_origin[0] - crop_voxels[0] // 2), int(crop_origin[1] - crop_voxels[1] // 2), int(crop_origin[2] - int(crop_voxels[2] * (1 - p_above_brain)))),
             (int(np.ceil(crop_origin[0] + crop_voxels[0] / 2)), int(np.ceil(crop_origin[1] + crop_voxels[1] / 2)), int(crop_origin[2] + int(crop_voxels[2] * p_above_brain)))
         )
-
-        # Crop input.
-        input = crop_3D(input, crop)
     else:
         raise ValueError(f"Unknown 'use_crop' value '{use_crop}'.")
 
+    # Resample input to model spacing within the crop box only, rather than resampling the whole
+    # input and then cropping. Crop box is clipped to the input, as 'crop_3D' would. Resampling
+    # runs on the model's device, so the input is passed straight to the model.
+    logging.info('resampling input')
+    crop = (np.clip(crop[0], 0, None), np.minimum(crop[1], input_size_after_resample))
+    crop_origin_mm = tuple(float(c) for c in crop[0] * np.array(model_spacing))
+    crop_size = tuple(int(c) for c in crop[1] - crop[0])
+    input = __resample_on_device(input, input_spacing, crop_origin_mm, crop_size, model_spacing, device)
+
     # TODO: remove.
     if save_tmp_files:
         filepath = os.path.join('/data/gpfs/projects/punim1413/mymi/tmp/heatmaps', f'{model.name[1]}-{kwargs["id"]}-{target_region}-input.npz')
-        np.savez_compressed(filepath, data=input)
+        np.savez_compressed(filepath, data=input.cpu().numpy())
 
     # Pass image to model.
     logging.info('forward pass')
-    input_size_model = input.shape
-    input = torch.Tensor(input)
+    input_size_model = tuple(input.shape)
     input = input.unsqueeze(0)      # Add 'batch' dimension.
     input = input.unsqueeze(1)      # Add 'channel' dimension.
-    input = input.float()
-    input = input.to(device)
     pred = model(input)
     pred = pred.squeeze(0)          # Remove 'batch' dimension.
 
@@ -147,6 +151,10 @@ def get_multi_segmenter_heatmap(
     logging.info('backward pass')
     y.backward()
 
+    # Only the hooked layer gradients are needed. Release parameter gradients, as the model may be reused
+    # across patients and they would otherwise be accumulated (read-modify-write) on each backward pass.
+    model.zero_grad(set_to_none=True)
+
     # Get heatmaps.
     logging.info('creating heatmaps')
     heatmaps = []
@@ -186,24 +194,13 @@ def get_multi_segmenter_heatmap(
             filepath = os.path.join('/data/gpfs/projects/punim1413/mymi/tmp/heatmaps', f'{model.name[1]}-{kwargs["id"]}-{target_region}-layer-{layer}-input.npz')
             np.savez_compressed(filepath, data=heatmap)
 
-        # Reverse the 'naive' or 'brain' cropping.
-        if use_crop == 'naive':
-            heatmap = centre_pad_3D(heatmap, input_size_after_resample)
-        elif use_crop == 'brain':
-            pad_min = tuple(-np.array(crop[0]))
-            pad_max = np.array(pad_min) + np.array(input_size_after_resample)
-            pad = (pad_min, pad_max)
-            # Fill with 'heatmap_fill' as we want to know where the heatmap edges are.
-            # E.g. if it was cropped in the brain, we can exclude the 'heatmap_fill' values from our mean calculation.
-            heatmap = pad_3D(heatmap, pad, fill=heatmap_fill)
-
-        # TODO: remove.
-        if save_tmp_files:
-            filepath = os.path.join('/data/gpfs/projects/punim1413/mymi/tmp/heatmaps', f'{model.name[1]}-{kwargs["id"]}-{target_region}-layer-{layer}-input-size-before-crop.npz')
-            np.savez_compressed(filepath, data=heatmap)
-
-        # Resample to original spacing/size.
-        heatmap = resample(heatmap, fill=heatmap_fill, output_size=input_size, output_spacing=input_spacing, spacing=model_spacing)
+        # Resample to original spacing/size. The heatmap only covers the crop box, so it's positioned using
+        # its origin and filled outside of the box, rather than padding the heatmap first.
+        # 'brain' crops fill with 'heatmap_fill' as we want to know where the heatmap edges are.
+        # E.g. if it was cropped in the brain, we can exclude the 'heatmap_fill' values from our mean calculation.
+        # 'naive' crops fill with the heatmap minimum, as 'centre_pad_3D' did.
+        fill = heatmap.min() if use_crop == 'naive' else heatmap_fill
+        heatmap = resample(heatmap, fill=fill, origin=crop_origin_mm, output_origin=(0, 0, 0), output_size=input_size, output_spacing=input_spacing, spacing=model_spacing)
 
         # TODO: remove.
         if save_tmp_files:
@@ -226,3 +223,35 @@ def get_multi_segmenter_heatmap(
         return heatmaps[0]
     else:
         return heatmaps
+
+def __resample_on_device(
+    input: np.ndarray,
+    spacing: ImageSpacing3D,
+    output_origin: Tuple[float, float, float],
+    output_size: Tuple[int, int, int],
+    output_spacing: ImageSpacing3D,
+    device: torch.device) -> torch.Tensor:
+    # Linear resampling as per 'resample' (input origin at zero), but using 'grid_sample' on 'device'.
+    input = torch.from_numpy(np.ascontiguousarray(input, dtype=np.float32))
+    if device.type == 'cuda':
+        # Copy from pinned memory, so the copy doesn't block the host while grid coordinates are built.
+        input = input.pin_memory().to(device, non_blocking=True)
+    else:
+        input = input.to(device)
+
+    # Get normalised input coordinates of each output voxel, per axis.
+    coords = []
+    for o, n, os_, s, size in zip(output_origin, output_size, output_spacing, spacing, input.shape):
+        index = (o + torch.arange(n, dtype=torch.float32, device=device) * os_) / s
+        if size == 1:
+            # Single-voxel axes (e.g. single-slice crops) would divide by zero, and the border padding
+            # maps every output voxel to the one input voxel anyway.
+            coords.append(torch.zeros_like(index))
+        else:
+            coords.append(2 * index / (size - 1) - 1)
+    grid = torch.stack(torch.meshgrid(*coords, indexing='ij'), dim=-1)
+
+    # 'grid_sample' orders grid coordinates from the last tensor axis, i.e. (z, y, x).
+    grid = grid.flip(-1).unsqueeze(0)
+    output = grid_sample(input[None, None], grid, mode='bilinear', padding_mode='border', align_corners=True)
+    return output[0, 0]
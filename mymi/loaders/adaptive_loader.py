@@ -14,59 +14,12 @@ from mymi.geometry import get_centre
 from mymi import logging
 from mymi.regions import region_to_list
 from torchio.transforms import Transform
-from mymi.transforms import centre_crop_or_pad_3D
 from mymi.utils import arg_to_list
 
+from .cuda_prefetcher import CUDAPrefetcher
+from .loader_utils import collate_fn, get_loader_kwargs
 from .random_sampler import RandomSampler
 
-def collate_fn(batch) -> List[Tensor]:
-    # Get spatial dimensions of batch.
-    max_size = [-np.inf, -np.inf, -np.inf]
-    for _, input, _, _, _ in batch:     # Batch consists of (desc, input, label, mask, weights).
-        size = input.shape[1:]
-        for axis in range(3):
-            if size[axis] > max_size[axis]:
-                max_size[axis] = size[axis]
-    max_size = tuple(max_size)
-
-    # Gather all batch items.
-    descs = []
-    inputs = []
-    labels = []
-    masks = []
-    weights = []
-    for desc, input, label, mask, weight in batch:
-        descs.append(desc)
-        input_cs = []
-        for c in range(len(input)):     # Perform pad separately for each channel as 'centre_crop_or_pad_4D' hasn't been written.
-            input_c = centre_crop_or_pad_3D(input[c], max_size)
-            input_cs.append(input_c)
-        input = np.stack(input_cs, axis=0)
-        inputs.append(input)
-        label_cs = []
-        for c in range(len(label)): 
-            label_c = centre_crop_or_pad_3D(label[c], max_size)
-            label_cs.append(label_c)
-        label = np.stack(label_cs, axis=0)
-        labels.append(label)
-        masks.append(mask)
-        weights.append(weight)
-
-    # Stack batch items.
-    desc = tuple(descs)
-    input = np.stack(inputs, axis=0)
-    label = np.stack(labels, axis=0)
-    mask = np.stack(masks, axis=0)
-    weights = np.stack(weights, axis=0)
-
-    # Convert to pytorch tensors.
-    input = torch.from_numpy(input)
-    label = torch.from_numpy(label)
-    mask = torch.from_numpy(mask)
-    weights = torch.from_numpy(weights)
-
-    return (desc, input, label, mask, weights)
-
 class AdaptiveLoader:
     @staticmethod
     def build_loaders(
@@ -74,6 +27,7 @@ class AdaptiveLoader:
         batch_size: int = 1,
         check_processed: bool = True,
         epoch: int = 0,
+        half_precision: bool = False,
         include_background: bool = False,
         load_all_samples: bool = False,
         load_data: bool = True,
@@ -81,8 +35,11 @@ class AdaptiveLoader:
         n_folds: Optional[int] = None, 
         n_subfolds: Optional[int] = None,
         n_train: Optional[int] = None,
-        n_workers: int = 1,
+        n_workers: Optional[int] = None,
         p_val: float = .2,
+        persistent_workers: bool = True,
+        pin_memory: bool = True,
+        prefetch_factor: int = 4,
         random_seed: int = 0,
         region: Optional[PatientRegions] = None,
         shuffle_samples: bool = True,
@@ -91,6 +48,7 @@ class AdaptiveLoader:
         test_subfold: Optional[int] = None,
         transform_train: Transform = None,
         transform_val: Transform = None,
+        use_cuda_prefetcher: bool = False,
         use_grouping: bool = False,
         use_split_file: bool = False) -> Union[Tuple[DataLoader, DataLoader], Tuple[DataLoader, DataLoader, DataLoader]]:
         logging.arg_log('Building adaptive loaders', ('n_folds', 'n_subfolds', 'n_train', 'p_val', 'random_seed', 'shuffle_samples', 'shuffle_train', 'test_fold', 'test_subfold', 'use_grouping', 'use_split_file'), (n_folds, n_subfolds, n_train, p_val, random_seed, shuffle_samples, shuffle_train, test_fold, test_subfold, use_grouping, use_split_file))
@@ -286,20 +244,26 @@ class AdaptiveLoader:
                raise ValueError(f"'n_train={n_train}' requested larger number than training samples '{len(train_samples)}'.") 
             train_samples = train_samples[:n_train]
 
+        n_workers, loader_kwargs = get_loader_kwargs(n_workers=n_workers, persistent_workers=persistent_workers, pin_memory=pin_memory, prefetch_factor=prefetch_factor)
+
         # Create train loader.
         col_fn = collate_fn if batch_size > 1 else None
-        train_ds = TrainingSet(datasets, train_samples, include_background=include_background, load_data=load_data, random_seed=random_seed, spacing=spacing, transform=transform_train, use_frequency_weighting=True)
+        train_ds = TrainingSet(datasets, train_samples, half_precision=half_precision, include_background=include_background, load_data=load_data, random_seed=random_seed, spacing=spacing, transform=transform_train, use_frequency_weighting=True)
         if shuffle_train:
             shuffle = None
             train_sampler = RandomSampler(train_ds, epoch=epoch, random_seed=random_seed)
         else:
             shuffle = False
             train_sampler = None
-        train_loader = DataLoader(batch_size=batch_size, collate_fn=col_fn, dataset=train_ds, num_workers=n_workers, sampler=train_sampler, shuffle=shuffle)
+        train_loader = DataLoader(batch_size=batch_size, collate_fn=col_fn, dataset=train_ds, sampler=train_sampler, shuffle=shuffle, **loader_kwargs)
+        if use_cuda_prefetcher:
+            train_loader = CUDAPrefetcher(train_loader)
 
         # Create validation loader.
-        val_ds = TrainingSet(datasets, val_samples, include_background=include_background, load_data=load_data, spacing=spacing, transform=transform_val)
-        val_loader = DataLoader(batch_size=batch_size, collate_fn=col_fn, dataset=val_ds, num_workers=n_workers, shuffle=False)
+        val_ds = TrainingSet(datasets, val_samples, half_precision=half_precision, include_background=include_background, load_data=load_data, spacing=spacing, transform=transform_val)
+        val_loader = DataLoader(batch_size=batch_size, collate_fn=col_fn, dataset=val_ds, shuffle=False, **loader_kwargs)
+        if use_cuda_prefetcher:
+            val_loader = CUDAPrefetcher(val_loader)
 
         # Create test loader.
         if n_folds is not None or use_split_file:
@@ -325,6 +289,7 @@ class TrainingSet(Dataset):
         self,
         datasets: List[str],
         samples: List[Tuple[int, int]],
+        half_precision: bool = False,
         include_background: bool = False,
         load_data: bool = True,
         random_seed: float = 0,
@@ -333,10 +298,20 @@ class TrainingSet(Dataset):
         use_frequency_weighting: bool = True):
         if transform is not None:
             assert spacing is not None, 'Spacing is required when transform applied to dataloader.'
+        self.__half_precision = half_precision
         self.__load_data = load_data
         self.__random_seed = random_seed
         self.__spacing = spacing
         self.__transform = transform
+
+        # The image affine only depends on spacing, so create it once rather than per sample.
+        if transform is not None:
+            self.__affine = np.array([
+                [self.__spacing[0], 0, 0, 0],
+                [0, self.__spacing[1], 0, 0],
+                [0, 0, self.__spacing[2], 1],
+                [0, 0, 0, 1]
+            ])
         
         # Load datasets.
         self.__sets = [TrainingAdaptiveDataset(d) for d in datasets]
@@ -345,7 +320,10 @@ class TrainingSet(Dataset):
         self.__n_samples = len(samples)
 
         # Map loader indices to dataset indices.
-        self.__sample_map = dict(((i, sample) for i, sample in enumerate(samples)))
+        self.__sample_map = list(samples)
+
+        # Label masks are cached per sample, as labels don't change between epochs.
+        self.__masks = {}
 
         # Assumes a single dataset.
         regions = self.__sets[0].list_regions()
@@ -353,10 +331,11 @@ class TrainingSet(Dataset):
         if use_frequency_weighting:
             # Get region counts.
             counts = np.zeros(len(regions), dtype=np.float32)
+            region_channels = dict((r, i) for i, r in enumerate(regions))
             for ds_i, s_i in samples:
-                sample_regions = self.__sets[ds_i].sample(s_i).list_regions(only=regions)
-                samples_counts = np.array([1 if r in sample_regions else 0 for r in regions], dtype=np.float32)
-                counts += samples_counts
+                sample_regions = set(self.__sets[ds_i].sample(s_i).list_regions(only=regions))
+                for region in sample_regions:
+                    counts[region_channels[region]] += 1
             logging.info(f"Region counts: {counts}.")
 
             # Calculate frequencies.
@@ -397,22 +376,21 @@ class TrainingSet(Dataset):
 
         # Load input/label data.
         sample = set.sample(s_i)
-        input, label = sample.pair
+        # Load inputs directly into a half precision array when no transform is applied.
+        input_dtype = np.float16 if self.__half_precision and self.__transform is None else np.float32
+        input = sample.load_input(dtype=input_dtype)
+        label = sample.label
 
         # Create mask from label.
-        mask = label.sum(axis=(1, 2, 3)).astype(np.bool_)
+        if index not in self.__masks:
+            self.__masks[index] = label.any(axis=(1, 2, 3))
+        mask = self.__masks[index]
 
         # Perform transform.
         if self.__transform:
             # Transform input/labels.
-            affine = np.array([
-                [self.__spacing[0], 0, 0, 0],
-                [0, self.__spacing[1], 0, 0],
-                [0, 0, self.__spacing[2], 1],
-                [0, 0, 0, 1]
-            ])
-            input = ScalarImage(tensor=input, affine=affine)
-            label = LabelMap(tensor=label, affine=affine)
+            input = ScalarImage(tensor=input, affine=self.__affine)
+            label = LabelMap(tensor=label, affine=self.__affine)
             subject = Subject({
                 'input': input,
                 'label': label
@@ -430,6 +408,10 @@ class TrainingSet(Dataset):
             input = input.numpy()
             label = label.numpy().astype(bool)
 
+        # Halve the bytes copied through pinned memory to the device, inputs are cast back on the device.
+        if self.__half_precision:
+            input = input.astype(np.float16, copy=False)
+
         return desc, input, label, mask, self.__class_weights
     
 class TestSet(Dataset):
@@ -445,7 +427,7 @@ class TestSet(Dataset):
         self.__n_samples = len(samples)
 
         # Map loader indices to dataset indices.
-        self.__sample_map = dict(((i, sample) for i, sample in enumerate(samples)))
+        self.__sample_map = list(samples)
 
     def __len__(self):
         return self.__n_samples
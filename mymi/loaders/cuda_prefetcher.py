@@ -0,0 +1,70 @@
+import torch
+from torch import Tensor
+from torch.utils.data import DataLoader
+from typing import Any, Optional
+
+class CUDAPrefetcher:
+    def __init__(
+        self,
+        loader: DataLoader,
+        device: Optional[torch.device] = None):
+        self.__device = device
+        self.__loader = loader
+        self.__stream = None
+
+    @property
+    def dataset(self):
+        return self.__loader.dataset
+
+    def __len__(self):
+        return len(self.__loader)
+
+    def __iter__(self):
+        # Resolve the device when iterating, rather than when the loaders are built. Under DDP, Lightning
+        # sets each rank's device after the loaders are created.
+        if self.__device is None or self.__stream is None:
+            if self.__device is None:
+                self.__device = torch.device('cuda', torch.cuda.current_device())
+            self.__stream = torch.cuda.Stream(device=self.__device)
+
+        # Copy the next batch on a side stream while the current batch is being used.
+        it = iter(self.__loader)
+        next_batch = self.__preload(it)
+        while next_batch is not None:
+            torch.cuda.current_stream(self.__device).wait_stream(self.__stream)
+            batch = next_batch
+            self.__record_stream(batch)
+            next_batch = self.__preload(it)
+            yield batch
+
+    def __preload(self, it) -> Any:
+        try:
+            batch = next(it)
+        except StopIteration:
+            return None
+
+        with torch.cuda.stream(self.__stream):
+            return self.__to_device(batch)
+
+    def __record_stream(
+        self,
+        batch: Any) -> None:
+        # Stop the caching allocator reusing staged memory while the main stream still needs it.
+        if isinstance(batch, Tensor):
+            batch.record_stream(torch.cuda.current_stream(self.__device))
+        elif isinstance(batch, (list, tuple)):
+            for b in batch:
+                self.__record_stream(b)
+
+    def __to_device(
+        self,
+        batch: Any) -> Any:
+        # Batches are tuples of tensors and non-tensor items, e.g. sample descriptions.
+        if isinstance(batch, Tensor):
+            return batch.to(self.__device, non_blocking=True)
+        elif isinstance(batch, list):
+            return [self.__to_device(b) for b in batch]
+        elif isinstance(batch, tuple):
+            return tuple(self.__to_device(b) for b in batch)
+        else:
+            return batch
@@ -0,0 +1,77 @@
+import numpy as np
+import os
+import torch
+from torch import Tensor
+from typing import Any, Dict, List, Optional, Tuple
+
+def get_loader_kwargs(
+    n_workers: Optional[int] = None,
+    persistent_workers: bool = True,
+    pin_memory: bool = True,
+    prefetch_factor: int = 4) -> Tuple[int, Dict[str, Any]]:
+    # Default to a worker per CPU, up to 8. Around 2 workers per GPU is usually enough to keep each GPU fed.
+    if n_workers is None:
+        n_workers = min(8, os.cpu_count() or 1)
+
+    # Keep workers alive between epochs and load batches into pinned memory, so host-to-device
+    # copies can overlap with compute.
+    loader_kwargs = {
+        'num_workers': n_workers,
+        'pin_memory': pin_memory
+    }
+    if n_workers > 0:
+        loader_kwargs['persistent_workers'] = persistent_workers
+        loader_kwargs['prefetch_factor'] = prefetch_factor
+
+    return n_workers, loader_kwargs
+
+def collate_fn(batch) -> List[Tensor]:
+    # Get spatial dimensions of batch.
+    # Batch consists of (desc, input, label, mask, weights).
+    max_size = tuple(int(s) for s in np.max([input.shape[1:] for _, input, _, _, _ in batch], axis=0))
+
+    # Write batch items into preallocated batch arrays, rather than allocating stacked copies
+    # per item and again per batch.
+    _, input, label, _, _ = batch[0]
+    inputs = np.empty((len(batch), len(input), *max_size), dtype=input.dtype)
+    labels = np.empty((len(batch), len(label), *max_size), dtype=label.dtype)
+    descs = []
+    masks = []
+    weights = []
+    for b, (desc, input, label, mask, weight) in enumerate(batch):
+        descs.append(desc)
+        __centre_pad_into(inputs[b], input)
+        __centre_pad_into(labels[b], label)
+        masks.append(mask)
+        weights.append(weight)
+
+    # Stack batch items.
+    desc = tuple(descs)
+    input = inputs
+    label = labels
+    mask = np.stack(masks, axis=0)
+    weights = np.stack(weights, axis=0)
+
+    # Convert to pytorch tensors.
+    input = torch.from_numpy(input)
+    label = torch.from_numpy(label)
+    mask = torch.from_numpy(mask)
+    weights = torch.from_numpy(weights)
+
+    return (desc, input, label, mask, weights)
+
+def __centre_pad_into(
+    output: np.ndarray,
+    data: np.ndarray) -> None:
+    # Centre-pads (C, X, Y, Z) 'data' into the preallocated batch item 'output', filling with each channel's
+    # minimum as 'centre_crop_or_pad_3D' does. Writing in place avoids a padded copy per channel.
+    if len(data) == 0:
+        return
+    if data.shape[1:] == output.shape[1:]:
+        output[...] = data
+        return
+
+    offset = np.ceil((np.array(output.shape[1:]) - data.shape[1:]) / 2).astype(int)
+    slices = tuple(slice(o, o + s) for o, s in zip(offset, data.shape[1:]))
+    output[...] = data.min(axis=(1, 2, 3)).reshape(-1, 1, 1, 1)
+    output[(slice(None), *slices)] = data
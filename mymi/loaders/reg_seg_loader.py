@@ -14,59 +14,12 @@ from mymi.geometry import get_centre
 from mymi import logging
 from mymi.regions import region_to_list
 from torchio.transforms import Transform
-from mymi.transforms import centre_crop_or_pad_3D
 from mymi.utils import arg_to_list
 
+from .cuda_prefetcher import CUDAPrefetcher
+from .loader_utils import collate_fn, get_loader_kwargs
 from .random_sampler import RandomSampler
 
-def collate_fn(batch) -> List[Tensor]:
-    # Get spatial dimensions of batch.
-    max_size = [-np.inf, -np.inf, -np.inf]
-    for _, input, _, _, _ in batch:     # Batch consists of (desc, input, label, mask, weights).
-        size = input.shape[1:]
-        for axis in range(3):
-            if size[axis] > max_size[axis]:
-                max_size[axis] = size[axis]
-    max_size = tuple(max_size)
-
-    # Gather all batch items.
-    descs = []
-    inputs = []
-    labels = []
-    masks = []
-    weights = []
-    for desc, input, label, mask, weight in batch:
-        descs.append(desc)
-        input_cs = []
-        for c in range(len(input)):     # Perform pad separately for each channel as 'centre_crop_or_pad_4D' hasn't been written.
-            input_c = centre_crop_or_pad_3D(input[c], max_size)
-            input_cs.append(input_c)
-        input = np.stack(input_cs, axis=0)
-        inputs.append(input)
-        label_cs = []
-        for c in range(len(label)): 
-            label_c = centre_crop_or_pad_3D(label[c], max_size)
-            label_cs.append(label_c)
-        label = np.stack(label_cs, axis=0)
-        labels.append(label)
-        masks.append(mask)
-        weights.append(weight)
-
-    # Stack batch items.
-    desc = tuple(descs)
-    input = np.stack(inputs, axis=0)
-    label = np.stack(labels, axis=0)
-    mask = np.stack(masks, axis=0)
-    weights = np.stack(weights, axis=0)
-
-    # Convert to pytorch tensors.
-    input = torch.from_numpy(input)
-    label = torch.from_numpy(label)
-    mask = torch.from_numpy(mask)
-    weights = torch.from_numpy(weights)
-
-    return (desc, input, label, mask, weights)
-
 class RegSegLoader:
     @staticmethod
     def build_loaders(
@@ -81,8 +34,11 @@ class RegSegLoader:
         n_folds: Optional[int] = None, 
         n_subfolds: Optional[int] = None,
         n_train: Optional[int] = None,
-        n_workers: int = 1,
+        n_workers: Optional[int] = None,
         p_val: float = .2,
+        persistent_workers: bool = True,
+        pin_memory: bool = True,
+        prefetch_factor: int = 4,
         random_seed: int = 0,
         region: Optional[PatientRegions] = None,
         shuffle_samples: bool = True,
@@ -91,6 +47,7 @@ class RegSegLoader:
         test_subfold: Optional[int] = None,
         transform_train: Transform = None,
         transform_val: Transform = None,
+        use_cuda_prefetcher: bool = False,
         use_grouping: bool = False,
         use_split_file: bool = False) -> Union[Tuple[DataLoader, DataLoader], Tuple[DataLoader, DataLoader, DataLoader]]:
         logging.arg_log('Building reg-seg loaders', ('n_folds', 'n_subfolds', 'n_train', 'p_val', 'random_seed', 'shuffle_samples', 'shuffle_train', 'test_fold', 'test_subfold', 'use_grouping', 'use_split_file'), (n_folds, n_subfolds, n_train, p_val, random_seed, shuffle_samples, shuffle_train, test_fold, test_subfold, use_grouping, use_split_file))
@@ -286,6 +243,8 @@ class RegSegLoader:
                raise ValueError(f"'n_train={n_train}' requested larger number than training samples '{len(train_samples)}'.") 
             train_samples = train_samples[:n_train]
 
+        n_workers, loader_kwargs = get_loader_kwargs(n_workers=n_workers, persistent_workers=persistent_workers, pin_memory=pin_memory, prefetch_factor=prefetch_factor)
+
         # Create train loader.
         col_fn = collate_fn if batch_size > 1 else None
         train_ds = TrainingSet(datasets, train_samples, include_background=include_background, load_data=load_data, random_seed=random_seed, spacing=spacing, transform=transform_train, use_frequency_weighting=True)
@@ -295,11 +254,15 @@ class RegSegLoader:
         else:
             shuffle = False
             train_sampler = None
-        train_loader = DataLoader(batch_size=batch_size, collate_fn=col_fn, dataset=train_ds, num_workers=n_workers, sampler=train_sampler, shuffle=shuffle)
+        train_loader = DataLoader(batch_size=batch_size, collate_fn=col_fn, dataset=train_ds, sampler=train_sampler, shuffle=shuffle, **loader_kwargs)
+        if use_cuda_prefetcher:
+            train_loader = CUDAPrefetcher(train_loader)
 
         # Create validation loader.
         val_ds = TrainingSet(datasets, val_samples, include_background=include_background, load_data=load_data, spacing=spacing, transform=transform_val)
-        val_loader = DataLoader(batch_size=batch_size, collate_fn=col_fn, dataset=val_ds, num_workers=n_workers, shuffle=False)
+        val_loader = DataLoader(batch_size=batch_size, collate_fn=col_fn, dataset=val_ds, shuffle=False, **loader_kwargs)
+        if use_cuda_prefetcher:
+            val_loader = CUDAPrefetcher(val_loader)
 
         # Create test loader.
         if n_folds is not None or use_split_file:
@@ -337,6 +300,15 @@ class TrainingSet(Dataset):
         self.__random_seed = random_seed
         self.__spacing = spacing
         self.__transform = transform
+
+        # The image affine only depends on spacing, so create it once rather than per sample.
+        if transform is not None:
+            self.__affine = np.array([
+                [self.__spacing[0], 0, 0, 0],
+                [0, self.__spacing[1], 0, 0],
+                [0, 0, self.__spacing[2], 1],
+                [0, 0, 0, 1]
+            ])
         
         # Load datasets.
         self.__sets = [TrainingAdaptiveDataset(d) for d in datasets]
@@ -345,7 +317,10 @@ class TrainingSet(Dataset):
         self.__n_samples = len(samples)
 
         # Map loader indices to dataset indices.
-        self.__sample_map = dict(((i, sample) for i, sample in enumerate(samples)))
+        self.__sample_map = list(samples)
+
+        # Label masks are cached per sample, as labels don't change between epochs.
+        self.__masks = {}
 
         # Assumes a single dataset.
         regions = self.__sets[0].list_regions()
@@ -353,10 +328,11 @@ class TrainingSet(Dataset):
         if use_frequency_weighting:
             # Get region counts.
             counts = np.zeros(len(regions), dtype=np.float32)
+            region_channels = dict((r, i) for i, r in enumerate(regions))
             for ds_i, s_i in samples:
-                sample_regions = self.__sets[ds_i].sample(s_i).list_regions(only=regions)
-                samples_counts = np.array([1 if r in sample_regions else 0 for r in regions], dtype=np.float32)
-                counts += samples_counts
+                sample_regions = set(self.__sets[ds_i].sample(s_i).list_regions(only=regions))
+                for region in sample_regions:
+                    counts[region_channels[region]] += 1
             logging.info(f"Region counts: {counts}.")
 
             # Calculate frequencies.
@@ -403,24 +379,19 @@ class TrainingSet(Dataset):
         moving_label = sample.moving_label
 
         # Create mask from label.
-        fixed_mask = fixed_label.sum(axis=(1, 2, 3)).astype(np.bool_)
-        moving_mask = moving_label.sum(axis=(1, 2, 3)).astype(np.bool_)
+        if index not in self.__masks:
+            self.__masks[index] = (fixed_label.any(axis=(1, 2, 3)), moving_label.any(axis=(1, 2, 3)))
+        fixed_mask, moving_mask = self.__masks[index]
 
         # Perform transform.
         if self.__transform:
             # Transform input/labels.
-            affine = np.array([
-                [self.__spacing[0], 0, 0, 0],
-                [0, self.__spacing[1], 0, 0],
-                [0, 0, self.__spacing[2], 1],
-                [0, 0, 0, 1]
-            ])
             fixed_input = np.expand_dims(fixed_input, axis=0)
-            fixed_input = ScalarImage(tensor=fixed_input, affine=affine)
+            fixed_input = ScalarImage(tensor=fixed_input, affine=self.__affine)
             moving_input = np.expand_dims(moving_input, axis=0)
-            moving_input = ScalarImage(tensor=moving_input, affine=affine)
-            fixed_label = LabelMap(tensor=fixed_label, affine=affine)
-            moving_label = LabelMap(tensor=moving_label, affine=affine)
+            moving_input = ScalarImage(tensor=moving_input, affine=self.__affine)
+            fixed_label = LabelMap(tensor=fixed_label, affine=self.__affine)
+            moving_label = LabelMap(tensor=moving_label, affine=self.__affine)
             subject = Subject({
                 'fixed-input': fixed_input,
                 'moving-input': moving_input,
@@ -441,6 +412,18 @@ class TrainingSet(Dataset):
             fixed_label = fixed_label.numpy().astype(np.bool_)
             moving_label = moving_label.numpy().astype(np.bool_)
 
+        # Add channel dimension in the loader workers, rather than in the model's steps on the main process.
+        if fixed_input.ndim == 3:
+            fixed_input = np.expand_dims(fixed_input, axis=0)
+            moving_input = np.expand_dims(moving_input, axis=0)
+
+        # Keep narrower stored dtypes (e.g. int16/float16) so fewer bytes are copied to the device,
+        # inputs are cast to float32 on the device. Only downcast wider floats.
+        if fixed_input.dtype == np.float64:
+            fixed_input = fixed_input.astype(np.float32)
+        if moving_input.dtype == np.float64:
+            moving_input = moving_input.astype(np.float32)
+
         return desc, fixed_input, moving_input, fixed_label, moving_label, fixed_mask, moving_mask, self.__class_weights
     
 class TestSet(Dataset):
@@ -456,7 +439,7 @@ class TestSet(Dataset):
         self.__n_samples = len(samples)
 
         # Map loader indices to dataset indices.
-        self.__sample_map = dict(((i, sample) for i, sample in enumerate(samples)))
+        self.__sample_map = list(samples)
 
     def __len__(self):
         return self.__n_samples
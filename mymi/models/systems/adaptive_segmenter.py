@@ -2,22 +2,17 @@ import csv
 import numpy as np
 import os
 import pytorch_lightning as pl
-from pytorch_lightning import seed_everything
 import random
 from scipy.ndimage import binary_dilation
 import torch
 from torch import nn
 from torch.optim import Adam
 from torch.optim.lr_scheduler import CyclicLR, MultiStepLR, ReduceLROnPlateau
-import torch.nn.functional as F
-from typing import Dict, List, Literal, Optional, OrderedDict, Tuple, Union
-from wandb import Image
+from typing import Callable, Dict, List, Literal, Optional, OrderedDict, Tuple, Union
 
 from mymi import config
-from mymi.geometry import get_extent_centre
 from mymi import logging
 from mymi.losses import DiceWithFocalLoss
-from mymi.metrics import dice
 from mymi.models import replace_ckpt_alias
 from mymi.models.networks import MultiUNet3D
 from mymi.types import ModelName, PatientID, PatientRegions
@@ -50,6 +45,8 @@ class AdaptiveSegmenter(pl.LightningModule):
         random_seed: float = 0,
         region: PatientRegions = None,
         run_name: str = 'run-name',
+        transform_gpu: Optional[Callable] = None,
+        use_channels_last: bool = False,
         use_complexity_weights: bool = False,
         use_cvg_weighting: bool = False,
         use_dilation: bool = False,
@@ -69,7 +66,6 @@ class AdaptiveSegmenter(pl.LightningModule):
         self.__complexity_weights_rolling_losses = {}
         self.__complexity_weights_factor = complexity_weights_factor
         self.__complexity_weights_window = complexity_weights_window
-        self.__cw_batch_mean_dices = {}
         self.__cw_cvg_calculate = cw_cvg_calculate
         self.__cw_cvg_delay_above = cw_cvg_delay_above
         self.__cw_cvg_delay_below = cw_cvg_delay_below
@@ -79,6 +75,7 @@ class AdaptiveSegmenter(pl.LightningModule):
         self.__cyclic_min = cyclic_min
         self.__cyclic_max = cyclic_max
         self.__dilate_iters = dilate_iters
+        self.__dilate_n_iter = None     # Set per epoch.
         self.__dilate_schedule = dilate_schedule
         self.__log_on_epoch = log_on_epoch
         self.__log_on_step = log_on_step
@@ -91,9 +88,17 @@ class AdaptiveSegmenter(pl.LightningModule):
         self.__random_seed = random_seed
         self.__regions = arg_to_list(region, str)
         self.__run_name = run_name
+        self.__transform_gpu = transform_gpu
+        self.__use_channels_last = use_channels_last
         self.__n_input_channels = len(self.__regions) + 2
         self.__n_output_channels = len(self.__regions) + 1
+        # Running (sum, count) of batch mean dice per channel, for "convergence weighting".
+        self.__cw_dice_sums = np.zeros(self.__n_output_channels)
+        self.__cw_dice_counts = np.zeros(self.__n_output_channels, dtype=int)
         self.__network = MultiUNet3D(self.__n_output_channels, n_input_channels=self.__n_input_channels, **kwargs)
+        if self.__use_channels_last:
+            # Channels-last layout lets cuDNN use its NDHWC tensor-core conv kernels.
+            self.__network = self.__network.to(memory_format=torch.channels_last_3d)
         self.__use_complexity_weights = use_complexity_weights
         self.__use_cvg_weighting = use_cvg_weighting
         self.__use_dilation = use_dilation
@@ -105,6 +110,7 @@ class AdaptiveSegmenter(pl.LightningModule):
         self.__val_max_image_batches = val_max_image_batches
         self.__weights = weights
         self.__weights_schedule = weights_schedule
+        self.__weights_schedule_i = None    # Set per epoch.
         self.__weight_decay = weight_decay
 
         # Handle label dilation.
@@ -236,11 +242,43 @@ class AdaptiveSegmenter(pl.LightningModule):
 
         return opt
 
+    def optimizer_zero_grad(self, epoch, batch_idx, optimizer):
+        # Release gradients rather than writing zeros to them.
+        optimizer.zero_grad(set_to_none=True)
+
     def forward(
         self,
         x: torch.Tensor) -> torch.Tensor:
+        if self.__use_channels_last:
+            x = x.contiguous(memory_format=torch.channels_last_3d)
         return self.__network(x)
 
+    def on_after_batch_transfer(self, batch, dataloader_idx):
+        # Apply training augmentation on the device, after the batch has been transferred.
+        if self.__transform_gpu is None or not self.trainer.training:
+            return batch
+
+        desc, x, y, mask, weights = batch
+        x, y = self.__transform_gpu(x, y)
+
+        return desc, x, y, mask, weights
+
+    def on_train_epoch_start(self):
+        # Schedules only change between epochs, so look them up once per epoch rather than per step.
+        if self.__use_dilation:
+            # Determine current 'n_iter'.
+            n_iter_curr = None
+            for epoch, n_iter in zip(self.__dilate_schedule, self.__dilate_iters):
+                if self.current_epoch >= epoch:
+                    n_iter_curr = n_iter
+                else:
+                    break
+            assert n_iter_curr is not None
+            self.__dilate_n_iter = n_iter_curr
+
+        if self.__weights_schedule is not None:
+            self.__weights_schedule_i = np.max(np.where(np.array(self.__weights_schedule) <= self.current_epoch))
+
     def load_state_dict(self, state_dict, *args, **kwargs):
         if 'down-weighting' in state_dict:
             cw_state = state_dict.pop('down-weighting')
@@ -279,6 +317,7 @@ class AdaptiveSegmenter(pl.LightningModule):
     def training_step(self, batch, batch_idx):
         # Forward pass.
         desc, x, y, mask, weights = batch
+        x = x.float()   # Inputs may be loaded in half precision.
         if batch_idx < 5: 
             pass
             # logging.info(f"Training... (epoch={self.current_epoch},batch={batch_idx},samples={desc})")
@@ -287,15 +326,7 @@ class AdaptiveSegmenter(pl.LightningModule):
 
         # Handle label dilation.
         if self.__use_dilation:
-            # Determine current 'n_iter'.
-            n_iter_curr = None
-            for epoch, n_iter in zip(self.__dilate_schedule, self.__dilate_iters):
-                if self.current_epoch >= epoch:
-                    n_iter_curr = n_iter
-                else:
-                    break
-            assert n_iter_curr is not None
-
+            n_iter_curr = self.__dilate_n_iter
             self.log(f'train/dilation/n_iter', float(n_iter_curr), on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
                 
             # Apply dilation to each channel.
@@ -325,7 +356,7 @@ class AdaptiveSegmenter(pl.LightningModule):
             if self.__weights_schedule is None:
                 static_weights = self.__weights
             else:
-                schedule_i = np.max(np.where(np.array(self.__weights_schedule) <= self.current_epoch))
+                schedule_i = self.__weights_schedule_i
                 static_weights = self.__weights[schedule_i]
 
             # Apply weighting.
@@ -341,7 +372,7 @@ class AdaptiveSegmenter(pl.LightningModule):
             if self.__weights_schedule is None:
                 cw_factor = self.__cw_factor
             else:
-                schedule_i = np.max(np.where(np.array(self.__weights_schedule) <= self.current_epoch))
+                schedule_i = self.__weights_schedule_i
                 cw_factor = self.__cw_factor[schedule_i]
 
             # Apply down-weighting.
@@ -366,14 +397,12 @@ class AdaptiveSegmenter(pl.LightningModule):
             weights = torch.Tensor([weights] * batch_size).to(x.device)
 
         # Normalise weights. Do this last as we might combine static and dynamic weights.
-        weights = weights[0].cpu()
-        weights = list(weights / weights.sum())
-        weights = torch.Tensor([weights] * batch_size).to(x.device)
+        # Normalise on the device, rather than copying to the CPU and back each step.
+        weights = weights[0].float()
+        weights = (weights / weights.sum()).repeat(batch_size, 1)
 
         # Log weights. First batch item only.
-        for i, weight in enumerate(weights[0]):
-            region = self.__channel_region_map[i]
-            self.log(f'train/weight/{region}', weight, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
+        self.log_dict(dict((f'train/weight/{self.__channel_region_map[i]}', weight) for i, weight in enumerate(weights[0])), on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
 
         y_hat = self.forward(x)
         include_background = False
@@ -382,24 +411,32 @@ class AdaptiveSegmenter(pl.LightningModule):
         loss = self.__loss(y_hat, y, include_background=include_background, mask=mask, weights=weights, reduce_channels=reduce_channels, reduction=reduction)
         region_losses = {}
         if not reduce_channels:
+            # Check region losses and the reduced loss for NaNs with a single device sync, rather
+            # than one '.item()' per region and another for the reduced loss.
+            if reduction == 'mean':
+                reduced_loss = loss.mean()
+            elif reduction == 'sum':
+                reduced_loss = loss.sum()
+            is_nan = torch.isnan(torch.cat((loss.detach(), reduced_loss.detach().view(1)))).tolist()
+
             # Log OAR loss.
             for i, l in enumerate(loss):
-                if not torch.isnan(l).any():
+                if not is_nan[i]:
                     region = self.__channel_region_map[i + 1]
-                    self.log(f'train/loss/region/{region}', l, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
-
                     region_losses[region] = l
 
                     # if self.__lr_find:
                     #     self.__write_loss(region, self.global_step, l.item())
 
+            self.log_dict(dict((f'train/loss/region/{r}', l) for r, l in region_losses.items()), on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
+
             # Reduce channels.
-            if reduction == 'mean':
-                loss = loss.mean()
-            elif reduction == 'sum':
-                loss = loss.sum()
+            loss = reduced_loss
+            loss_is_nan = is_nan[-1]
+        else:
+            loss_is_nan = np.isnan(loss.item())
 
-        if np.isnan(loss.item()):
+        if loss_is_nan:
             print(desc)
             # names = ['x', 'y', 'mask', 'weights', 'y_hat']
             # arrays = [x, y, mask, weights, y_hat]
@@ -414,27 +451,20 @@ class AdaptiveSegmenter(pl.LightningModule):
             # if self.__lr_find:
             #     self.__write_loss('all', self.global_step, loss.item())
 
-        # Convert pred to binary mask.
-        y_hat = F.one_hot(y_hat.argmax(axis=1), num_classes=y.shape[1]).moveaxis(-1, 1)  # 'F.one_hot' adds new axis last, move to second place.
-        y_hat = y_hat.cpu().numpy().astype(bool)
-
         # Report metrics.
-        y = y.cpu().numpy()
         if 'dice' in self.__metrics:
+            # Dice is calculated on the device, so predictions/labels aren't copied to the CPU.
+            dice_scores = self.__batch_dice(y_hat.detach().argmax(axis=1), y)
+            mask_np = mask.cpu().numpy().astype(bool)
+
             # Get mean dice score per-channel.
+            mean_dices = {}
             for i in range(self.__n_output_channels):
                 region = self.__channel_region_map[i]
-                dice_scores = []
-                for b in range(y.shape[0]):     # Batch items.
-                    if mask[b, i]:
-                        y_i = y[b, i]   
-                        y_hat_i = y_hat[b, i]
-                        dice_score = dice(y_hat_i, y_i)
-                        dice_scores.append(dice_score)
-
-                if len(dice_scores) > 0:
-                    mean_dice = np.mean(dice_scores)
-                    self.log(f'train/dice/{region}', mean_dice, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
+                channel_dice_scores = dice_scores[mask_np[:, i], i]
+                if len(channel_dice_scores) > 0:
+                    mean_dices[f'train/dice/{region}'] = np.mean(channel_dice_scores)
+            self.log_dict(mean_dices, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
 
         # Add main loss.
         losses = {}
@@ -449,16 +479,19 @@ class AdaptiveSegmenter(pl.LightningModule):
     def validation_step(self, batch, batch_idx):
         # Forward pass.
         descs, x, y, mask, weights = batch
+        x = x.float()   # Inputs may be loaded in half precision.
         y_hat = self.forward(x)
         include_background = False
         if self.__use_complexity_weights:
-            # Store loss per-region.
+            # Store running (sum, count) of loss per-region. Sums are kept on the device and only copied
+            # at epoch end, rather than synchronising with '.item()' each step.
             loss = self.__loss(y_hat, y, include_background=include_background, mask=mask, weights=weights, reduce_channels=False)
-            for region, loss in zip(self.__regions, loss[1:]):
+            for region, region_loss in zip(self.__regions, loss[1:]):
                 if region not in self.__complexity_weights_batch_losses:
-                    self.__complexity_weights_batch_losses[region] = [loss.item()]
+                    self.__complexity_weights_batch_losses[region] = [region_loss.detach().float(), 1]
                 else:
-                    self.__complexity_weights_batch_losses[region] += [loss.item()]
+                    self.__complexity_weights_batch_losses[region][0] += region_loss.detach().float()
+                    self.__complexity_weights_batch_losses[region][1] += 1
 
             loss = loss.mean()
         else:
@@ -466,18 +499,21 @@ class AdaptiveSegmenter(pl.LightningModule):
 
         self.log('val/loss', loss, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
 
-        # Convert pred to binary mask.
-        y = y.cpu().numpy()
-        y_hat = F.one_hot(y_hat.argmax(axis=1), num_classes=y.shape[1]).moveaxis(-1, 1)  # 'F.one_hot' adds new axis last, move to second place.
-        y_hat = y_hat.cpu().numpy().astype(bool)
-
         # Record gpu usage.
-        for i, usage_mb in enumerate(gpu_usage_nvml()):
-            self.log(f'gpu/{i}', usage_mb, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
+        self.log_dict(dict((f'gpu/{i}', usage_mb) for i, usage_mb in enumerate(gpu_usage_nvml())), on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
+
+        # Argmax labels are shared by dice and image logging, so only reduce over channels once.
+        y_hat_labels = None
 
         # Record dice.
         if 'dice' in self.__metrics:
+            # Dice is calculated on the device, so predictions/labels aren't copied to the CPU.
+            y_hat_labels = y_hat.argmax(axis=1)
+            dice_scores = self.__batch_dice(y_hat_labels, y)
+            mask_np = mask.cpu().numpy().astype(bool)
+
             # Operate on each region separately.
+            batch_mean_dices = {}
             for i in range(self.__n_output_channels):
                 # Skip 'background' channel.
                 if i == 0:
@@ -485,87 +521,93 @@ class AdaptiveSegmenter(pl.LightningModule):
 
                 # Calculate batch mean dice.
                 region = self.__channel_region_map[i]
-                dice_scores = []
-                for b in range(y.shape[0]):
-                    if mask[b, i]:
-                        y_i = y[b, i]
-                        y_hat_i = y_hat[b, i]
-                        dice_score = dice(y_hat_i, y_i)
-                        dice_scores.append(dice_score)
-                if len(dice_scores) == 0:
+                region_dice_scores = dice_scores[mask_np[:, i], i]
+                if len(region_dice_scores) == 0:
                     # Skip if no dice scores for this region, for this batch (could have been masked out).
                     continue
-                batch_mean_dice = np.mean(dice_scores)
-
-                # Log to wandb.
-                self.log(f'val/dice/{region}', batch_mean_dice, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
+                batch_mean_dice = np.mean(region_dice_scores)
+                batch_mean_dices[f'val/dice/{region}'] = batch_mean_dice
 
                 # Save batch mean values for "convergence weighting" calculations.
                 # Do this even when 'use_cvg_weighting=False' as it allows us to track 
                 # convergence via wandb API.
                 if self.__cw_cvg_calculate:
-                    if region in self.__cw_batch_mean_dices:
-                        self.__cw_batch_mean_dices[region] += [batch_mean_dice]
-                    else:
-                        self.__cw_batch_mean_dices[region] = [batch_mean_dice]
+                    # Store running (sum, count) rather than a list of batch means.
+                    self.__cw_dice_sums[i] += batch_mean_dice
+                    self.__cw_dice_counts[i] += 1
+
+            # Log to wandb.
+            self.log_dict(batch_mean_dices, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
                         
         # Log prediction images.
         if self.logger:
             if self.current_epoch % self.__val_image_interval == 0 and (self.__val_max_image_batches is None or batch_idx < self.__val_max_image_batches):
-                class_labels = {
-                    1: 'foreground'
-                }
+                # Select (sample, channel) pairs to plot. Copy the small mask once, rather than
+                # indexing the device tensor per channel.
+                mask_np = mask.cpu().numpy().astype(bool)
+                pairs = []
                 for i, desc in enumerate(descs):
                     if self.__val_image_samples is not None:
                         pat_id = desc.split(':')[1]
                         if pat_id not in self.__val_image_samples:
                             continue
 
-                    # Plot for each channel.
-                    for j in range(y.shape[1]):
-                        # Skip channel if not present.
-                        if not mask[i, j]:
-                            continue
-
-                        # Get images.
-                        x_vol, y_vol, y_hat_vol = x[i, 0].cpu().numpy(), y[i, j], y_hat[i, j]
-
-                        # Get centre of extent of ground truth.
-                        centre = get_extent_centre(y_vol)
-                        if centre is None:
-                            # Presumably data augmentation has pushed the label out of view.
-                            continue
-
-                        for axis, centre_ax in enumerate(centre):
-                            # Get slices.
-                            slices = tuple([centre_ax if i == axis else slice(0, x_vol.shape[i]) for i in range(0, len(x_vol.shape))])
-                            x_img, y_img, y_hat_img = x_vol[slices], y_vol[slices], y_hat_vol[slices]
-
-                            # Fix orientation.
-                            if axis == 0 or axis == 1:
-                                x_img = np.rot90(x_img)
-                                y_img = np.rot90(y_img)
-                                y_hat_img = np.rot90(y_hat_img)
-                            elif axis == 2:
-                                x_img = np.transpose(x_img)
-                                y_img = np.transpose(y_img) 
-                                y_hat_img = np.transpose(y_hat_img)
-
-                            # Send image.
-                            region = self.__channel_region_map[j]
-                            title = f'desc:{desc}:region:{region}:axis:{axis}'
-                            caption = desc,
-                            masks = {
-                                'ground_truth': {
-                                    'mask_data': y_img,
-                                    'class_labels': class_labels
-                                },
-                                'predictions': {
-                                    'mask_data': y_hat_img,
-                                    'class_labels': class_labels
-                                }
+                    # Skip channel if not present.
+                    pairs += [(i, j) for j in range(y.shape[1]) if mask_np[i, j]]
+
+                if len(pairs) == 0:
+                    return
+
+                # Get centres of extent of ground truth for the whole batch.
+                y = y.bool()
+                centres, present = self.__batch_extent_centres(y)
+                # Presumably data augmentation has pushed the label out of view.
+                pairs = [(i, j) for i, j in pairs if present[i, j]]
+                if len(pairs) == 0:
+                    return
+
+                # Gather the centre slices for all pairs on the device and copy one (K, H, W) stack per
+                # axis, rather than the full volumes.
+                if y_hat_labels is None:
+                    y_hat_labels = y_hat.argmax(axis=1)
+                y_hat = y_hat_labels.to(torch.uint8)
+                sample_idxs = torch.tensor([i for i, _ in pairs], device=y.device)
+                channel_idxs = torch.tensor([j for _, j in pairs], device=y.device)
+                axis_idxs = torch.tensor(np.array([centres[i, j] for i, j in pairs]), device=y.device)
+                class_labels = {
+                    1: 'foreground'
+                }
+                for axis in range(3):
+                    centre_idxs = axis_idxs[:, axis]
+                    spatial = [slice(None)] * axis + [centre_idxs]
+                    x_imgs = x[(sample_idxs, 0, *spatial)]
+                    y_imgs = y[(sample_idxs, channel_idxs, *spatial)]
+                    y_hat_imgs = y_hat[(sample_idxs, *spatial)] == channel_idxs.view(-1, 1, 1)
+
+                    # Fix orientation.
+                    if axis == 0 or axis == 1:
+                        x_imgs, y_imgs, y_hat_imgs = [torch.rot90(t, dims=(1, 2)) for t in (x_imgs, y_imgs, y_hat_imgs)]
+                    elif axis == 2:
+                        x_imgs, y_imgs, y_hat_imgs = [t.transpose(1, 2) for t in (x_imgs, y_imgs, y_hat_imgs)]
+                    x_imgs, y_imgs, y_hat_imgs = x_imgs.cpu().numpy(), y_imgs.cpu().numpy(), y_hat_imgs.cpu().numpy()
+
+                    for k, (i, j) in enumerate(pairs):
+                        # Send image.
+                        desc = descs[i]
+                        region = self.__channel_region_map[j]
+                        title = f'desc:{desc}:region:{region}:axis:{axis}'
+                        caption = desc,
+                        masks = {
+                            'ground_truth': {
+                                'mask_data': y_imgs[k],
+                                'class_labels': class_labels
+                            },
+                            'predictions': {
+                                'mask_data': y_hat_imgs[k],
+                                'class_labels': class_labels
                             }
-                            self.logger.log_image(key=title, images=[x_img], caption=caption, masks=[masks], step=self.global_step)
+                        }
+                        self.logger.log_image(key=title, images=[x_imgs[k]], caption=caption, masks=[masks], step=self.global_step)
 
     def on_validation_epoch_end(self):
         if self.__use_complexity_weights:
@@ -580,19 +622,20 @@ class AdaptiveSegmenter(pl.LightningModule):
                     # Skip if region wasn't present in validation samples.
                     logging.info(f"Skipping complexity weights for region '{region}'. Wasn't present in validation samples.")
                     continue
-                epoch_mean_loss = np.mean(self.__complexity_weights_batch_losses[region])
-                if region in self.__complexity_weights_epoch_mean_losses:
-                    self.__complexity_weights_epoch_mean_losses[region] += [epoch_mean_loss]
-                else:
-                    self.__complexity_weights_epoch_mean_losses[region] = [epoch_mean_loss]
+                loss_sum, n_losses = self.__complexity_weights_batch_losses[region]
+                epoch_mean_loss = (loss_sum / n_losses).item()
                 self.log(f'train/cw-loss/{region}', epoch_mean_loss, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
 
+                # Store epoch means in a circular buffer, as only the last 'window' epochs are used.
+                if region not in self.__complexity_weights_epoch_mean_losses:
+                    self.__complexity_weights_epoch_mean_losses[region] = [np.empty(self.__complexity_weights_window, dtype=np.float32), 0]
+                epoch_mean_losses, n_epochs = self.__complexity_weights_epoch_mean_losses[region]
+                epoch_mean_losses[n_epochs % self.__complexity_weights_window] = epoch_mean_loss
+                n_epochs += 1
+                self.__complexity_weights_epoch_mean_losses[region][1] = n_epochs
+
                 # Calculate rolling loss.
-                epoch_mean_losses = self.__complexity_weights_epoch_mean_losses[region]
-                if len(epoch_mean_losses) < self.__complexity_weights_window:
-                    self.__complexity_weights_rolling_losses[region] = np.mean(epoch_mean_losses)
-                else:
-                    self.__complexity_weights_rolling_losses[region] = np.mean(epoch_mean_losses[-self.__complexity_weights_window:])
+                self.__complexity_weights_rolling_losses[region] = epoch_mean_losses[:min(n_epochs, self.__complexity_weights_window)].mean()
                 self.log(f'train/cw-rolling-loss/{region}', self.__complexity_weights_rolling_losses[region], on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
 
             # Reset batch mean losses.
@@ -609,11 +652,11 @@ class AdaptiveSegmenter(pl.LightningModule):
 
                 # Calculate mean value.
                 region = self.__channel_region_map[i]
-                if region not in self.__cw_batch_mean_dices:
+                if self.__cw_dice_counts[i] == 0:
                     # Skip if region wasn't present in validation samples.
                     logging.info(f"Skipping \"convergence weighting\" for region '{region}'. Wasn't present in validation samples.")
                     continue
-                epoch_mean_dice = np.mean(self.__cw_batch_mean_dices[region])
+                epoch_mean_dice = self.__cw_dice_sums[i] / self.__cw_dice_counts[i]
                 self.log(f'val/dw/dice/{region}', epoch_mean_dice, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
 
                 # Check OAR convergence state.
@@ -671,7 +714,41 @@ class AdaptiveSegmenter(pl.LightningModule):
                 self.log(f'val/dw/cvg/epochs-below/{region}', float(epochs_below), on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
 
             # Reset batch means.
-            self.__cw_batch_mean_dices = {}
+            self.__cw_dice_sums[:] = 0
+            self.__cw_dice_counts[:] = 0
+
+    def __batch_dice(
+        self,
+        y_hat: torch.Tensor,
+        y: torch.Tensor) -> np.ndarray:
+        # Returns the (B, C) dice scores for argmax labels 'y_hat' (B, X, Y, Z) and one-hot labels 'y' (B, C, X, Y, Z).
+        # Matches 'dice', i.e. empty prediction and label give 1.
+        channels = torch.arange(y.shape[1], device=y.device).view(1, -1, 1, 1, 1)
+        y_hat = y_hat.unsqueeze(1) == channels
+        y = y.bool()
+        axes = (2, 3, 4)
+        intersection = (y_hat & y).sum(axes)
+        total = y_hat.sum(axes) + y.sum(axes)
+        dices = torch.where(total > 0, 2 * intersection / total.clamp(min=1), torch.ones_like(total, dtype=torch.float32))
+        return dices.cpu().numpy()
+
+    def __batch_extent_centres(
+        self,
+        y: torch.Tensor) -> Tuple[np.ndarray, np.ndarray]:
+        # Returns the (B, C, 3) extent centres and (B, C) presence flags for boolean labels 'y' (B, C, X, Y, Z).
+        # Matches 'get_extent_centre' per volume.
+        spatial_axes = (2, 3, 4)
+        centres = []
+        for axis in spatial_axes:
+            proj = y.any(dim=tuple(a for a in spatial_axes if a != axis))
+            n = proj.shape[-1]
+            idxs = torch.arange(n, device=y.device)
+            min = torch.where(proj, idxs, n).min(dim=-1).values
+            max = torch.where(proj, idxs, -1).max(dim=-1).values
+            centres.append(torch.div(min + max, 2, rounding_mode='floor'))
+        present = proj.any(dim=-1)
+        centres = torch.stack(centres, dim=-1)
+        return centres.cpu().numpy(), present.cpu().numpy()
 
     def __write_loss(
         self,
@@ -6,7 +6,7 @@ import torch
 from torch import nn
 from torch.optim import Adam
 from torch.optim.lr_scheduler import CyclicLR, MultiStepLR, ReduceLROnPlateau
-from typing import Dict, List, Literal, Optional, OrderedDict, Tuple, Union
+from typing import Callable, Dict, List, Literal, Optional, OrderedDict, Tuple, Union
 
 from mymi import config
 from mymi import logging
@@ -32,6 +32,8 @@ class RegSegModel(pl.LightningModule):
         model_name: str = 'model-name',
         model_type: str = 'reg',
         run_name: str = 'run-name',
+        transform_gpu: Optional[Callable] = None,
+        use_channels_last: bool = False,
         use_lr_scheduler: bool = False,
         use_weights: bool = False,
         weight_decay: float = 0,
@@ -52,6 +54,8 @@ class RegSegModel(pl.LightningModule):
         self.__model_type = model_type
         self.__name = None
         self.__run_name = run_name
+        self.__transform_gpu = transform_gpu
+        self.__use_channels_last = use_channels_last
         self.__use_lr_scheduler = use_lr_scheduler
         self.__weight_decay = weight_decay
 
@@ -62,6 +66,9 @@ class RegSegModel(pl.LightningModule):
         else:
             raise ValueError(f"Invalid 'model_type' '{model_type}'.")
         self.__network = MultiUNet3D(self.__n_output_channels, n_input_channels=self.__n_input_channels, use_softmax=False, **kwargs)
+        if self.__use_channels_last:
+            # Channels-last layout lets cuDNN use its NDHWC tensor-core conv kernels.
+            self.__network = self.__network.to(memory_format=torch.channels_last_3d)
 
         if self.__lr_find:
             # Create CSV file.
@@ -125,14 +132,21 @@ class RegSegModel(pl.LightningModule):
 
         return opt
 
+    def optimizer_zero_grad(self, epoch, batch_idx, optimizer):
+        # Release gradients rather than writing zeros to them.
+        optimizer.zero_grad(set_to_none=True)
+
     def forward(
         self,
         x: torch.Tensor) -> torch.Tensor:
+        if self.__use_channels_last:
+            x = x.contiguous(memory_format=torch.channels_last_3d)
         return self.__network(x)
 
     def training_step(self, batch, batch_idx):
         # Forward pass.
         desc, fixed_input, moving_input, fixed_label, moving_label, fixed_mask, moving_mask, weights = batch
+        fixed_input, moving_input = fixed_input.float(), moving_input.float()   # Inputs may be loaded in their stored dtype.
         batch_size = len(desc)
         assert batch_size == 1
 
@@ -149,25 +163,40 @@ class RegSegModel(pl.LightningModule):
         else:
             self.log('train/loss', loss, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
 
-        # Report metrics.
-        fixed_input = fixed_input.cpu().numpy()
-        y_hat = y_hat.detach().cpu().numpy()
+        # Report metrics. Only copy volumes to the CPU if a metric needs them.
         if 'ncc' in self.__metrics:
+            fixed_input = fixed_input.cpu().numpy()
+            y_hat = y_hat.detach().cpu().numpy()
             ncc_val = ncc(y_hat, fixed_input)
             self.log(f'train/ncc', ncc_val, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
 
         return loss
 
+    def on_after_batch_transfer(self, batch, dataloader_idx):
+        # Apply training augmentation on the device, after the batch has been transferred.
+        if self.__transform_gpu is None or not self.trainer.training:
+            return batch
+
+        # Transform fixed/moving data together, so that both share the sampled affine.
+        desc, fixed_input, moving_input, fixed_label, moving_label, fixed_mask, moving_mask, weights = batch
+        n_input_channels = fixed_input.shape[1]
+        n_label_channels = fixed_label.shape[1]
+        input = torch.cat((fixed_input, moving_input), dim=1).float()    # Don't resample in a narrow stored dtype.
+        label = torch.cat((fixed_label, moving_label), dim=1)
+        input, label = self.__transform_gpu(input, label)
+        fixed_input, moving_input = input[:, :n_input_channels], input[:, n_input_channels:]
+        fixed_label, moving_label = label[:, :n_label_channels], label[:, n_label_channels:]
+
+        return desc, fixed_input, moving_input, fixed_label, moving_label, fixed_mask, moving_mask, weights
+
     def validation_step(self, batch, batch_idx):
         desc, fixed_input, moving_input, fixed_label, moving_label, fixed_mask, moving_mask, weights = batch
+        fixed_input, moving_input = fixed_input.float(), moving_input.float()   # Inputs may be loaded in their stored dtype.
         batch_size = len(desc)
         assert batch_size == 1
 
         # Forward pass.
-        fixed_input = fixed_input.unsqueeze(1)
-        moving_input = moving_input.unsqueeze(1)
         input = torch.cat((fixed_input, moving_input), dim=1)
-        input = input.type(torch.float32)       # Why do we need this???
         dvf = self.forward(input)
         y_hat = apply_dvf(moving_input, dvf)
 
@@ -176,24 +205,26 @@ class RegSegModel(pl.LightningModule):
         self.log('val/loss', loss, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
 
         # Record gpu usage.
-        for i, usage_mb in enumerate(gpu_usage_nvml()):
-            self.log(f'gpu/{i}', usage_mb, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
+        self.log_dict(dict((f'gpu/{i}', usage_mb) for i, usage_mb in enumerate(gpu_usage_nvml())), on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
 
-        # Report metrics.
-        fixed_input = fixed_input.cpu().numpy()
-        y_hat = y_hat.cpu().numpy()
+        # Report metrics. Only copy volumes to the CPU if a metric needs them.
         if 'ncc' in self.__metrics:
+            fixed_input = fixed_input.cpu().numpy()
+            y_hat = y_hat.cpu().numpy()
             ncc_val = ncc(y_hat, fixed_input)
             self.log(f'val/ncc', ncc_val, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
 
             # Save metrics to calculate mean across validation set. Used to track convergence.
+            # Store running (sum, count) rather than a list of values.
             if 'val/ncc' not in self.__mean_metrics:
-                self.__mean_metrics['val/ncc'] = []
-            self.__mean_metrics['val/ncc'] += [ncc_val]
+                self.__mean_metrics['val/ncc'] = [0.0, 0]
+            self.__mean_metrics['val/ncc'][0] += ncc_val
+            self.__mean_metrics['val/ncc'][1] += 1
 
     def on_validation_epoch_end(self):
         if 'ncc' in self.__metrics:
-            mean_ncc = np.mean(self.__mean_metrics['val/ncc'])
+            ncc_sum, n_values = self.__mean_metrics['val/ncc']
+            mean_ncc = ncc_sum / n_values
             self.log(f'val/internal/ncc', mean_ncc, on_epoch=self.__log_on_epoch, on_step=self.__log_on_step)
 
         # Reset mean metrics.
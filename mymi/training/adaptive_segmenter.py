@@ -10,6 +10,7 @@ import torch
 from typing import List, Optional, Union
 
 from mymi import config
+from mymi.dataset.training_adaptive import TrainingAdaptiveDataset
 from mymi.loaders import AdaptiveLoader
 from mymi.loaders.augmentation import get_transforms
 from mymi.loaders.hooks import naive_crop
@@ -18,6 +19,8 @@ from mymi.losses import DiceLoss, DiceWithFocalLoss
 from mymi.models import replace_ckpt_alias
 from mymi.models.systems import AdaptiveSegmenter
 from mymi.regions import RegionList, region_to_list
+from mymi.transforms import BatchAffine
+from mymi.training.async_checkpoint_io import SnapshotAsyncCheckpointIO
 from mymi.reporting.loaders import get_adaptive_loader_manifest
 from mymi.types import PatientRegions
 from mymi.utils import arg_to_list
@@ -29,10 +32,13 @@ def train_adaptive_segmenter(
     region: PatientRegions,
     model_name: str,
     run_name: str,
+    async_ckpt: bool = False,
     batch_size: int = 1,
     ckpt_model: bool = True,
+    compile_model: bool = False,
     complexity_weights_factor: float = 1,
     complexity_weights_window: int = 5,
+    cudnn_benchmark: bool = False,
     cw_cvg_calculate: bool = True,
     cw_cvg_delay_above: int = 20,
     cw_cvg_delay_below: int = 5,
@@ -43,11 +49,16 @@ def train_adaptive_segmenter(
     dilate_iters: Optional[List[int]] = None,
     dilate_region: Optional[PatientRegions] = None,
     dilate_schedule: Optional[List[int]] = None,
+    gpu_aug_rotation: float = 5,
+    gpu_aug_scale: float = 0.2,
+    gpu_aug_translation: float = 10,
     grad_acc: int = 1,
     halve_channels: bool = False,
     lam: float = 0.5,
+    loader_half_precision: bool = False,
     loader_load_all_samples: bool = False,
     loader_shuffle_samples: bool = True,
+    loader_use_cuda_prefetcher: bool = False,
     loss_fn: str = 'dice_with_focal',
     lr_find: bool = False,
     lr_find_min_lr: float = 1e-6,
@@ -59,7 +70,7 @@ def train_adaptive_segmenter(
     n_folds: Optional[int] = None,
     n_gpus: int = 1,
     n_nodes: int = 1,
-    n_workers: int = 1,
+    n_workers: Optional[int] = None,
     n_split_channels: int = 2,
     p_val: float = 0.2,
     precision: Union[str, int] = 'bf16',
@@ -78,15 +89,18 @@ def train_adaptive_segmenter(
     thresh_low: Optional[float] = None,
     thresh_high: Optional[float] = None,
     use_augmentation: bool = True,
+    use_channels_last: bool = False,
     use_complexity_weights: bool = False,
     use_cvg_weighting: bool = False,
     use_dilation: bool = False,
     use_elastic: bool = False,
+    use_gpu_augmentation: bool = False,
     use_loader_grouping: bool = False,
     use_loader_split_file: bool = False,
     use_logger: bool = False,
     use_lr_scheduler: bool = False,
     use_stand: bool = False,
+    use_tf32: bool = False,
     use_thresh: bool = False,
     use_weights: bool = False,
     val_image_interval: int = 50,
@@ -97,6 +111,10 @@ def train_adaptive_segmenter(
     logging.arg_log('Training model', ('dataset', 'model_name', 'run_name'), (dataset, model_name, run_name))
     regions = region_to_list(region)
 
+    # 'CUDAPrefetcher' isn't a 'DataLoader', so Lightning can't inject a 'DistributedSampler' and each rank would iterate the full dataset.
+    if loader_use_cuda_prefetcher and n_gpus * n_nodes > 1:
+        raise ValueError(f"Can't use 'loader_use_cuda_prefetcher' with multiple devices (n_gpus={n_gpus}, n_nodes={n_nodes}).")
+
     # Ensure model parameter initialisation is deterministic.
     seed_everything(random_seed, workers=True)
 
@@ -106,7 +124,20 @@ def train_adaptive_segmenter(
     else:
         transform_train = None
         transform_val = None
+
+    # Move the random affine onto the GPU, the loader only applies the (intensity) validation transform.
+    if use_augmentation and use_gpu_augmentation:
+        if use_elastic:
+            raise ValueError(f"Can't use 'use_elastic' with 'use_gpu_augmentation', elastic deformation is only applied by the CPU training transform.")
+
+        # Loaders require consistent spacing across datasets, so use the first.
+        spacing = TrainingAdaptiveDataset(arg_to_list(dataset, str)[0]).params['spacing']
+        transform_train = transform_val
+        transform_gpu = BatchAffine(rotation=gpu_aug_rotation, scale=gpu_aug_scale, spacing=spacing, translation=gpu_aug_translation)
+    else:
+        transform_gpu = None
     logging.info(f"Training transform: {transform_train}")
+    logging.info(f"Training GPU transform: {transform_gpu}")
     logging.info(f"Validation transform: {transform_val}")
 
     # Define loss function.
@@ -175,7 +206,7 @@ def train_adaptive_segmenter(
         epoch = 0
 
     # Create data loaders.
-    train_loader, val_loader, _ = AdaptiveLoader.build_loaders(dataset, batch_size=batch_size, epoch=epoch, load_all_samples=loader_load_all_samples, n_folds=n_folds, n_workers=n_workers, p_val=p_val, random_seed=random_seed, region=regions, shuffle_samples=loader_shuffle_samples, test_fold=test_fold, transform_train=transform_train, transform_val=transform_val, use_grouping=use_loader_grouping, use_split_file=use_loader_split_file)
+    train_loader, val_loader, _ = AdaptiveLoader.build_loaders(dataset, batch_size=batch_size, epoch=epoch, half_precision=loader_half_precision, load_all_samples=loader_load_all_samples, n_folds=n_folds, n_workers=n_workers, p_val=p_val, random_seed=random_seed, region=regions, shuffle_samples=loader_shuffle_samples, test_fold=test_fold, transform_train=transform_train, transform_val=transform_val, use_cuda_prefetcher=loader_use_cuda_prefetcher, use_grouping=use_loader_grouping, use_split_file=use_loader_split_file)
 
     # Infer convergence thresholds from dataset name.
     # We need these even when 'use_cvg_weighting=False' as it allows us to track
@@ -226,6 +257,8 @@ def train_adaptive_segmenter(
         random_seed=random_seed,
         region=regions,
         run_name=run_name,
+        transform_gpu=transform_gpu,
+        use_channels_last=use_channels_last,
         use_complexity_weights=use_complexity_weights,
         use_cvg_weighting=use_cvg_weighting,
         use_dilation=use_dilation,
@@ -268,27 +301,55 @@ def train_adaptive_segmenter(
     if logger:
         callbacks.append(LearningRateMonitor(logging_interval='epoch'))
     
-    # Perform training.
+    # BF16 needs no loss scaling, but isn't supported on pre-Ampere GPUs. Fall back to FP16,
+    # for which Lightning adds a GradScaler.
+    if precision == 'bf16' and n_gpus > 0 and not torch.cuda.is_bf16_supported():
+        logging.warning("BF16 not supported on GPU, using 'precision=16'.")
+        precision = 16
+
+    # Allow TF32 tensor cores for any FP32 matmuls/convs left outside autocast. Note that these
+    # are process-wide settings.
+    if use_tf32 and n_gpus > 0:
+        torch.set_float32_matmul_precision('high')
+        torch.backends.cudnn.allow_tf32 = True
+
+    # Use one process per GPU (DDP) for multi-GPU/multi-node training. Gradient all-reduce overlaps
+    # with the backward pass, and Lightning shards the train/val samplers per rank.
+    strategy = 'ddp' if n_gpus * n_nodes > 1 else 'auto'
+
+    # Write checkpoints from a background thread, so training isn't blocked on disk I/O.
+    plugins = [SnapshotAsyncCheckpointIO()] if async_ckpt else None
+
+    # Perform training. cuDNN's algorithm search ('benchmark') is re-run for each new input shape,
+    # and batches are padded to their own max size, so only enable for fixed crop sizes.
     trainer = Trainer(
         accelerator='gpu' if n_gpus > 0 else 'cpu',
         accumulate_grad_batches=grad_acc,
+        benchmark=cudnn_benchmark,
         callbacks=callbacks,
         devices=list(range(n_gpus)) if n_gpus > 0 else 1,
         logger=logger,
         max_epochs=n_epochs,
         num_nodes=n_nodes,
         num_sanity_val_steps=0,
-        precision=precision)
+        plugins=plugins,
+        precision=precision,
+        strategy=strategy)
 
     if lr_find:
         logging.arg_log('Performing LR find', ('min_lr', 'max_lr', 'n_iter'), (lr_find_min_lr, lr_find_max_lr, lr_find_n_iter))
         tuner = Tuner(trainer)
         lr = tuner.lr_find(model, train_loader, val_loader, early_stop_threshold=None, min_lr=lr_find_min_lr, max_lr=lr_find_max_lr, num_training=lr_find_n_iter)
         logging.info(lr.results)
+
+        # Save the suggested LR with the results, so it's not recomputed from the saved lists.
+        results = dict(lr.results)
+        results['suggestion'] = lr.suggestion()
+        logging.info(f"Suggested LR: {results['suggestion']}")
         filepath = os.path.join(config.directories.models, model_name, run_name, 'lr-finder.json')
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
         with open(filepath, 'w') as f:
-            f.write(json.dumps(lr.results))
+            f.write(json.dumps(results))
 
         # Don't proceed with training.
         return
@@ -300,5 +361,8 @@ def train_adaptive_segmenter(
     filepath = os.path.join(folderpath, 'adaptive-loader-manifest.csv')
     man_df.to_csv(filepath, index=False)
 
-    # Train the model.
+    # Train the model. Lightning unwraps compiled modules when saving checkpoints. Batches are padded
+    # to their own max size, so compile for dynamic shapes rather than recompiling for each new shape.
+    if compile_model:
+        model = torch.compile(model, dynamic=True, mode='max-autotune')
     trainer.fit(model, train_loader, val_loader, **opt_kwargs)
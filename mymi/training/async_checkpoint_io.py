@@ -0,0 +1,15 @@
+from lightning_utilities.core.apply_func import apply_to_collection
+from pytorch_lightning.plugins.io import AsyncCheckpointIO
+from torch import Tensor
+from typing import Any, Dict, Optional
+
+class SnapshotAsyncCheckpointIO(AsyncCheckpointIO):
+    def save_checkpoint(
+        self,
+        checkpoint: Dict[str, Any],
+        path: str,
+        storage_options: Optional[Any] = None) -> None:
+        # 'AsyncCheckpointIO' passes the live checkpoint to its thread, so tensors could be updated by the
+        # next optimiser step while being serialised. Save a detached CPU snapshot instead.
+        checkpoint = apply_to_collection(checkpoint, Tensor, lambda t: t.detach().to('cpu', copy=True))
+        super().save_checkpoint(checkpoint, path, storage_options=storage_options)
@@ -1,8 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import numpy as np
 import pandas as pd
 from pydicom import read_file
 from pydicom.dataset import FileDataset
+from pydicom.uid import ExplicitVRLittleEndian, ImplicitVRLittleEndian
 from typing import List
 
 from dicomset import types
@@ -10,14 +12,20 @@ from dicomset import types
 from .dicom_series import DICOMModality, DICOMSeries, SeriesInstanceUID
 
 CLOSENESS_ABS_TOL = 1e-10;
+GEOMETRY_TAGS = ['Columns', 'ImagePositionPatient', 'PixelSpacing', 'Rows']
+MAX_READ_WORKERS = 16
 STUDY_DATE_FMT = '%Y%m%d'
+UNCOMPRESSED_TRANSFER_SYNTAXES = (ExplicitVRLittleEndian, ImplicitVRLittleEndian)
 
 class CTSeries(DICOMSeries):
     def __init__(
         self,
         study: 'DICOMStudy',
         id: SeriesInstanceUID):
+        self.__ct_headers = None    # Lazy-loaded.
+        self.__cts = None           # Lazy-loaded.
         self.__data = None          # Lazy-loaded.
+        self.__first_ct = None      # Lazy-loaded.
         self.__global_id = f"{study} - {id}"
         self.__offset = None        # Lazy-loaded.
         self.__size = None   # Lazy-loaded.
@@ -56,7 +64,7 @@ class CTSeries(DICOMSeries):
     @property
     def offset(self) -> types.PhysPoint3D:
         if self.__offset is None:
-            self.__load_ct_data()
+            self.__load_ct_geometry()
         return self.__offset
 
     @property
@@ -66,13 +74,13 @@ class CTSeries(DICOMSeries):
     @property
     def size(self) -> types.ImageSpacing3D:
         if self.__size is None:
-            self.__load_ct_data()
+            self.__load_ct_geometry()
         return self.__size
 
     @property
     def spacing(self) -> types.ImageSpacing3D:
         if self.__spacing is None:
-            self.__load_ct_data()
+            self.__load_ct_geometry()
         return self.__spacing
 
     @property
@@ -81,27 +89,92 @@ class CTSeries(DICOMSeries):
 
     @property
     def study_date(self) -> datetime:
-        dt_str = self.get_cts()[0].StudyDate
+        dt_str = self.first_ct.StudyDate
         return datetime.strptime(dt_str, STUDY_DATE_FMT)
     
+    def summary(self) -> pd.DataFrame:
+        cts = self.get_cts()
+
+        # Reduce raw pixel data per slice and only rescale the extremes to HU, rather than
+        # converting every slice to HU.
+        pixel_arrays = [self.__pixel_array(ct) for ct in cts]
+        raw_mins = np.array([p.min() for p in pixel_arrays], dtype=np.float64)
+        raw_maxs = np.array([p.max() for p in pixel_arrays], dtype=np.float64)
+        slopes = np.array([ct.RescaleSlope for ct in cts], dtype=np.float64)
+        intercepts = np.array([ct.RescaleIntercept for ct in cts], dtype=np.float64)
+        hu_a = slopes * raw_mins + intercepts
+        hu_b = slopes * raw_maxs + intercepts
+        hu_min = np.minimum(hu_a, hu_b).min()
+        hu_max = np.maximum(hu_a, hu_b).max()
+
+        # Get number of missing slices.
+        z_extent = cts[-1].ImagePositionPatient[2] - cts[0].ImagePositionPatient[2]
+        num_missing = int(round(z_extent / self.spacing[2])) + 1 - len(cts)
+
+        cols = {
+            'hu-max': float,
+            'hu-min': float,
+            'num-missing': int,
+            'offset-x': float,
+            'offset-y': float,
+            'offset-z': float,
+            'size-x': int,
+            'size-y': int,
+            'size-z': int,
+            'spacing-x': float,
+            'spacing-y': float,
+            'spacing-z': float
+        }
+        data = {
+            'hu-max': hu_max,
+            'hu-min': hu_min,
+            'num-missing': num_missing
+        }
+        for axis, (offset, size, spacing) in zip(('x', 'y', 'z'), zip(self.offset, self.size, self.spacing)):
+            data[f'offset-{axis}'] = offset
+            data[f'size-{axis}'] = size
+            data[f'spacing-{axis}'] = spacing
+        df = pd.DataFrame([data], columns=cols.keys()).astype(cols)
+
+        return df
+
+    def get_ct_headers(self) -> List[FileDataset]:
+        # Full CT reads include the geometry tags, so reuse them if present.
+        if self.__cts is not None:
+            return self.__cts
+        if self.__ct_headers is None:
+            self.__load_ct_headers()
+        return self.__ct_headers
+
     def get_cts(self) -> List[FileDataset]:
-        ct_paths = list(self.__index['filepath'])
-        cts = [read_file(f) for f in ct_paths]
-        cts = list(sorted(cts, key=lambda c: c.ImagePositionPatient[2]))
-        return cts
+        if self.__cts is None:
+            self.__load_cts()
+        return self.__cts
 
     @property
     def first_ct(self) -> FileDataset:
-        filepath = list(self.__index['filepath'])[0]
-        ct = read_file(filepath)
-        return ct
+        # Only header fields (e.g. patient/study details) are read from the first CT, so don't parse
+        # pixel data.
+        if self.__first_ct is None:
+            filepath = list(self.__index['filepath'])[0]
+            self.__first_ct = read_file(filepath, stop_before_pixels=True)
+        return self.__first_ct
 
     def __verify_index(self) -> None:
         if len(self.__index) == 0:
             raise ValueError(f"CTSeries '{self}' not found in index for study '{self.__study}'.")
 
-    def __load_ct_data(self) -> None:
-        cts = self.get_cts()
+    def __load_cts(self) -> None:
+        cts = self.__read_cts()
+        self.__cts = list(sorted(cts, key=lambda c: c.ImagePositionPatient[2]))
+
+    def __load_ct_headers(self) -> None:
+        # Only geometry tags are required, so don't parse pixel data.
+        cts = self.__read_cts(specific_tags=GEOMETRY_TAGS, stop_before_pixels=True)
+        self.__ct_headers = list(sorted(cts, key=lambda c: c.ImagePositionPatient[2]))
+
+    def __load_ct_geometry(self) -> None:
+        cts = self.get_ct_headers()
 
         # Store offset.
         # Indexing checked that all 'ImagePositionPatient' keys were the same for the series.
@@ -111,8 +184,8 @@ class CTSeries(DICOMSeries):
         # Store size.
         # Indexing checked that CT slices had consisent x/y spacing in series.
         self.__size = (
-            cts[0].pixel_array.shape[1],
-            cts[0].pixel_array.shape[0],
+            int(cts[0].Columns),
+            int(cts[0].Rows),
             len(cts)
         )
 
@@ -124,20 +197,53 @@ class CTSeries(DICOMSeries):
             np.abs(cts[1].ImagePositionPatient[2] - cts[0].ImagePositionPatient[2])
         )
 
+    def __load_ct_data(self) -> None:
+        cts = self.get_cts()
+
         # Store CT data.
-        data = np.zeros(shape=self.__size)
-        for ct in cts:
-            # Convert values to HU.
-            ct_data = np.transpose(ct.pixel_array)      # 'pixel_array' contains row-first image data.
-            ct_data = ct.RescaleSlope * ct_data + ct.RescaleIntercept
-
-            # Get z index.
-            z_offset =  ct.ImagePositionPatient[2] - self.__offset[2]
-            z_idx = int(round(z_offset / self.__spacing[2]))
-
-            # Add data.
-            data[:, :, z_idx] = ct_data
-        self.__data = data
+        # Slices are sorted by z-position and indexing checked that they are equally spaced, so
+        # stack slices in order and rescale the whole volume at once.
+        data = np.empty(shape=(len(cts), int(cts[0].Rows), int(cts[0].Columns)), dtype=np.float32)
+        for i, ct in enumerate(cts):
+            data[i] = self.__pixel_array(ct)
+
+        # Convert values to HU.
+        # Rescale params are almost always shared by all slices, in which case apply them as scalars
+        # and skip identity operations.
+        slopes = np.array([ct.RescaleSlope for ct in cts], dtype=np.float32)
+        intercepts = np.array([ct.RescaleIntercept for ct in cts], dtype=np.float32)
+        if np.all(slopes == slopes[0]) and np.all(intercepts == intercepts[0]):
+            if slopes[0] != 1:
+                data *= slopes[0]
+            if intercepts[0] != 0:
+                data += intercepts[0]
+        else:
+            data *= slopes[:, np.newaxis, np.newaxis]
+            data += intercepts[:, np.newaxis, np.newaxis]
+
+        # Data is stored (z, y, x) as 'pixel_array' contains row-first image data.
+        self.__data = np.transpose(data)
+
+    def __pixel_array(
+        self,
+        ct: FileDataset) -> np.ndarray:
+        # Uncompressed little-endian pixel data can be viewed directly. This skips pydicom's handler
+        # dispatch and the decoded copy it caches on each (cached) dataset. Compressed data uses
+        # pydicom's handlers, which use 'gdcm'/'pylibjpeg' if installed.
+        if ct.file_meta.TransferSyntaxUID in UNCOMPRESSED_TRANSFER_SYNTAXES and ct.BitsAllocated == 16 and ct.SamplesPerPixel == 1:
+            dtype = '<i2' if ct.PixelRepresentation == 1 else '<u2'
+            return np.frombuffer(ct.PixelData, dtype=dtype, count=ct.Rows * ct.Columns).reshape(ct.Rows, ct.Columns)
+        return ct.pixel_array
+
+    def __read_cts(
+        self,
+        **kwargs) -> List[FileDataset]:
+        # Slice reads are independent and I/O bound, so overlap them across threads.
+        ct_paths = list(self.__index['filepath'])
+        n_workers = max(min(MAX_READ_WORKERS, len(ct_paths)), 1)
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            cts = list(executor.map(lambda f: read_file(f, **kwargs), ct_paths))
+        return cts
 
     def __str__(self) -> str:
         return self.__global_id
@@ -182,12 +182,6 @@ class DICOMDataset(Dataset):
         # Filter on 'pat_ids'.
         if pat_id is not None:
             pat_ids = arg_to_list(pat_id, PatientID)
-            def filter_fn(pat_id):
-                if ((isinstance(pat_ids, str) and (pat_ids == 'all' or id == pat_ids)) or
-                    ((isinstance(pat_ids, list) or isinstance(pat_ids, np.ndarray) or isinstance(pat_ids, tuple)) and id in pat_ids)):
-                    return True
-                else:
-                    return False
             pats = list(filter(self.__filter_patient_by_pat_ids(pat_ids), pats))
 
         # Get patient regions.
@@ -204,13 +198,17 @@ class DICOMDataset(Dataset):
     def __filter_patient_by_pat_ids(
         self,
         pat_ids: Union[str, List[str]]) -> Callable[[str], bool]:
-        def fn(id):
-            if ((isinstance(pat_ids, str) and (pat_ids == 'all' or id == pat_ids)) or
-                ((isinstance(pat_ids, list) or isinstance(pat_ids, np.ndarray) or isinstance(pat_ids, tuple)) and id in pat_ids)):
-                return True
-            else:
-                return False
-        return fn
+        # Choose the predicate once, rather than checking 'pat_ids' type per patient, and use
+        # a set for O(1) membership.
+        if isinstance(pat_ids, str):
+            if pat_ids == 'all':
+                return lambda id: True
+            return lambda id: id == pat_ids
+        elif isinstance(pat_ids, (list, np.ndarray, tuple)):
+            pat_ids = frozenset(pat_ids)
+            return lambda id: id in pat_ids
+        else:
+            return lambda id: False
 
     def __filter_patient_by_region(
         self,
@@ -3,7 +3,6 @@ import pandas as pd
 from typing import Any, List, Optional
 
 from dicomset import types
-from dicomset.utils import append_row
 
 from .dicom_study import DICOMStudy
 from .region_map import RegionMap
@@ -49,11 +48,11 @@ class DICOMPatient:
 
     @property
     def age(self) -> str:
-        return getattr(self.get_cts()[0], 'PatientAge', '')
+        return getattr(self.first_ct, 'PatientAge', '')
 
     @property
     def birth_date(self) -> str:
-        return self.get_cts()[0].PatientBirthDate
+        return self.first_ct.PatientBirthDate
 
     @property
     def ct_data(self):
@@ -153,7 +152,7 @@ class DICOMPatient:
 
     @property
     def name(self) -> str:
-        return self.get_cts()[0].PatientName
+        return self.first_ct.PatientName
 
     @property
     def region_policy(self) -> pd.DataFrame:
@@ -161,11 +160,11 @@ class DICOMPatient:
 
     @property
     def sex(self) -> str:
-        return self.get_cts()[0].PatientSex
+        return self.first_ct.PatientSex
 
     @property
     def size(self) -> str:
-        return getattr(self.get_cts()[0], 'PatientSize', '')
+        return getattr(self.first_ct, 'PatientSize', '')
 
     @property
     def study_date(self) -> datetime:
@@ -173,7 +172,7 @@ class DICOMPatient:
 
     @property
     def weight(self) -> str:
-        return getattr(self.get_cts()[0], 'PatientWeight', '')
+        return getattr(self.first_ct, 'PatientWeight', '')
 
     def ct_slice_summary(self, *args, **kwargs):
         return self.default_rtstruct.ref_ct.slice_summary(*args, **kwargs)
@@ -207,7 +206,6 @@ class DICOMPatient:
             'size': str,
             'weight': str
         }
-        df = pd.DataFrame(columns=cols.keys())
 
         # Add data.
         data = {}
@@ -215,11 +213,8 @@ class DICOMPatient:
             col_method = col.replace('-', '_')
             data[col] = getattr(self, col_method)
 
-        # Add row.
-        df = append_row(df, data)
-
-        # Set column types as 'append' crushes them.
-        df = df.astype(cols)
+        # Create dataframe.
+        df = pd.DataFrame([data], columns=cols.keys()).astype(cols)
 
         return df
 
@@ -235,6 +230,9 @@ class DICOMPatient:
     def region_summary(self, *args, **kwargs):
         return self.default_rtstruct.region_summary(*args, **kwargs)
 
+    def region_volume(self, *args, **kwargs):
+        return self.default_rtstruct.region_volume(*args, **kwargs)
+
     def study(
         self,
         id: str) -> DICOMStudy:
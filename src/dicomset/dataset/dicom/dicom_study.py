@@ -136,6 +136,9 @@ class DICOMStudy:
     def region_data(self, *args, **kwargs):
         return self.default_rtstruct.region_data(*args, **kwargs)
 
+    def region_volume(self, *args, **kwargs):
+        return self.default_rtstruct.region_volume(*args, **kwargs)
+
     def series(
         self,
         id: SeriesInstanceUID,
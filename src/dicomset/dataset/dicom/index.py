@@ -12,7 +12,7 @@ from typing import Any, Dict, Optional
 
 from dicomset import config
 from dicomset import logging
-from dicomset.utils import append_dataframe, append_row
+from dicomset.utils import append_dataframe
 
 from ..shared import CT_FROM_REGEXP
 
@@ -133,6 +133,9 @@ def build_index(
             raise ValueError(f"No 'data' folder found for dataset 'DICOM: {dataset}'.")
 
         # Add all DICOM files.
+        # Rows are collected and added to the index once, as appending per file copies the index.
+        rows = []
+        sop_ids = []
         for root, _, files in tqdm(os.walk(data_path)):
             for f in files:
                 # Check if DICOM file.
@@ -185,7 +188,6 @@ def build_index(
                     }
 
                 # Add index entry.
-                data_index = sop_id
                 data = {
                     'dataset': dataset,
                     'patient-id': pat_id,
@@ -195,7 +197,11 @@ def build_index(
                     'filepath': filepath,
                     'mod-spec': mod_spec,
                 }
-                index = append_row(index, data, index=data_index)
+                rows.append(data)
+                sop_ids.append(sop_id)
+
+        crawl_index = pd.DataFrame(rows, columns=INDEX_COLS.keys(), index=pd.Index(sop_ids, name=INDEX_INDEX_COL))
+        index = append_dataframe(index, crawl_index)
     
         # Save index - in case something goes wrong later.
         index.to_csv(temp_filepath, index=True)
@@ -267,9 +273,9 @@ def build_index(
 
         ct = index[index['modality'] == 'CT']
         def consistent_z_position(series: pd.Series) -> bool:
-            z_locs = series.apply(lambda m: m['ImagePositionPatient'][2]).sort_values()
-            z_diffs = z_locs.diff().dropna().round(3)
-            z_diffs = z_diffs.drop_duplicates()
+            z_locs = np.fromiter((m['ImagePositionPatient'][2] for m in series), dtype=np.float64, count=len(series))
+            z_locs.sort()
+            z_diffs = np.unique(np.round(np.diff(z_locs), 3))
             return len(z_diffs) == 1
         cons_z = ct.groupby('series-id')['mod-spec'].transform(consistent_z_position)
         incons_idx = cons_z[~cons_z].index
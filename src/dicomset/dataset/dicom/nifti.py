@@ -44,7 +44,7 @@ def convert_to_nifti(
         pat_regions = patient.list_regions(whitelist=regions)
         region_data = patient.region_data(region=pat_regions)
         for region, data in region_data.items():
-            img = Nifti1Image(data.astype(np.int32), affine)
+            img = Nifti1Image(data.astype(np.uint8), affine)
             filepath = os.path.join(nifti_ds.path, region, f'{pat}.nii.gz')
             os.makedirs(os.path.dirname(filepath), exist_ok=True)
             nib.save(img, filepath)
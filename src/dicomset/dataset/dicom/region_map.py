@@ -1,3 +1,4 @@
+from functools import lru_cache
 import numpy as np
 import os
 import pandas as pd
@@ -18,42 +19,104 @@ class RegionMap:
         data: pd.DataFrame):
         self.__data = data
 
+        # Compile rules once, rather than iterating dataframe rows and regexps on every lookup.
+        # Stored as (regexp, 'after', priority, 'except', 'except-study', 'only', 'only-study').
+        self.__rules = []
+        for _, row in data.iterrows():
+            # Add case sensitivity to regexp.
+            flags = 0
+            if 'case' in row:
+                case = row['case']
+                if not np.isnan(case) and not case:
+                    flags = re.IGNORECASE
+            else:
+                flags = re.IGNORECASE
+
+            # Get priority.
+            priority = None
+            if 'priority' in row and not np.isnan(row['priority']):
+                priority = row['priority']
+
+            rule = (
+                re.compile(row['before'], flags),
+                row['after'],
+                priority,
+                frozenset(row['except']),
+                frozenset(row['except-study']),
+                frozenset(row['only']),
+                frozenset(row['only-study'])
+            )
+            self.__rules.append(rule)
+
+        # If all rules are prioritised, the first match in descending priority order wins and
+        # lookups can stop early. Sort is stable, so ties are still won by the earlier row.
+        self.__all_prioritised = all(r[2] is not None for r in self.__rules)
+        if self.__all_prioritised:
+            self.__rules = list(sorted(self.__rules, key=lambda r: -r[2]))
+        self.__rules = tuple(self.__rules)
+
+        # Combine all rules into a single regexp, used to skip the rule scan for regions that no rule
+        # can match. Per-rule case sensitivity is kept using scoped flags. Only safe when rules have no
+        # groups, as these would be renumbered (e.g. breaking backreferences).
+        self.__any_rule = None
+        if len(self.__rules) > 0 and all(r[0].groups == 0 for r in self.__rules):
+            patterns = [f"(?{'i' if r[0].flags & re.IGNORECASE else '-i'}:{r[0].pattern})" for r in self.__rules]
+            try:
+                self.__any_rule = re.compile('|'.join(patterns))
+            except re.error:
+                # E.g. rules that set global flags.
+                pass
+
     @staticmethod
     def load(filepath: str) -> Optional['RegionMap']:
         if os.path.exists(filepath):
-            # Load file.
-            df = pd.read_csv(filepath)
-
-            # Convert special columns to lists.
-            cols = ['except', 'except-study', 'only', 'only-study']
-            for col in cols:
-                if col in df.columns:
-                    def split_fn(e: Union[float, int, str]) -> List[str]:
-                        if isinstance(e, float):
-                            if np.isnan(e):         # Handle empty cells.
-                                return []
-                            else:                   # Handle patient IDs parsed as floats by pandas.
-                                return [str(int(e))]
-                        elif isinstance(e, str):   # Split comma-separated patient IDs.
-                            return e.split(',')
-                        else:
-                            raise ValueError(f"Can't split unrecognised type '{type(e)}'.")
-                    df[col] = df[col].apply(split_fn)
-                else:
-                    df[col] = [[]] * len(df)
-
-            # # Check that internal region names are entered correctly.
-            # for region in map_df.internal:
-            #     if not is_region(region):
-            #         raise ValueError(f"Error in region map. '{region}' is not an internal region.")
-            
-            return RegionMap(df)
+            # Parsed region maps are memoised for the life of the process, keyed on file modification time
+            # so edits are picked up. The same instance is shared by all callers, so it must not be mutated.
+            return RegionMap.__load_cached(filepath, os.path.getmtime(filepath))
         else:
             return None
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def __load_cached(
+        filepath: str,
+        mtime: float) -> 'RegionMap':
+        # Load file.
+        df = pd.read_csv(filepath)
+
+        # Convert special columns to lists.
+        cols = ['except', 'except-study', 'only', 'only-study']
+        for col in cols:
+            if col in df.columns:
+                def split_fn(e: Union[float, int, str]) -> List[str]:
+                    if isinstance(e, float):
+                        if np.isnan(e):         # Handle empty cells.
+                            return []
+                        else:                   # Handle patient IDs parsed as floats by pandas.
+                            return [str(int(e))]
+                    elif isinstance(e, str):   # Split comma-separated patient IDs.
+                        return e.split(',')
+                    else:
+                        raise ValueError(f"Can't split unrecognised type '{type(e)}'.")
+                df[col] = df[col].apply(split_fn)
+            else:
+                df[col] = [[]] * len(df)
+
+        # # Check that internal region names are entered correctly.
+        # for region in map_df.internal:
+        #     if not is_region(region):
+        #         raise ValueError(f"Error in region map. '{region}' is not an internal region.")
+            
+        return RegionMap(df)
+
     @property
     def data(self) -> pd.DataFrame:
-        return self.__data
+        # Return a copy, as region maps are shared between callers by 'load'.
+        data = self.__data.copy()
+        for col in ['except', 'except-study', 'only', 'only-study']:
+            if col in data.columns:
+                data[col] = data[col].apply(list)
+        return data
 
     def to_internal(
         self,
@@ -62,44 +125,33 @@ class RegionMap:
         study_id: Optional[StudyID] = None) -> Tuple[str, int]:
         pat_id = str(pat_id)
 
-        # Iterate over map rows.
+        # Iterate over map rules.
         match = None
         priority = -np.inf
-        for _, row in self.__data.iterrows():
+        if self.__any_rule is not None and not self.__any_rule.match(region):
+            return region, priority
+        for regexp, after, rule_priority, excpt, except_study, only, only_study in self.__rules:
             # Check except/only/only-study rules that map regions to specific patients.
             if pat_id is not None:
-                excpt = row['except']
                 if pat_id in excpt:
                     continue
-                if study_id is not None:
-                    except_study = row['except-study']
-                    if study_id in except_study:
-                        continue
-                only = row['only']
+                if study_id is not None and study_id in except_study:
+                    continue
                 if len(only) > 0 and pat_id not in only: 
                     continue
-                if study_id is not None:
-                    only_study = row['only-study']
-                    if len(only_study) > 0 and study_id not in only_study: 
-                        continue
+                if study_id is not None and len(only_study) > 0 and study_id not in only_study: 
+                    continue
 
-            # Add case sensitivity to regexp match args.
-            args = []
-            if 'case' in row:
-                case = row['case']
-                if not np.isnan(case) and not case:
-                    args += [re.IGNORECASE]
-            else:
-                args += [re.IGNORECASE]
-                
             # Perform match.
-            if re.match(row['before'], region, *args):
-                if 'priority' in row and not np.isnan(row['priority']):
-                    if row['priority'] > priority:
-                        match = row['after']
-                        priority = row['priority']
+            if regexp.match(region):
+                if rule_priority is not None:
+                    if rule_priority > priority:
+                        match = after
+                        priority = rule_priority
+                        if self.__all_prioritised:
+                            break
                 else:
-                    match = row['after']
+                    match = after
 
         if match is None:
             match = region
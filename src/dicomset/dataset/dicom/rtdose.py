@@ -104,8 +104,8 @@ class RTDOSE(DICOMFile):
 
         # Store dose data.
         pat = self.__series.study.patient
-        data = np.transpose(rtdose.pixel_array)
-        data = rtdose.DoseGridScaling * data
+        data = np.transpose(rtdose.pixel_array).astype(np.float32)
+        data *= rtdose.DoseGridScaling
         self.__data = resample_3D(data, origin=self.__offset, spacing=self.__spacing, output_origin=pat.ct_offset, output_size=pat.ct_size, output_spacing=pat.ct_spacing) 
 
     def __str__(self) -> str:
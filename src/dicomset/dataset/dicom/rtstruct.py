@@ -1,7 +1,10 @@
 import collections
+from concurrent.futures import ThreadPoolExecutor
+import os
+import numpy as np
 import pandas as pd
 import pydicom as dcm
-from typing import Dict, List, Optional, OrderedDict, Tuple, Union
+from typing import Dict, Iterator, List, Optional, OrderedDict, Tuple, Union
 
 <<<<<<< HEAD:mymi/dataset/dicom/rtstruct.py
 from mymi import logging
@@ -19,6 +22,9 @@ from .dicom_series import DICOMModality
 from .region_map import RegionMap
 from .rtstruct_converter import RTSTRUCTConverter
 
+MAX_ROI_WORKERS = 8
+ROI_TAGS = ['ROIContourSequence', 'StructureSetROISequence']
+
 class RTSTRUCT(DICOMFile):
     def __init__(
         self,
@@ -31,6 +37,8 @@ class RTSTRUCT(DICOMFile):
         self.__ref_ct = None        # Lazy-loaded.
         self.__region_dups = region_dups
         self.__region_map = region_map
+        self.__roi_rtstruct = None  # Lazy-loaded.
+        self.__rtstruct = None      # Lazy-loaded.
         self.__series = series
 
         # Get index.
@@ -78,20 +86,19 @@ class RTSTRUCT(DICOMFile):
         return self.__series
 
     def get_rtstruct(self) -> dcm.dataset.FileDataset:
-        return dcm.read_file(self.__path)
+        if self.__rtstruct is None:
+            self.__load_rtstruct()
+        return self.__rtstruct
 
     def get_region_info(
         self,
         use_mapping: bool = True) -> Dict[int, Dict[str, str]]:
         # Load RTSTRUCT dicom.
-        rtstruct = self.get_rtstruct()
-
-        # Get region IDs.
-        roi_info = RTSTRUCTConverter.get_roi_info(rtstruct)
+        rtstruct = self.__get_roi_rtstruct()
 
-        # Filter names on those for which data can be obtained, e.g. some may not have
+        # Get region IDs. Filter names on those for which data can be obtained, e.g. some may not have
         # 'ContourData' and shouldn't be included.
-        roi_info = dict(filter(lambda i: RTSTRUCTConverter.has_roi_data(rtstruct, i[1]['name']), roi_info.items()))
+        roi_info = RTSTRUCTConverter.get_roi_info(rtstruct, has_data=True)
 
         # Map to internal names.
         if use_mapping and self.__region_map:
@@ -119,13 +126,10 @@ class RTSTRUCT(DICOMFile):
         if self.__region_map is None:
             use_mapping = False
 
-        # Get unmapped region names.
-        rtstruct = self.get_rtstruct()
-        unmapped_regions = RTSTRUCTConverter.get_roi_names(rtstruct)
-
-        # Filter regions on those for which data can be obtained, e.g. some may not have
+        # Get unmapped region names. Filter regions on those for which data can be obtained, e.g. some may not have
         # 'ContourData' and shouldn't be included.
-        unmapped_regions = list(filter(lambda r: RTSTRUCTConverter.has_roi_data(rtstruct, r), unmapped_regions))
+        rtstruct = self.__get_roi_rtstruct()
+        unmapped_regions = RTSTRUCTConverter.get_roi_names(rtstruct, has_data=True)
 
         # Map regions using 'region-map.csv'.
         if use_mapping:
@@ -164,7 +168,7 @@ class RTSTRUCT(DICOMFile):
         # Filter on 'only'. If region mapping is used (i.e. mapped_regions != None),
         # this will try to match mapped names, otherwise it will map unmapped names.
         if only is not None:
-            only = region_to_list(only)
+            only = set(region_to_list(only))
 
             if use_mapping:
                 mapped_regions = [r for r in mapped_regions if r[1] in only]
@@ -180,7 +184,8 @@ class RTSTRUCT(DICOMFile):
                 names = unmapped_regions
 
             # Get duplicated regions.
-            dup_regions = [r for r in names if names.count(r) > 1]
+            counts = collections.Counter(names)
+            dup_regions = [r for r in names if counts[r] > 1]
 
             if len(dup_regions) > 0:
                 if use_mapping and self.__region_map is not None:
@@ -209,12 +214,54 @@ class RTSTRUCT(DICOMFile):
         only: Optional[PatientRegions] = None,
         region: Optional[PatientRegions] = None,    # Request specific region/s, otherwise get all region data. Specific regions must exist.
         use_mapping: bool = True) -> OrderedDict:
-        regions = region_to_list(region)
+        # If not 'region-map.csv' exists, set 'use_mapping=False'.
+        if self.__region_map is None:
+            use_mapping = False
+
+        # Load regions - these are sorted by name.
+        pat_regions = self.__list_requested_regions(only, region, use_mapping)
+        results = collections.OrderedDict(self.__load_region_data(pat_regions, use_mapping, parallel=True))
 
+        return results
+
+    def region_volume(
+        self,
+        only: Optional[PatientRegions] = None,
+        region: Optional[PatientRegions] = None,    # Request specific region/s, otherwise get all region data. Specific regions must exist.
+        use_mapping: bool = True) -> Tuple[List[PatientRegion], Optional[np.ndarray]]:
+        """
+        returns: the sorted region names and a single volume in which bit 'i' of each voxel is set
+            if the voxel belongs to region 'i'. Only one region mask is held in memory at a time.
+        """
         # If not 'region-map.csv' exists, set 'use_mapping=False'.
         if self.__region_map is None:
             use_mapping = False
 
+        # Get smallest type with a bit for each region.
+        pat_regions = self.__list_requested_regions(only, region, use_mapping)
+        dtypes = [t for t in (np.uint8, np.uint16, np.uint32, np.uint64) if np.iinfo(t).bits >= len(pat_regions)]
+        if len(dtypes) == 0:
+            raise ValueError(f"Can't pack more than 64 regions into a volume, got '{len(pat_regions)}' for RTSTRUCT '{self}'.")
+        dtype = dtypes[0]
+
+        # Set region bits.
+        names = []
+        volume = None
+        for i, (name, data) in enumerate(self.__load_region_data(pat_regions, use_mapping)):
+            if volume is None:
+                volume = np.zeros(data.shape, dtype=dtype)
+            np.bitwise_or(volume, dtype(1 << i), out=volume, where=data)
+            names.append(name)
+
+        return names, volume
+
+    def __list_requested_regions(
+        self,
+        only: Optional[PatientRegions],
+        region: Optional[PatientRegions],
+        use_mapping: bool) -> List[Union[PatientRegion, Tuple[PatientRegion, PatientRegion]]]:
+        regions = region_to_list(region)
+
         # Check that requested regions exist.
         if regions is not None:
             pat_regions = self.list_regions(only=regions, use_mapping=use_mapping)
@@ -228,34 +275,60 @@ class RTSTRUCT(DICOMFile):
 
         # Filter on requested regions.
         if regions is not None:
+            regions = set(regions)
             if use_mapping:
                 pat_regions = [r for r in pat_regions if r[1] in regions]
             else:
                 pat_regions = [r for r in pat_regions if r in regions]
 
-        # Get reference CTs.
-        cts = self.ref_ct.get_cts()
+        return pat_regions
+
+    def __load_region_data(
+        self,
+        pat_regions: List[Union[PatientRegion, Tuple[PatientRegion, PatientRegion]]],
+        use_mapping: bool,
+        parallel: bool = False) -> Iterator[Tuple[PatientRegion, np.ndarray]]:
+        # Get reference CTs. Only geometry is needed to rasterise contours, so don't load pixel data.
+        cts = self.ref_ct.get_ct_headers()
 
         # Load RTSTRUCT dicom.
-        rtstruct = self.get_rtstruct()
+        rtstruct = self.__get_roi_rtstruct()
 
-        # Add ROI data.
-        results = {}
+        # Load region using unmapped name, return using mapped name.
         if use_mapping:
-            # Load region using unmapped name, store using mapped name.
-            for unmapped_region, mapped_region in pat_regions:
-                data = RTSTRUCTConverter.get_roi_data(rtstruct, unmapped_region, cts)
-                results[mapped_region] = data
+            unmapped_regions = [r[0] for r in pat_regions]
+            mapped_regions = [r[1] for r in pat_regions]
         else:
-            # Load and store region using unmapped name.
-            for region in pat_regions:
-                data = RTSTRUCTConverter.get_roi_data(rtstruct, region, cts)
-                results[region] = data
-
-        # Create ordered dict.
-        results = collections.OrderedDict((n, results[n]) for n in sorted(results.keys())) 
-
-        return results
+            unmapped_regions = pat_regions
+            mapped_regions = pat_regions
+        load_fn = lambda r: RTSTRUCTConverter.get_roi_data(rtstruct, r, cts)
+
+        # Load ROI data.
+        if parallel and len(unmapped_regions) > 1:
+            # ROIs are independent, so rasterise them concurrently. Results are returned in order.
+            n_workers = min(MAX_ROI_WORKERS, len(unmapped_regions), os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=n_workers) as executor:
+                yield from zip(mapped_regions, executor.map(load_fn, unmapped_regions))
+        else:
+            # Load one region at a time.
+            for mapped_region, unmapped_region in zip(mapped_regions, unmapped_regions):
+                yield mapped_region, load_fn(unmapped_region)
+
+    def __get_roi_rtstruct(self) -> dcm.dataset.FileDataset:
+        # A full RTSTRUCT parse also contains the ROI sequences.
+        if self.__rtstruct is not None:
+            return self.__rtstruct
+        if self.__roi_rtstruct is None:
+            self.__load_roi_rtstruct()
+        return self.__roi_rtstruct
+
+    def __load_roi_rtstruct(self) -> None:
+        # Only ROI sequences are needed to list/load regions, so skip parsing other elements,
+        # e.g. the (often large) 'ReferencedFrameOfReferenceSequence'.
+        self.__roi_rtstruct = dcm.read_file(self.__path, specific_tags=ROI_TAGS)
+
+    def __load_rtstruct(self) -> None:
+        self.__rtstruct = dcm.read_file(self.__path)
 
     def __verify_index(self) -> None:
         if len(self.__index) == 0:
@@ -5,7 +5,7 @@ import pydicom as dcm
 from pydicom.dataset import Dataset, FileDataset, FileMetaDataset
 from pydicom.uid import generate_uid, ImplicitVRLittleEndian, PYDICOM_IMPLEMENTATION_UID
 import SimpleITK as sitk
-from typing import Dict, List, Sequence
+from typing import Dict, List, Optional, Sequence
 
 from dicomset import types
 from dicomset import logging
@@ -69,7 +69,7 @@ class RTSTRUCTConverter:
         # Get necessary values from CT.
         offset = ref_cts[0].ImagePositionPatient
         offset_2D = offset[:-1]
-        size_2D = ref_cts[0].pixel_array.shape
+        size_2D = (int(ref_cts[0].Rows), int(ref_cts[0].Columns))       # Avoid decoding 'pixel_array' just for its shape.
         size = (*size_2D, len(ref_cts))
         spacing_2D = ref_cts[0].PixelSpacing
         spacing = (*spacing_2D, ref_cts[1].ImagePositionPatient[2] - ref_cts[0].ImagePositionPatient[2])
@@ -85,7 +85,8 @@ class RTSTRUCTConverter:
         roi_contour = info_map[name]
 
         # Create label placeholder.
-        data = np.zeros(shape=size, dtype=bool)
+        # Slices are written in turn, so store z-first to keep each slice contiguous in memory.
+        data = np.zeros(shape=(size[2], *size_2D), dtype=bool)
 
         # Skip label if no contour sequence.
         contour_seq = getattr(roi_contour, 'ContourSequence', None)
@@ -98,8 +99,15 @@ class RTSTRUCTConverter:
         # Sort contour sequence by z-axis.
         contour_seq = sorted(contour_seq, key=lambda c: c.ContourData[2])
 
+        # Rasterise each contour into the same 'uint8' scratch slice, rather than allocating a slice per contour.
+        slice_buffer = np.empty(shape=size_2D, dtype=np.uint8)
+
+        # Get z indices of all contour slices at once.
+        z_positions = np.fromiter((c.ContourData[2] for c in contour_seq), dtype=np.float64, count=len(contour_seq))
+        z_idxs = ((z_positions - offset[2]) / spacing[2]).astype(int)
+
         # Convert points into voxel data.
-        for i, contour in enumerate(contour_seq):
+        for i, (contour, z_idx) in enumerate(zip(contour_seq, z_idxs)):
             # Get contour data.
             contour_data = np.array(contour.ContourData)
 
@@ -112,17 +120,19 @@ class RTSTRUCTConverter:
                 raise ValueError(f"Size of 'contour_data' (array of points in 3D) should be divisible by 3.")
             points = np.array(contour_data).reshape(-1, 3)
 
-            # Convert contour data to voxels.
-            slice_data = cls._get_mask_slice(points, size_2D, spacing_2D, offset_2D)
-
-            # Get z index of slice.
-            z_idx = int((points[0, 2] - offset[2]) / spacing[2])
-            if z_idx > data.shape[2] - 1:
+            # Skip slices outside of CT volume.
+            if z_idx > data.shape[0] - 1:
                 # Happened with 'PMCC-COMP:PMCC_AI_GYN_011' - Kidney_L...
                 continue
 
+            # Convert contour data to voxels.
+            slice_data = cls._get_mask_slice(points, size_2D, spacing_2D, offset_2D, out=slice_buffer)
+
             # Write slice data to label, using XOR.
-            data[:, :, z_idx][slice_data == True] = np.invert(data[:, :, z_idx][slice_data == True])
+            data[z_idx] ^= slice_data
+
+        # Move z-axis last.
+        data = np.moveaxis(data, 0, -1)
 
         return data
 
@@ -132,7 +142,8 @@ class RTSTRUCTConverter:
         points: np.ndarray,
         size: types.ImageSize2D,
         spacing: types.ImageSpacing2D,
-        offset: types.PhysPoint2D) -> np.ndarray:
+        offset: types.PhysPoint2D,
+        out: Optional[np.ndarray] = None) -> np.ndarray:
         """
         returns: the boolean array mask for the slice.
         args:
@@ -140,6 +151,8 @@ class RTSTRUCTConverter:
             size: the resulting mask size.
             spacing: the (x, y) pixel spacing in mm.
             offset: the (0, 0) pixel offset in physical space.
+            out: an optional 'uint8' buffer of shape 'size' to rasterise into. It's overwritten and
+                the returned mask is a view of it.
         """
 
         # Convert from physical coordinates to array indices.
@@ -154,41 +167,76 @@ class RTSTRUCTConverter:
         pts = [np.expand_dims(indices, axis=0)]
 
         # Get all voxels on the boundary and interior described by the indices.
-        slice_data = np.zeros(shape=size, dtype='uint8')   # 'cv.fillPoly' expects to write to 'uint8' mask.
+        if out is None:
+            slice_data = np.zeros(shape=size, dtype='uint8')   # 'cv.fillPoly' expects to write to 'uint8' mask.
+        else:
+            slice_data = out
+            slice_data.fill(0)
         cv.fillPoly(img=slice_data, pts=pts, color=1)
-        slice_data = slice_data.astype(bool)
+        slice_data = slice_data.view(bool)                  # Values are 0/1, so reinterpret without copying.
 
         return slice_data
 
     @classmethod
     def get_roi_names(
         cls,
-        rtstruct: dcm.dataset.FileDataset) -> List[str]:
+        rtstruct: dcm.dataset.FileDataset,
+        has_data: bool = False) -> List[str]:
         """
         returns: a list of ROIs.
         args:
             rtstruct: the RTSTRUCT dicom.
+            has_data: only return ROIs for which 'has_roi_data' is True.
         """
         # Load names.
         names = [i.ROIName for i in rtstruct.StructureSetROISequence]
+
+        # Filter on 'ContourData' in a single pass, rather than a 'has_roi_data' scan per name.
+        if has_data:
+            roi_has_data = cls._get_roi_has_data(rtstruct)
+            names = [n for n in names if roi_has_data[n]]
+
         return names
 
     @classmethod
     def get_roi_info(
         cls,
-        rtstruct: dcm.dataset.FileDataset) -> List[str]:
+        rtstruct: dcm.dataset.FileDataset,
+        has_data: bool = False) -> List[str]:
         """
         returns: a list of ROIs info.
         args:
             rtstruct: the RTSTRUCT dicom.
+            has_data: only return ROIs for which 'has_roi_data' is True.
         """
         # Load info.
         info = dict((int(i.ROINumber), {
             'id': int(i.ROINumber),
             'name': i.ROIName,
         }) for i in rtstruct.StructureSetROISequence)
+
+        # Filter on 'ContourData'.
+        if has_data:
+            roi_has_data = cls._get_roi_has_data(rtstruct)
+            info = dict((id, i) for id, i in info.items() if roi_has_data[i['name']])
+
         return info
 
+    @classmethod
+    def _get_roi_has_data(
+        cls,
+        rtstruct: dcm.dataset.FileDataset) -> Dict[str, bool]:
+        # Matches 'has_roi_data', which checks the first ROI with a given name.
+        roi_contours = rtstruct.ROIContourSequence
+        roi_infos = rtstruct.StructureSetROISequence
+        if len(roi_infos) != len(roi_contours):
+            raise ValueError(f"Length of 'StructureSetROISequence' and 'ROIContourSequence' must be the same, got '{len(roi_infos)}' and '{len(roi_contours)}' respectively.")
+        roi_has_data = {}
+        for roi, info in zip(roi_contours, roi_infos):
+            if info.ROIName not in roi_has_data:
+                roi_has_data[info.ROIName] = bool(getattr(roi, 'ContourSequence', None))
+        return roi_has_data
+
     @classmethod
     def create_rtstruct(
         cls,
@@ -568,7 +616,7 @@ class RTSTRUCTConverter:
             ref_ct: the reference CT dicom.
         """
         # Add z-index.
-        z_indices = np.ones((len(coords), 1)) * ref_ct.ImagePositionPatient[2]
+        z_indices = np.full((len(coords), 1), ref_ct.ImagePositionPatient[2])
         coords = np.concatenate((coords, z_indices), axis=1)
 
         # Flatten the array.
@@ -74,6 +74,9 @@ class RTSTRUCTSeries(DICOMSeries):
     def region_data(self, *args, **kwargs):
         return self.default_rtstruct.region_data(*args, **kwargs)
 
+    def region_volume(self, *args, **kwargs):
+        return self.default_rtstruct.region_volume(*args, **kwargs)
+
     def rtstruct(
         self,
         id: SOPInstanceUID) -> RTSTRUCT:
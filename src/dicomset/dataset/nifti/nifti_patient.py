@@ -54,7 +54,9 @@ class NIFTIPatient:
 
     @property
     def ct_size(self) -> np.ndarray:
-        return self.ct_data.shape
+        # Read the size from the header, rather than loading the image data.
+        img = nib.load(self.__ct_path)
+        return img.shape
 
     @property
     def ct_spacing(self) -> ImageSpacing3D:
@@ -120,10 +122,7 @@ class NIFTIPatient:
         # Return 'True' if patient has at least one of the requested regions.
         regions = arg_to_list(region, str)
         pat_regions = self.list_regions(labels=labels)
-        if len(np.intersect1d(regions, pat_regions)) != 0:
-            return True
-        else:
-            return False
+        return not set(pat_regions).isdisjoint(regions)
 
     def list_regions(
         self,
@@ -149,6 +148,7 @@ class NIFTIPatient:
 
         # Filter on 'only'.
         if only is not None:
+            only = set(only)
             regions = [r for r in regions if r in only]
 
         # Sort regions.
@@ -174,7 +174,8 @@ class NIFTIPatient:
                     raise ValueError(f"Requested region '{region}' not found for patient '{self.__id}', dataset '{self.__dataset}'.")
             path = os.path.join(self.__dataset.path, 'data', 'regions', region, f'{self.__id}.nii.gz')
             img = nib.load(path)
-            rdata = img.get_fdata().astype(bool)
+            # Cast the stored (integer) data, avoiding the float64 copy made by 'get_fdata'.
+            rdata = np.asanyarray(img.dataobj).astype(bool)
 
             # Apply processing.
             if process and self.__processed_labels is not None:
@@ -32,20 +32,20 @@ class NRRDPatient:
 
     @property
     def ct_offset(self) -> Point3D:
-        _, header = nrrd.read(self.__path)
+        header = nrrd.read_header(self.__path)
         offset = tuple(header['space origin'])
         return offset
 
     @property
     def ct_size(self) -> np.ndarray:
-        data, header = nrrd.read(self.__path)
-        size = data.shape
-        assert size == tuple(header['sizes'])
+        # Read the size from the header, rather than loading the image data.
+        header = nrrd.read_header(self.__path)
+        size = tuple(header['sizes'])
         return size
 
     @property
     def ct_spacing(self) -> ImageSpacing3D:
-        _, header = nrrd.read(self.__path)
+        header = nrrd.read_header(self.__path)
         # Assert that there are no off-diagonal entries.
         affine = header['space directions']
         assert affine.sum() == np.diag(affine).sum()
@@ -70,10 +70,7 @@ class NRRDPatient:
         regions = region_to_list(region)
         pat_regions = self.list_regions(labels=labels)
         # Return 'True' if patient has at least one of the requested regions.
-        if len(np.intersect1d(regions, pat_regions)) != 0:
-            return True
-        else:
-            return False
+        return not set(pat_regions).isdisjoint(regions)
 
     def list_regions(
         self,
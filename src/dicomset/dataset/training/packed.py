@@ -0,0 +1,83 @@
+from contextlib import contextmanager
+import numpy as np
+import os
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+# Packed folders hold all samples for an input/region in 'packed.bin', with an 'offsets.npy'
+# record per sample giving its byte offset, shape and dtype.
+PackedFile = Tuple[str, BinaryIO, List[Tuple[int, int, Tuple[int, ...], str]]]
+PackedOffsets = Dict[int, Tuple[int, Tuple[int, ...], np.dtype]]
+
+def open_packed(dirpath: str) -> PackedFile:
+    if not os.path.exists(dirpath):
+        os.makedirs(dirpath)
+    f = open(os.path.join(dirpath, 'packed.bin'), 'wb')
+    return dirpath, f, []
+
+def append_packed(
+    packed: PackedFile,
+    sample_id: int,
+    data: np.ndarray) -> None:
+    _, f, offsets = packed
+    data = np.ascontiguousarray(data)
+    offsets.append((sample_id, f.tell(), data.shape, data.dtype.str))
+    data.tofile(f)
+
+def close_packed(packed: PackedFile) -> None:
+    dirpath, f, offsets = packed
+    f.close()
+
+    # Samples may have different dimensions (e.g. multi-channel inputs), so shapes are padded
+    # to the largest and the number of dimensions is stored separately.
+    max_ndim = max((len(shape) for _, _, shape, _ in offsets), default=0)
+    dtype = [('sample-id', np.int64), ('offset', np.int64), ('ndim', np.int64), ('shape', np.int64, max_ndim), ('dtype', 'U8')]
+    records = [(i, o, len(s), tuple(s) + (0,) * (max_ndim - len(s)), d) for i, o, s, d in offsets]
+    np.save(os.path.join(dirpath, 'offsets.npy'), np.array(records, dtype=dtype))
+
+def abort_packed(packed: PackedFile) -> None:
+    dirpath, f, _ = packed
+    f.close()
+    os.remove(os.path.join(dirpath, 'packed.bin'))
+
+@contextmanager
+def write_packed(dirpaths: Dict[Optional[str], str]) -> Iterator[Dict[Optional[str], PackedFile]]:
+    """
+    returns: an open packed file per key, closed with offsets on exit.
+    args:
+        dirpaths: the packed folder for each key, e.g. 'None' for inputs and region names for labels.
+    """
+    packed = dict((k, open_packed(d)) for k, d in dirpaths.items())
+    try:
+        yield packed
+    except BaseException:
+        # Remove partially written packed files, so they're not loaded as complete data.
+        for p in packed.values():
+            abort_packed(p)
+        raise
+    for p in packed.values():
+        close_packed(p)
+
+def load_packed_offsets(dirpath: str) -> Optional[PackedOffsets]:
+    filepath = os.path.join(dirpath, 'offsets.npy')
+    if not os.path.exists(filepath):
+        return None
+    offsets = np.load(filepath)
+
+    # Older offsets files hold 3D shapes only, with no 'ndim' field.
+    if 'ndim' in offsets.dtype.names:
+        shapes = [tuple(int(s) for s in o['shape'][:o['ndim']]) for o in offsets]
+    else:
+        shapes = [tuple(int(s) for s in o['shape']) for o in offsets]
+    return dict((int(o['sample-id']), (int(o['offset']), shape, np.dtype(o['dtype']))) for o, shape in zip(offsets, shapes))
+
+def read_packed(
+    dirpath: str,
+    offset: int,
+    shape: Tuple[int, ...],
+    dtype: np.dtype,
+    mmap: bool = True) -> np.ndarray:
+    # Maps are copy-on-write, so callers can modify the returned arrays in place.
+    data = np.memmap(os.path.join(dirpath, 'packed.bin'), dtype=dtype, mode='c', offset=offset, shape=shape)
+    if not mmap:
+        data = np.array(data)
+    return data
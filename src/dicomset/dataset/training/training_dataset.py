@@ -1,7 +1,7 @@
 import numpy as np
 import os
 import pandas as pd
-from typing import Callable, List, Optional, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 <<<<<<< HEAD:mymi/dataset/training/training_dataset.py
 from mymi import config
@@ -15,6 +15,7 @@ from dicomset.utils import arg_to_list
 >>>>>>> 210721d (Remove unnecessary files/folders.):src/dicomset/dataset/training/training_dataset.py
 
 from ..dataset import Dataset, DatasetType
+from .packed import PackedOffsets, load_packed_offsets
 from .training_sample import TrainingSample
 
 class TrainingDataset(Dataset):
@@ -27,6 +28,8 @@ class TrainingDataset(Dataset):
         self.__global_id = f"TRAINING: {self.__name}"
         self.__path = os.path.join(config.directories.datasets, 'training', self.__name)
         self.__loader_split = None     # Lazy-loaded.
+        self.__packed_offsets = {}      # Lazy-loaded.
+        self.__sample_ids = None        # Lazy-loaded.
 
         # Check if dataset exists.
         if not os.path.exists(self.__path):
@@ -90,6 +93,29 @@ class TrainingDataset(Dataset):
     def type(self) -> DatasetType:
         return DatasetType.TRAINING
 
+    def class_frequencies(
+        self,
+        region: str) -> Tuple[int, int]:
+        # Count background/foreground voxels across all stored labels for the region.
+        dirpath = os.path.join(self.__path, 'data', 'labels', region)
+        offsets = self.packed_offsets(dirpath)
+        if offsets is not None and all(dtype.itemsize == 1 for _, _, dtype in offsets.values()):
+            # Packed binary masks can be reduced in a single pass over the packed file. 'count_nonzero'
+            # is a vectorised byte count, avoiding the int64 casts of 'sum'.
+            data = np.memmap(os.path.join(dirpath, 'packed.bin'), dtype=np.uint8, mode='r')
+            num_fore = int(np.count_nonzero(data))
+            num_back = data.size - num_fore
+            return num_back, num_fore
+
+        # Otherwise accumulate per sample, holding one label in memory at a time.
+        num_fore, num_voxels = 0, 0
+        for sample_id in self.list_samples(region=region):
+            label = self.sample(sample_id).label(region=region)[region]
+            num_fore += int(np.count_nonzero(label))
+            num_voxels += label.size
+        num_back = num_voxels - num_fore
+        return num_back, num_fore
+
     def list_groups(
         self,
         include_empty: bool = False,
@@ -117,6 +143,14 @@ class TrainingDataset(Dataset):
 
         return group_ids
 
+    def has_sample(
+        self,
+        sample_id: int) -> bool:
+        # Cache sample IDs, as every sample lookup (e.g. per loader item) checks for existence.
+        if self.__sample_ids is None:
+            self.__sample_ids = set(self.list_samples())
+        return sample_id in self.__sample_ids
+
     def list_regions(self) -> List[str]:
         return list(sorted(self.index['region'].unique())) 
 
@@ -147,6 +181,14 @@ class TrainingDataset(Dataset):
 
         return sample_ids
 
+    def packed_offsets(
+        self,
+        dirpath: str) -> Optional[PackedOffsets]:
+        # Offsets are loaded once per packed folder and shared by all samples.
+        if dirpath not in self.__packed_offsets:
+            self.__packed_offsets[dirpath] = load_packed_offsets(dirpath)
+        return self.__packed_offsets[dirpath]
+
     def sample(
         self,
         sample_id: Union[int, str],
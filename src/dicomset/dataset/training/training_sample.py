@@ -3,12 +3,14 @@ from dicomset.types import ImageSize3D, ImageSpacing3D, PatientRegions
 import numpy as np
 import os
 import pandas as pd
-from typing import Dict, List, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 from dicomset.regions import region_to_list
 from dicomset import types
 from dicomset.utils import arg_to_list
 
+from .packed import read_packed
+
 class TrainingSample:
     def __init__(
         self,
@@ -22,7 +24,7 @@ class TrainingSample:
         self.__spacing = self.__dataset.params['spacing'] if 'spacing' in self.__dataset.params else self.__dataset.params['output-spacing']    
 
         # Load sample index.
-        if self.__id not in self.__dataset.list_samples():
+        if not self.__dataset.has_sample(self.__id):
             raise ValueError(f"Sample '{self.__id}' not found for dataset '{self.__dataset}'.")
 
     @property
@@ -47,13 +49,7 @@ class TrainingSample:
 
     @property
     def input(self) -> np.ndarray:
-        # Load the input data.
-        filepath = os.path.join(self.__dataset.path, 'data', 'inputs', f'{self.__id}.npz')
-        if not os.path.exists(filepath):
-            raise ValueError(f"Input data not found for sample '{self}'.")
-        data = np.load(filepath)['data']
-        data = data.astype(np.float32)
-        return data
+        return self.load_input()
 
     @property
     def origin(self) -> Tuple:
@@ -83,36 +79,104 @@ class TrainingSample:
         region: PatientRegions) -> bool:
         regions = arg_to_list(region, str)
         pat_regions = self.list_regions()
-        for region in regions:
-            if region in pat_regions:
-                return True
-        return False
+        return not set(pat_regions).isdisjoint(regions)
 
     def label(
         self,
         region: PatientRegions = 'all',
-        region_ignore_missing: bool = False) -> Dict[str, np.ndarray]:
+        region_ignore_missing: bool = False,
+        mmap: bool = True) -> Dict[str, np.ndarray]:
         regions = arg_to_list(region, str, literals={ 'all': self.list_regions() })
 
         # Load the label data.
         data = {}
         for region in regions:
-            filepath = os.path.join(self.__dataset.path, 'data', 'labels', region, f'{self.__id}.npz')
-            if not os.path.exists(filepath):
+            dirpath = os.path.join(self.__dataset.path, 'data', 'labels', region)
+            label = self.__load_array(dirpath, mmap=mmap)
+            if label is None:
                 if region_ignore_missing:
                     continue
                 else:
                     raise ValueError(f"Label '{region}' not found for sample '{self}'.")
-            label = np.load(filepath)['data']
             data[region] = label
 
         return data
 
+    def load_input(
+        self,
+        mmap: bool = True) -> np.ndarray:
+        # Load the input data.
+        dirpath = os.path.join(self.__dataset.path, 'data', 'inputs')
+        data = self.__load_array(dirpath, mmap=mmap)
+        if data is None:
+            raise ValueError(f"Input data not found for sample '{self}'.")
+
+        # Only copy if a cast is required, so memory-mapped float32 inputs stay mapped.
+        data = data.astype(np.float32, copy=False)
+        return data
+
     def pair(
         self,
         region: PatientRegions = 'all') -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
         return self.input, self.label(region=region)
 
+    def __load_array(
+        self,
+        dirpath: str,
+        mmap: bool = True) -> Optional[np.ndarray]:
+        # Packed folders hold all samples in a single file, avoiding per-sample file opens.
+        offsets = self.__dataset.packed_offsets(dirpath)
+        if offsets is not None:
+            if self.__id not in offsets:
+                return None
+            offset, shape, dtype = offsets[self.__id]
+            return read_packed(dirpath, offset, shape, dtype, mmap=mmap)
+
+        # Uncompressed '.npy' files can be memory-mapped, so only the pages that are
+        # touched (e.g. by a crop) are read and the OS page cache serves later epochs.
+        # Maps are copy-on-write, so callers can still modify the returned arrays in place.
+        npy_filepath = os.path.join(dirpath, f'{self.__id}.npy')
+        if os.path.exists(npy_filepath):
+            return self.__load_npy(npy_filepath, mmap=mmap)
+
+        # Compressed '.npz' files must be read in full.
+        npz_filepath = os.path.join(dirpath, f'{self.__id}.npz')
+        if os.path.exists(npz_filepath):
+            npz = np.load(npz_filepath)
+            data = npz['data']
+            if 'shape' in npz:
+                # Bit-packed label.
+                shape = tuple(npz['shape'])
+                data = np.unpackbits(data, count=int(np.prod(shape))).reshape(shape).view(bool)
+            return data
+
+        return None
+
+    def __load_npy(
+        self,
+        filepath: str,
+        mmap: bool = True) -> np.ndarray:
+        # Parse the '.npy' header directly and view the data buffer, avoiding 'np.load's
+        # chunked reads through the python file object.
+        with open(filepath, 'rb') as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            elif version == (2, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            else:
+                # Version 3.0 headers are utf8-encoded, and have no public reader.
+                shape, fortran_order, dtype = np.lib.format._read_array_header(f, version)
+            offset = f.tell()
+            if dtype.hasobject:
+                raise ValueError(f"Object arrays are not supported, got dtype '{dtype}' for file '{filepath}'.")
+            order = 'F' if fortran_order else 'C'
+            if mmap:
+                return np.memmap(f, dtype=dtype, mode='c', offset=offset, shape=shape, order=order)
+            count = int(np.prod(shape))
+            data = np.fromfile(f, dtype=dtype, count=count)
+        return data.reshape(shape, order=order)
+
     def __load_index(self) -> None:
         index = self.__dataset.index
         index = index[index['sample-id'] == self.__id]
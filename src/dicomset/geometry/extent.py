@@ -1,4 +1,5 @@
 import numpy as np
+from scipy.ndimage import find_objects
 from typing import Literal, Optional, Tuple, Union
 
 from dicomset.types import Axis, Box2D, Box3D, ImageSize2D, ImageSize3D, Point2D, Point3D
@@ -8,10 +9,11 @@ def get_extent(a: np.ndarray) -> Optional[Union[Box2D, Box3D]]:
         raise ValueError(f"'get_extent' expected a boolean array, got '{a.dtype}'.")
 
     # Get OAR extent.
-    if a.sum() > 0:
-        non_zero = np.argwhere(a != 0).astype(int)
-        min = tuple(non_zero.min(axis=0))
-        max = tuple(non_zero.max(axis=0))
+    # 'find_objects' returns the bounding box in a single pass, without allocating foreground voxel coordinates.
+    objects = find_objects(a.view(np.uint8))
+    if len(objects) > 0:
+        min = tuple(s.start for s in objects[0])
+        max = tuple(s.stop - 1 for s in objects[0])
         box = (min, max)
     else:
         box = None
@@ -31,12 +33,11 @@ def get_extent_voxel(
     # Returns a foreground voxel on the extent of the OAR along given 'axis' and 'end' of the axis.
     # There could be multiple extreme voxels at this end of the OAR, so we look at another 'view' axis
     # and return the central extreme voxel along this axis.
-    non_zero = np.argwhere(a)
-    if end == 'min':
-        axis_value = non_zero[:, axis].min()
-    elif end == 'max':
-        axis_value = non_zero[:, axis].max()
-    axis_voxels = non_zero[non_zero[:, axis] == axis_value]
+    # Only the extreme slice along 'axis' is searched for foreground voxels.
+    min, max = get_extent(a)
+    axis_value = min[axis] if end == 'min' else max[axis]
+    axis_voxels = np.argwhere(np.take(a, axis_value, axis=axis))
+    axis_voxels = np.insert(axis_voxels, axis, axis_value, axis=1)
     axis_voxels = axis_voxels[np.argsort(axis_voxels[:, view_axis])]
     max_voxel = tuple(axis_voxels[len(axis_voxels) // 2])
     return max_voxel
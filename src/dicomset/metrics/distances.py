@@ -1,5 +1,7 @@
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import SimpleITK as sitk
+from scipy.spatial import cKDTree
 from surface_distance import compute_average_surface_distance, compute_robust_hausdorff, compute_surface_dice_at_tolerance, compute_surface_distances
 from typing import Dict, List, Literal, Tuple, Union
 
@@ -7,6 +9,8 @@ from dicomset.geometry import get_extent, get_extent_centre
 from dicomset import types
 from dicomset.utils import arg_to_list
 
+MAX_BATCH_WORKERS = 8
+
 def distances_deepmind(
     a: np.ndarray,
     b: np.ndarray,
@@ -16,7 +20,7 @@ def distances_deepmind(
         raise ValueError(f"Metric 'distances' expects arrays of equal shape. Got '{a.shape}' and '{b.shape}'.")
     if a.dtype != np.bool_ or b.dtype != np.bool_:
         raise ValueError(f"Metric 'distances' expects boolean arrays. Got '{a.dtype}' and '{b.dtype}'.")
-    if a.sum() == 0 or b.sum() == 0:
+    if not a.any() or not b.any():
         raise ValueError(f"Metric 'distances' can't be calculated on empty sets. Got cardinalities '{a.sum()}' and '{b.sum()}'.")
     tols = arg_to_list(tol, (int, float))
 
@@ -64,17 +68,18 @@ def all_distances(
     a: np.ndarray,
     b: np.ndarray,
     spacing: types.ImageSpacing3D,
-    tol: Union[int, float, List[Union[int, float]]] = []) -> Dict[str, float]:
+    tol: Union[int, float, List[Union[int, float]]] = [],
+    workers: int = -1) -> Dict[str, float]:
     if a.shape != b.shape:
         raise ValueError(f"Metric 'distances' expects arrays of equal shape. Got '{a.shape}' and '{b.shape}'.")
     if a.dtype != np.bool_ or b.dtype != np.bool_:
         raise ValueError(f"Metric 'distances' expects boolean arrays. Got '{a.dtype}' and '{b.dtype}'.")
-    if a.sum() == 0 or b.sum() == 0:
+    if not a.any() or not b.any():
         raise ValueError(f"Metric 'distances' can't be calculated on empty sets. Got cardinalities '{a.sum()}' and '{b.sum()}'.")
     tols = arg_to_list(tol, (int, float))
 
     # Add metrics.
-    surf_dists = surface_distances(a, b, spacing)
+    surf_dists = surface_distances(a, b, spacing, workers=workers)
     metrics = {
         'hd': hausdorff_distance(surf_dists),
         'hd-95': hausdorff_distance(surf_dists, 95),
@@ -92,40 +97,46 @@ def all_distances(
 def surface_distances(
     a: np.ndarray,
     b: np.ndarray,
-    spacing: types.ImageSpacing3D) -> Dict[str, float]:
+    spacing: types.ImageSpacing3D,
+    workers: int = -1) -> Dict[str, float]:
     if a.shape != b.shape:
         raise ValueError(f"Metric 'distances' expects arrays of equal shape. Got '{a.shape}' and '{b.shape}'.")
     if a.dtype != np.bool_ or b.dtype != np.bool_:
         raise ValueError(f"Metric 'distances' expects boolean arrays. Got '{a.dtype}' and '{b.dtype}'.")
-    if a.sum() == 0 or b.sum() == 0:
+    if not a.any() or not b.any():
         raise ValueError(f"Metric 'distances' can't be calculated on empty sets. Got cardinalities '{a.sum()}' and '{b.sum()}'.")
 
     # Convert to SimpleITK images.
-    a_itk = sitk.GetImageFromArray(a.astype('uint8'))
+    a_itk = sitk.GetImageFromArray(a.view(np.uint8))
     a_itk.SetSpacing(tuple(reversed(spacing)))
-    b_itk = sitk.GetImageFromArray(b.astype('uint8'))
+    b_itk = sitk.GetImageFromArray(b.view(np.uint8))
     b_itk.SetSpacing(tuple(reversed(spacing)))
 
     # Get surface voxels.
     a_surface = sitk.LabelContour(a_itk, False)
     b_surface = sitk.LabelContour(b_itk, False)
 
-    # Compute distance maps - calculate 'absolute' distances as direction of deviation from other surface doesn't matter.
-    a_dist_map = sitk.Abs(sitk.SignedMaurerDistanceMap(a_surface, useImageSpacing=True, squaredDistance=False, insideIsPositive=False))
-    b_dist_map = sitk.Abs(sitk.SignedMaurerDistanceMap(b_surface, useImageSpacing=True, squaredDistance=False, insideIsPositive=False))
-
-    # Convert 'sitk' images to 'numpy' arrays.
-    a_dist_map = sitk.GetArrayFromImage(a_dist_map)
-    b_dist_map = sitk.GetArrayFromImage(b_dist_map)
+    # Get surface points in physical coordinates.
     a_surface = sitk.GetArrayFromImage(a_surface)
     b_surface = sitk.GetArrayFromImage(b_surface)
+    a_points = np.ascontiguousarray(np.argwhere(a_surface == 1) * spacing, dtype=np.float32)
+    b_points = np.ascontiguousarray(np.argwhere(b_surface == 1) * spacing, dtype=np.float32)
 
     # Get voxel/surface min distances.
-    a_to_b_surface_min_dists = b_dist_map[a_surface == 1]
-    b_to_a_surface_min_dists = a_dist_map[b_surface == 1]
+    a_to_b_surface_min_dists = __min_point_distances(a_points, b_points, workers=workers)
+    b_to_a_surface_min_dists = __min_point_distances(b_points, a_points, workers=workers)
 
     return a_to_b_surface_min_dists, b_to_a_surface_min_dists
 
+def __min_point_distances(
+    a: np.ndarray,
+    b: np.ndarray,
+    workers: int = -1) -> np.ndarray:
+    # Nearest-neighbour queries are O(N log M) rather than comparing every pair of points.
+    tree = cKDTree(b)
+    min_dists, _ = tree.query(a, k=1, workers=workers)
+    return min_dists
+
 def batch_mean_all_distances(
     a: np.ndarray,
     b: np.ndarray,
@@ -136,15 +147,17 @@ def batch_mean_all_distances(
     if a.dtype != np.bool_ or b.dtype != np.bool_:
         raise ValueError(f"Metric 'batch_mean_all_distances' expects boolean arrays. Got '{a.dtype}' and '{b.dtype}'.")
 
+    # Calculate batch items in parallel, the surface extraction and KD-tree queries release the GIL.
+    # Each item queries on a single thread, to avoid oversubscribing cores within the pool.
+    with ThreadPoolExecutor(max_workers=MAX_BATCH_WORKERS) as executor:
+        batch_dists = list(executor.map(lambda ab: all_distances(*ab, spacing, tol=tol, workers=1), zip(a, b)))
+
     # Average metrics over all batch items.
     mean_dists = {}
-    for a, b in zip(a, b):
-        dists = all_distances(a, b, spacing, tol=tol)
-        for metric, value in dists.items():
-            if metric not in mean_dists:
-                dists[metric] = []
-            dists[metric].append(value)
-    mean_dists = dict((metric, np.mean(values)) for metric, values in mean_dists.items())
+    if len(batch_dists) > 0:
+        for metric in batch_dists[0].keys():
+            values = np.fromiter((d[metric] for d in batch_dists), dtype=np.float64, count=len(batch_dists))
+            mean_dists[metric] = values.mean()
     return mean_dists
 
 def extent_centre_distance(
@@ -162,7 +175,7 @@ def extent_centre_distance(
         raise ValueError(f"Metric 'extent_centre_distance' expects arrays of equal shape. Got '{a.shape}' and '{b.shape}'.")
     if a.dtype != np.bool_ or b.dtype != np.bool_:
         raise ValueError(f"Metric 'extent_centre_distance' expects boolean arrays. Got '{a.dtype}' and '{b.dtype}'.")
-    if a.sum() == 0 or b.sum() == 0:
+    if not a.any() or not b.any():
         raise ValueError(f"Metric 'extent_centre_distance' can't be calculated on empty sets. Got cardinalities '{a.sum()}' and '{b.sum()}'.")
 
     # Calculate extent centres.
@@ -189,7 +202,7 @@ def extent_distance(
         raise ValueError(f"Metric 'extent_distance' expects arrays of equal shape. Got '{a.shape}' and '{b.shape}'.")
     if a.dtype != np.bool_ or b.dtype != np.bool_:
         raise ValueError(f"Metric 'extent_distance' expects boolean arrays. Got '{a.dtype}' and '{b.dtype}'.")
-    if a.sum() == 0 or b.sum() == 0:
+    if not a.any() or not b.any():
         raise ValueError(f"Metric 'extent_distance' can't be calculated on empty sets. Got cardinalities '{a.sum()}' and '{b.sum()}'.")
 
     # Calculate extents.
@@ -216,7 +229,7 @@ def get_encaps_dist_vox(
         raise ValueError(f"'get_encaps_dist_vox' expects arrays of equal shape. Got '{a.shape}' and '{b.shape}'.")
     if a.dtype != np.bool_ or b.dtype != np.bool_:
         raise ValueError(f"'get_encaps_dist_vox' expects boolean arrays. Got '{a.dtype}' and '{b.dtype}'.")
-    if a.sum() == 0 or b.sum() == 0:
+    if not a.any() or not b.any():
         raise ValueError(f"'get_encaps_dist_vox' can't be calculated on empty sets. Got cardinalities '{a.sum()}' and '{b.sum()}'.")
 
     # Calculate extents.
@@ -243,7 +256,7 @@ def get_encaps_dist_mm(
         raise ValueError(f"'get_encaps_dist_mm' expects arrays of equal shape. Got '{a.shape}' and '{b.shape}'.")
     if a.dtype != np.bool_ or b.dtype != np.bool_:
         raise ValueError(f"'get_encaps_dist_mm' expects boolean arrays. Got '{a.dtype}' and '{b.dtype}'.")
-    if a.sum() == 0 or b.sum() == 0:
+    if not a.any() or not b.any():
         raise ValueError(f"'get_encaps_dist_mm' can't be calculated on empty sets. Got cardinalities '{a.sum()}' and '{b.sum()}'.")
 
     dist = get_encaps_dist_vox(a, b)
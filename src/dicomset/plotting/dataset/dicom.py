@@ -34,15 +34,14 @@ def plot_region(
     spacing = study.ct_spacing
     dose_data = study.dose_data if show_dose else None
 
-    if centre_of is not None:
-        if type(centre_of) == str:
-            if region_data is None or centre_of not in region_data:
-                centre_of = study.region_data(region=centre_of, use_mapping=use_mapping)[centre_of]
-
-    if crop is not None:
-        if type(crop) == str:
-            if region_data is None or crop not in region_data:
-                crop = study.region_data(region=crop, use_mapping=use_mapping)[crop]
+    # Load 'centre_of' and 'crop' regions that weren't loaded with 'region' in a single read.
+    other_regions = [r for r in (centre_of, crop) if isinstance(r, str) and (region_data is None or r not in region_data)]
+    if len(other_regions) > 0:
+        other_data = study.region_data(region=list(dict.fromkeys(other_regions)), use_mapping=use_mapping)
+        if isinstance(centre_of, str) and centre_of in other_data:
+            centre_of = other_data[centre_of]
+        if isinstance(crop, str) and crop in other_data:
+            crop = other_data[crop]
 
     if region_labels is not None:
         # Rename 'regions' and 'region_data' keys.
@@ -51,9 +50,9 @@ def plot_region(
             region_data[new] = region_data.pop(old)
 
         # Rename 'centre_of' and 'crop' keys.
-        if type(centre_of) == str and centre_of in region_labels:
+        if isinstance(centre_of, str) and centre_of in region_labels:
             centre_of = region_labels[centre_of] 
-        if type(crop) == str and crop in region_labels:
+        if isinstance(crop, str) and crop in region_labels:
             crop = region_labels[crop]
 
     # Plot.
@@ -26,15 +26,14 @@ def plot_region(
     spacing = pat.ct_spacing
     dose_data = pat.dose_data if show_dose else None
 
-    if centre_of is not None:
-        if type(centre_of) == str:
-            if region_data is None or centre_of not in region_data:
-                centre_of = pat.region_data(region=centre_of)[centre_of]
-
-    if crop is not None:
-        if type(crop) == str:
-            if region_data is None or crop not in region_data:
-                crop = pat.region_data(region=crop)[crop]
+    # Load 'centre_of' and 'crop' regions that weren't loaded with 'region' in a single read.
+    other_regions = [r for r in (centre_of, crop) if isinstance(r, str) and (region_data is None or r not in region_data)]
+    if len(other_regions) > 0:
+        other_data = pat.region_data(region=list(dict.fromkeys(other_regions)))
+        if isinstance(centre_of, str) and centre_of in other_data:
+            centre_of = other_data[centre_of]
+        if isinstance(crop, str) and crop in other_data:
+            crop = other_data[crop]
 
     if region_label is not None:
         # Rename regions.
@@ -42,9 +41,9 @@ def plot_region(
             region_data[new] = region_data.pop(old)
 
         # Rename 'centre_of' and 'crop' keys.
-        if type(centre_of) == str and centre_of in region_label:
+        if isinstance(centre_of, str) and centre_of in region_label:
             centre_of = region_label[centre_of] 
-        if type(crop) == str and crop in region_label:
+        if isinstance(crop, str) and crop in region_label:
             crop = region_label[crop]
 
     # Plot.
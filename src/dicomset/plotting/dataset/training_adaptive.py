@@ -39,13 +39,13 @@ def plot_region(
         region_data = None
 
     if centre_of is not None:
-        if type(centre_of) == str:
+        if isinstance(centre_of, str):
             if region_data is None or centre_of not in region_data:
                 region_idx = all_regions.index(centre_of) + 1
                 centre_of = label[region_idx]
 
     if crop is not None:
-        if type(crop) == str:
+        if isinstance(crop, str):
             if region_data is None or crop not in region_data:
                 region_idx = all_regions.index(crop) + 1
                 crop = label[region_idx]
@@ -57,9 +57,9 @@ def plot_region(
             region_data[new] = region_data.pop(old)
 
         # Rename 'centre_of' and 'crop' keys.
-        if type(centre_of) == str and centre_of in region_labels:
+        if isinstance(centre_of, str) and centre_of in region_labels:
             centre_of = region_labels[centre_of] 
-        if type(crop) == str and crop in region_labels:
+        if isinstance(crop, str) and crop in region_labels:
             crop = region_labels[crop]
 
     # Plot both scans.
@@ -12,6 +12,7 @@ import numpy as np
 from numpy import ndarray
 import os
 import pandas as pd
+import re
 from scipy.stats import wilcoxon, mannwhitneyu
 import seaborn as sns
 from statannotations.Annotator import Annotator
@@ -31,6 +32,23 @@ from mymi.utils import arg_to_list
 
 DEFAULT_FONT_SIZE = 8
 
+# Latex special characters and their escapes. The regex is compiled once, with longer keys first.
+LATEX_CHAR_MAP = {
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '{': r'\{',
+    '}': r'\}',
+    '~': r'\textasciitilde{}',
+    '^': r'\^{}',
+    '\\': r'\textbackslash{}',
+    '<': r'\textless{}',
+    '>': r'\textgreater{}',
+}
+LATEX_REGEXP = re.compile('|'.join(re.escape(str(key)) for key in sorted(LATEX_CHAR_MAP.keys(), key = lambda item: - len(item))))
+
 def __plot_region_data(
     data: Dict[str, np.ndarray],
     slice_idx: int,
@@ -85,7 +103,7 @@ def __plot_region_data(
                 __plot_box_slice(extent, view, colour='b', crop=crop, label=f'{region} conn. extent', linestyle='dashed')
 
         # Skip region if not present on this slice.
-        if not legend_show_all_regions and slice_data.max() == 0:
+        if not legend_show_all_regions and not slice_data.any():
             continue
         else:
             show_legend = True
@@ -251,23 +269,7 @@ def __escape_latex(text: str) -> str:
     args:
         text: the string to escape.
     """
-    # Provide map for special characters.
-    char_map = {
-        '&': r'\&',
-        '%': r'\%',
-        '$': r'\$',
-        '#': r'\#',
-        '_': r'\_',
-        '{': r'\{',
-        '}': r'\}',
-        '~': r'\textasciitilde{}',
-        '^': r'\^{}',
-        '\\': r'\textbackslash{}',
-        '<': r'\textless{}',
-        '>': r'\textgreater{}',
-    }
-    regex = re.compile('|'.join(re.escape(str(key)) for key in sorted(char_map.keys(), key = lambda item: - len(item))))
-    return regex.sub(lambda match: char_map[match.group()], text)
+    return LATEX_REGEXP.sub(lambda match: LATEX_CHAR_MAP[match.group()], text)
 
 def __assert_data(
     ct_data: Optional[np.ndarray],
@@ -337,7 +339,7 @@ def plot_heatmap(
 
     if centre_of is not None:
         # Get 'slice_idx' at centre of data.
-        label = region_data[centre_of] if type(centre_of) == str else centre_of
+        label = region_data[centre_of] if isinstance(centre_of, str) else centre_of
         extent_centre = get_extent_centre(label)
         slice_idx = extent_centre[view]
 
@@ -354,9 +356,9 @@ def plot_heatmap(
 
     if crop is not None:
         # Convert 'crop' to 'Box2D' type.
-        if type(crop) == str:
+        if isinstance(crop, str):
             crop = __get_region_crop(region_data[crop], crop_margin, spacing, view)     # Crop was 'region_data' key.
-        elif type(crop) == np.ndarray:
+        elif isinstance(crop, np.ndarray):
             crop = __get_region_crop(crop, crop_margin, spacing, view)                  # Crop was 'np.ndarray'.
         else:
             crop = tuple(zip(*crop))                                                    # Crop was 'Crop2D' type.
@@ -442,6 +444,23 @@ from dicomset.utils import arg_to_list
 
 DEFAULT_FONT_SIZE = 8
 
+# Latex special characters and their escapes. The regex is compiled once, with longer keys first.
+LATEX_CHAR_MAP = {
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '{': r'\{',
+    '}': r'\}',
+    '~': r'\textasciitilde{}',
+    '^': r'\^{}',
+    '\\': r'\textbackslash{}',
+    '<': r'\textless{}',
+    '>': r'\textgreater{}',
+}
+LATEX_REGEXP = re.compile('|'.join(re.escape(str(key)) for key in sorted(LATEX_CHAR_MAP.keys(), key = lambda item: - len(item))))
+
 >>>>>>> 210721d (Remove unnecessary files/folders.):src/dicomset/plotting/plotter.py
 def plot_region(
     id: str,
@@ -514,10 +533,10 @@ def plot_region(
 
     if centre_of is not None:
         # Get 'slice_idx' at centre of data.
-        label = region_data[centre_of] if type(centre_of) == str else centre_of
+        label = region_data[centre_of] if isinstance(centre_of, str) else centre_of
         if postproc:
             label = postproc(label)
-        if label.sum() == 0:
+        if not label.any():
             raise ValueError(f"'centre_of={centre_of}' was selected, but region '{centre_of}' has no foreground voxels.")
         extent_centre = get_extent_centre(label)
         slice_idx = extent_centre[view]
@@ -530,7 +549,7 @@ def plot_region(
             eo_region, eo_end, eo_axis = extent_of
 
         # Get 'slice_idx' at min/max extent of data.
-        label = region_data[eo_region] if type(eo_region) == str else eo_region     # 'eo_region' can be str ('region_data' key) or np.ndarray.
+        label = region_data[eo_region] if isinstance(eo_region, str) else eo_region     # 'eo_region' can be str ('region_data' key) or np.ndarray.
         assert eo_end in ('min', 'max'), "'extent_of' must have one of ('min', 'max') as second element."
         eo_end = 0 if eo_end == 'min' else 1
         if postproc:
@@ -591,7 +610,7 @@ def plot_region(
     # Determine CT window.
     if ct_data is not None:
         if window is not None:
-            if type(window) == str:
+            if isinstance(window, str):
                 if window == 'bone':
                     width, level = (2000, 300)
                 elif window == 'lung':
@@ -759,7 +778,7 @@ def plot_localiser_prediction(
         })
 
     # Load localiser segmentation.
-    if pred_data.sum() == 0:
+    if not pred_data.any():
         logging.info('Empty prediction')
         empty_pred = True
     else:
@@ -767,7 +786,7 @@ def plot_localiser_prediction(
 
     if centre_of is not None:
         # Get 'slice_idx' at centre of data.
-        label = region_data[centre_of] if type(centre_of) == str else centre_of
+        label = region_data[centre_of] if isinstance(centre_of, str) else centre_of
         extent_centre = get_extent_centre(label)
         slice_idx = extent_centre[view]
 
@@ -779,7 +798,7 @@ def plot_localiser_prediction(
             eo_region, eo_end, eo_axis = extent_of
 
         # Get 'slice_idx' at min/max extent of data.
-        label = region_data[eo_region] if type(eo_region) == str else eo_region     # 'eo_region' can be str ('region_data' key) or np.ndarray.
+        label = region_data[eo_region] if isinstance(eo_region, str) else eo_region     # 'eo_region' can be str ('region_data' key) or np.ndarray.
         assert eo_end in ('min', 'max'), "'extent_of' must have one of ('min', 'max') as second element."
         eo_end = 0 if eo_end == 'min' else 1
         if postproc:
@@ -792,9 +811,9 @@ def plot_localiser_prediction(
 
     if crop is not None:
         # Convert 'crop' to 'Box2D' type.
-        if type(crop) == str:
+        if isinstance(crop, str):
             crop = __get_region_crop(region_data[crop], crop_margin, spacing, view)     # Crop was 'region_data' key.
-        elif type(crop) == np.ndarray:
+        elif isinstance(crop, np.ndarray):
             crop = __get_region_crop(crop, crop_margin, spacing, view)                  # Crop was 'np.ndarray'.
         else:
             crop = tuple(zip(*crop))                                                    # Crop was 'Crop2D' type.
@@ -1039,7 +1058,7 @@ Prediction: {model_name}""")
 
     if centre_of is not None:
         # Get 'slice_idx' at centre of data.
-        label = region_data[centre_of] if type(centre_of) == str else centre_of
+        label = region_data[centre_of] if isinstance(centre_of, str) else centre_of
         extent_centre = get_extent_centre(label)
         slice_idx = extent_centre[view]
 
@@ -1057,9 +1076,9 @@ Prediction: {model_name}""")
 
     if crop is not None:
         # Convert 'crop' to 'Box2D' type.
-        if type(crop) == str:
+        if isinstance(crop, str):
             crop = __get_region_crop(region_data[crop], crop_margin, spacing, view)     # Crop was 'region_data' key.
-        elif type(crop) == np.ndarray:
+        elif isinstance(crop, np.ndarray):
             crop = __get_region_crop(crop, crop_margin, spacing, view)                  # Crop was 'np.ndarray'.
         else:
             crop = tuple(zip(*crop))                                                    # Crop was 'Crop2D' type.
@@ -1206,7 +1225,7 @@ Prediction: {model_name}""")
 
     if centre_of is not None:
         # Get 'slice_idx' at centre of data.
-        label = region_data[centre_of] if type(centre_of) == str else centre_of
+        label = region_data[centre_of] if isinstance(centre_of, str) else centre_of
         extent_centre = get_extent_centre(label)
         slice_idx = extent_centre[view]
 
@@ -1224,9 +1243,9 @@ Prediction: {model_name}""")
 
     if crop is not None:
         # Convert 'crop' to 'Box2D' type.
-        if type(crop) == str:
+        if isinstance(crop, str):
             crop = __get_region_crop(region_data[crop], crop_margin, spacing, view)     # Crop was 'region_data' key.
-        elif type(crop) == np.ndarray:
+        elif isinstance(crop, np.ndarray):
             crop = __get_region_crop(crop, crop_margin, spacing, view)                  # Crop was 'np.ndarray'.
         else:
             crop = tuple(zip(*crop))                                                    # Crop was 'Crop2D' type.
@@ -2128,8 +2147,8 @@ def plot_registration(
             continue
 
         if slice_idx is None:
-            label = data[centre_of] if type(centre_of) == str else centre_of
-            if label.sum() == 0:
+            label = data[centre_of] if isinstance(centre_of, str) else centre_of
+            if not label.any():
                 raise ValueError(f"'centre_of' array must not be empty.")
             extent_centre = get_extent_centre(label)
             slice_idx = extent_centre[view]
@@ -2146,9 +2165,9 @@ def plot_registration(
             continue
 
         if crop is not None:
-            if type(crop) == str:
+            if isinstance(crop, str):
                 crop = __get_region_crop(data[crop], margin, spacing, view)     # Crop was 'region_data' key.
-            elif type(crop) == np.ndarray:
+            elif isinstance(crop, np.ndarray):
                 crop = __get_region_crop(crop, margin, spacing, view)                  # Crop was 'np.ndarray'.
             else:
                 crop = tuple(zip(*crop))                                                    # Crop was 'Crop2D' type.
@@ -2161,7 +2180,8 @@ def plot_registration(
         if ct is not None:
             ct_slice_data.append(__get_slice_data(ct, slice_idx, view))
         else:
-            ct_slice_data.append(__get_slice_data(np.zeros(shape=ct_size), slice_idx, view))
+            # Use a zero-strided view, rather than allocating an empty volume to take one slice.
+            ct_slice_data.append(__get_slice_data(np.broadcast_to(0.0, ct_size), slice_idx, view))
 
     # Crop CT slice data.
     ct_slice_data_tmp = []
@@ -2188,7 +2208,7 @@ def plot_registration(
             continue
         
         if window is not None:
-            if type(window) == str:
+            if isinstance(window, str):
                 if window == 'bone':
                     width, level = (2000, 300)
                 elif window == 'lung':
@@ -2350,7 +2370,7 @@ def __add_outlier_info(df, x, y, hue):
     q3_map = df.groupby(groupby)[y].quantile(.75)
     def q_func_build(qmap):
         def q_func(row):
-            if type(groupby) == list:
+            if isinstance(groupby, list):
                 key = tuple(row[groupby])
             else:
                 key = row[groupby]
@@ -2387,23 +2407,7 @@ def __escape_latex(text: str) -> str:
     args:
         text: the string to escape.
     """
-    # Provide map for special characters.
-    char_map = {
-        '&': r'\&',
-        '%': r'\%',
-        '$': r'\$',
-        '#': r'\#',
-        '_': r'\_',
-        '{': r'\{',
-        '}': r'\}',
-        '~': r'\textasciitilde{}',
-        '^': r'\^{}',
-        '\\': r'\textbackslash{}',
-        '<': r'\textless{}',
-        '>': r'\textgreater{}',
-    }
-    regex = re.compile('|'.join(re.escape(str(key)) for key in sorted(char_map.keys(), key = lambda item: - len(item))))
-    return regex.sub(lambda match: char_map[match.group()], text)
+    return LATEX_REGEXP.sub(lambda match: LATEX_CHAR_MAP[match.group()], text)
 
 def __format_p_values(p_vals: List[float]) -> List[str]:
 >>>>>>> 210721d (Remove unnecessary files/folders.):src/dicomset/plotting/plotter.py
@@ -2575,7 +2579,7 @@ def __plot_region_data(
                 __plot_box_slice(extent, view, colour='b', crop=crop, label=f'{region} conn. extent', linestyle='dashed')
 
         # Skip region if not present on this slice.
-        if not legend_show_all_regions and slice_data.max() == 0:
+        if not legend_show_all_regions and not slice_data.any():
             continue
         else:
             show_legend = True
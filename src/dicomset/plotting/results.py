@@ -56,26 +56,26 @@ def plot_results(
     outer_wspace: float = 0.2,
     savepath: Optional[str] = None,
     y_lim: bool = True) -> None:
-    if type(metrics) == str:
+    if isinstance(metrics, str):
         metrics = np.repeat([[metrics]], len(regions), axis=0)
-    elif type(metrics) == list:
+    elif isinstance(metrics, list):
         metrics = np.repeat([metrics], len(regions), axis=0)
     n_metrics = metrics.shape[1]
-    dfs = [dfs] if type(dfs) == pd.DataFrame else dfs
+    dfs = [dfs] if isinstance(dfs, pd.DataFrame) else dfs
     dfs = dfs * n_metrics if len(dfs) == 1 else dfs         # Broadcast 'dfs' to 'n_metrics'.
     if legend_locs is not None:
-        if type(legend_locs) == str:
+        if isinstance(legend_locs, str):
             legend_locs = [legend_locs]
         assert len(legend_locs) == n_metrics
-    models = [models] if type(models) == str else models
+    models = [models] if isinstance(models, str) else models
     n_models = len(models)
     if model_labels is not None:
-        if type(model_labels) == str:
+        if isinstance(model_labels, str):
             model_labels = [model_labels]
         assert len(model_labels) == n_models
-    regions = [regions] if type(regions) == str else regions
+    regions = [regions] if isinstance(regions, str) else regions
     n_regions = len(regions)
-    stats = [stats] if type(stats) == str else stats
+    stats = [stats] if isinstance(stats, str) else stats
     stats = stats * n_metrics if len(stats) == 1 else stats         # Broadcast 'stats' to 'n_metrics'.
 
     # Lookup tables.
@@ -128,9 +128,9 @@ def plot_bootstrap_fit(
     y_lim: Optional[Tuple[float, float]] = None):
     colours = sns.color_palette('colorblind')[:len(models)]
     legend_loc = DEFAULT_METRIC_LEGEND_LOCS[metric] if legend_loc is None else legend_loc
-    models = [models] if type(models) == str else models
+    models = [models] if isinstance(models, str) else models
     if model_labels is not None:
-        model_labels = [model_labels] if type(model_labels) == str else model_labels
+        model_labels = [model_labels] if isinstance(model_labels, str) else model_labels
         assert len(model_labels) == len(models)
         
     if axs is None:
@@ -1,38 +1,63 @@
-import inspect
 import numpy as np
-from skimage.measure import label   
+from scipy.ndimage import label
+from typing import Optional
 
-def largest_cc_3D(a: np.ndarray) -> np.ndarray:
+def largest_cc_3D(
+    a: np.ndarray,
+    labels: Optional[np.ndarray] = None,
+    out: Optional[np.ndarray] = None) -> np.ndarray:
     if a.dtype != np.bool_:
-        raise ValueError(f"'{inspect[0][3]}' expected a boolean array, got '{a.dtype}'.")
+        raise ValueError(f"'largest_cc_3D' expected a boolean array, got '{a.dtype}'.")
+
+    # Label components with full connectivity (as 'skimage.measure.label' does by default).
+    # A 'labels' buffer can be passed to avoid reallocating it for each item in a batch.
+    structure = np.ones((3,) * a.ndim, dtype=bool)
+    if labels is None:
+        labels = np.empty(a.shape, dtype=np.int32)
+    n_labels = label(a, structure=structure, output=labels)
 
     # Check that there are some foreground pixels.
-    labels = label(a)
-    if labels.max() == 0:
-        return np.zeros_like(a)
+    if n_labels == 0:
+        if out is None:
+            return np.zeros_like(a)
+        out.fill(False)
+        return out
+
+    # A single component is the whole foreground, so skip counting and comparing labels.
+    if n_labels == 1:
+        if out is None:
+            return a.copy()
+        np.copyto(out, a)
+        return out
     
     # Calculate largest component.
-    largest_cc = labels == np.argmax(np.bincount(labels.flat)[1:]) + 1
+    # The comparison writes directly into 'out' when passed, e.g. a batch output slice.
+    counts = np.bincount(labels.ravel(), minlength=n_labels + 1)
+    counts[0] = 0
+    largest_cc = np.equal(labels, np.argmax(counts), out=out)
 
     return largest_cc
 
-def largest_cc_4D(a: np.ndarray) -> np.ndarray:
+def largest_cc_4D(
+    a: np.ndarray,
+    labels: Optional[np.ndarray] = None,
+    out: Optional[np.ndarray] = None) -> np.ndarray:
     if a.dtype != np.bool_:
-        raise ValueError(f"'{inspect[0][3]}' expected a boolean array, got '{a.dtype}'.")
-    ccs = []
-    for data in a:
-        cc = largest_cc_3D(data)
-        ccs.append(cc)
-    output = np.stack(ccs, axis=0)
+        raise ValueError(f"'largest_cc_4D' expected a boolean array, got '{a.dtype}'.")
+
+    # Write components into the output, rather than stacking a list of copies.
+    if labels is None:
+        labels = np.empty(a.shape[1:], dtype=np.int32)
+    output = np.empty_like(a) if out is None else out
+    for i, data in enumerate(a):
+        largest_cc_3D(data, labels=labels, out=output[i])
     return output
 
 def largest_cc_5D(a: np.ndarray) -> np.ndarray:
     if a.dtype != np.bool_:
-        raise ValueError(f"'{inspect[0][3]}' expected a boolean array, got '{a.dtype}'.")
-    ccs = []
-    for data in a:
-        cc = largest_cc_4D(data)
-        ccs.append(cc)
-    output = np.stack(ccs, axis=0)
+        raise ValueError(f"'largest_cc_5D' expected a boolean array, got '{a.dtype}'.")
+    labels = np.empty(a.shape[2:], dtype=np.int32)
+    output = np.empty_like(a)
+    for i, data in enumerate(a):
+        largest_cc_4D(data, labels=labels, out=output[i])
     return output
-        
\ No newline at end of file
@@ -12,9 +12,11 @@ def interpolate_z(data: np.ndarray) -> np.ndarray:
     # Interpolate using ground truth data only, i.e. don't update the 
     # data as we go.
     new_data = data.copy()
+
+    # Find non-empty slices in a single pass, rather than summing each slice per lookup.
+    nonempty = data.any(axis=(0, 1))
     for z in range(z_min, z_max + 1):
-        data_z = data[:, :, z]
-        if data_z.sum() != 0:
+        if nonempty[z]:
             continue
             
         # Find closest non-empty slices.
@@ -22,9 +24,9 @@ def interpolate_z(data: np.ndarray) -> np.ndarray:
         data_below = None
         data_above = None
         for i in range(max_diff):
-            if data_below is None and data[:, :, (z - i - 1)].sum() != 0:
+            if data_below is None and nonempty[z - i - 1]:
                 data_below = data[:, :, (z - i - 1)]
-            if data_above is None and data[:, :, (z + i + 1)].sum() != 0:
+            if data_above is None and nonempty[z + i + 1]:
                 data_above = data[:, :, (z + i + 1)]
             if data_below is not None and data_above is not None:
                 break
@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+from joblib import Parallel, delayed
 import nibabel as nib
 from nibabel.nifti1 import Nifti1Image
 import numpy as np
@@ -6,15 +8,15 @@ from pandas import DataFrame, MultiIndex, read_csv
 from pathlib import Path
 import re
 from time import time
-from typing import Optional
+from typing import Dict, Optional, Set, Tuple
 from tqdm import tqdm
 
 from dicomset.dataset.shared import CT_FROM_REGEXP
 from dicomset.dataset.dicom import DICOMDataset
-from dicomset.dataset.nifti import recreate as recreate_nifti
+from dicomset.dataset.nifti import NIFTIDataset, recreate as recreate_nifti
 from dicomset import logging
 from dicomset.regions import region_to_list
-from dicomset.types import PatientRegions
+from dicomset.types import PatientID, PatientRegions
 from dicomset.utils import append_row, arg_to_list, save_csv
 
 from .dataset import write_flag
@@ -31,6 +33,7 @@ def convert_to_nifti(
     dataset: 'Dataset',
     region: PatientRegions,
     anonymise: bool = False,
+    n_jobs: int = 1,
     show_list_patients_progress: bool = True) -> None:
     start = time()
     logging.info(f"Converting DICOMDataset '{dataset}' to NIFTIDataset '{dataset}', with region '{region}' and anonymise '{anonymise}'.")
@@ -66,50 +69,47 @@ def convert_to_nifti(
     error_index = MultiIndex(levels=[[], []], codes=[[], []], names=ERROR_INDEX)
     error_df = DataFrame(columns=ERROR_COLS.keys(), index=error_index)
 
-    for pat_id in tqdm(pat_ids):
-        try:
-            # Get anonymous ID.
-            if anonymise:
-                anon_id = df[df['patient-id'] == pat_id].index.values[0]
-                filename = f'{anon_id}.nii.gz'
-            else:
-                filename = f'{pat_id}.nii.gz'
+    # Get output filenames.
+    if anonymise:
+        filenames = [f'{i}.nii.gz' for i in df.index.values]
+    else:
+        filenames = [f'{p}.nii.gz' for p in pat_ids]
 
-            # Create CT NIFTI.
-            pat = dicom_set.patient(pat_id)
-            data = pat.ct_data
-            spacing = pat.ct_spacing
-            offset = pat.ct_offset
-            affine = np.array([
-                [spacing[0], 0, 0, offset[0]],
-                [0, spacing[1], 0, offset[1]],
-                [0, 0, spacing[2], offset[2]],
-                [0, 0, 0, 1]])
-            if ct_from is None:
-                img = Nifti1Image(data, affine)
-                filepath = os.path.join(nifti_set.path, 'data', 'ct', filename)
-                os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                nib.save(img, filepath)
+    # Create output folders up front, rather than per file written. Folders for regions not known
+    # until patients are loaded (e.g. region='all') are created on first write.
+    dirs = set()
+    if ct_from is None:
+        dirs.add(os.path.join(nifti_set.path, 'data', 'ct'))
+    regions = region_to_list(region)
+    if regions is not None and regions != ['all']:
+        dirs.update(os.path.join(nifti_set.path, 'data', 'regions', r) for r in regions)
+    for d in dirs:
+        os.makedirs(d, exist_ok=True)
 
-            # Create region NIFTIs.
-            region_data = pat.region_data(only=region)
-            for r, data in region_data.items():
-                img = Nifti1Image(data.astype(np.int32), affine)
-                filepath = os.path.join(nifti_set.path, 'data', 'regions', r, filename)
-                os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                nib.save(img, filepath)
+    if n_jobs == 1:
+        # Load the next patient in a background thread while the current patient is compressed and written.
+        errors = []
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            next_load = executor.submit(__load_patient_nifti_data, dicom_set, pat_ids[0], region, ct_from) if len(pat_ids) > 0 else None
+            for i, (pat_id, filename) in enumerate(zip(tqdm(pat_ids), filenames)):
+                load = next_load
+                if i + 1 < len(pat_ids):
+                    next_load = executor.submit(__load_patient_nifti_data, dicom_set, pat_ids[i + 1], region, ct_from)
+                try:
+                    __save_patient_nifti_data(nifti_set, filename, dirs, *load.result())
+                    errors.append(None)
+                except ValueError as e:
+                    errors.append(str(e))
+    else:
+        # Each patient writes to its own files, so patients can be processed in parallel. Workers
+        # reopen the DICOM/NIFTI datasets by name.
+        errors = Parallel(n_jobs=n_jobs, backend='loky', batch_size='auto')(delayed(__convert_patient_to_nifti)(dataset, pat_id, f, region, ct_from, dirs) for pat_id, f in zip(tqdm(pat_ids), filenames))
 
-            # Create RTDOSE NIFTI.
-            dose_data = pat.dose_data
-            if dose_data is not None:
-                img = Nifti1Image(dose_data, affine)
-                filepath = os.path.join(nifti_set.path, 'data', 'dose', filename)
-                os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                nib.save(img, filepath)
-        except ValueError as e:
+    for pat_id, error in zip(pat_ids, errors):
+        if error is not None:
             data_index = [dataset, pat_id] 
             data = {
-                'error': str(e)
+                'error': error
             }
             error_df = append_row(error_df, data, index=data_index)
 
@@ -186,7 +186,7 @@ def convert_to_nifti_replan(
                 [0, ct_spacing[1], 0, ct_offset[1]],
                 [0, 0, ct_spacing[2], ct_offset[2]],
                 [0, 0, 0, 1]])
-            img = Nifti1Image(ct_data, affine)
+            img = Nifti1Image(__to_ct_storage_dtype(ct_data), affine)
             filepath = os.path.join(nifti_set.path, 'data', 'ct', f'{nifti_id}.nii.gz')
             os.makedirs(os.path.dirname(filepath), exist_ok=True)
             nib.save(img, filepath)
@@ -194,7 +194,7 @@ def convert_to_nifti_replan(
             # Create region NIFTIs for study.
             region_data = study.region_data(only=regions)
             for region, data in region_data.items():
-                img = Nifti1Image(data.astype(np.int32), affine)
+                img = Nifti1Image(data.astype(np.uint8), affine)
                 filepath = os.path.join(nifti_set.path, 'data', 'regions', region, f'{nifti_id}.nii.gz')
                 os.makedirs(os.path.dirname(filepath), exist_ok=True)
                 nib.save(img, filepath)
@@ -220,3 +220,87 @@ def convert_to_nifti_replan(
 
     # Indicate success.
     write_flag(nifti_set, '__CONVERT_FROM_NIFTI_END__')
+
+def __convert_patient_to_nifti(
+    dataset: str,
+    pat_id: PatientID,
+    filename: str,
+    region: PatientRegions,
+    ct_from: Optional[str],
+    dirs: Set[str]) -> Optional[str]:
+    # Returns the error message if conversion failed.
+    dicom_set = DICOMDataset(dataset)
+    nifti_set = NIFTIDataset(dataset)
+    try:
+        data = __load_patient_nifti_data(dicom_set, pat_id, region, ct_from)
+        __save_patient_nifti_data(nifti_set, filename, dirs, *data)
+    except ValueError as e:
+        return str(e)
+
+    return None
+
+def __load_patient_nifti_data(
+    dicom_set: DICOMDataset,
+    pat_id: PatientID,
+    region: PatientRegions,
+    ct_from: Optional[str]) -> Tuple[np.ndarray, Optional[np.ndarray], Dict[str, np.ndarray], Optional[np.ndarray]]:
+    pat = dicom_set.patient(pat_id)
+    spacing = pat.ct_spacing
+    offset = pat.ct_offset
+    affine = np.diag((*spacing, 1)).astype(np.float64)
+    affine[:3, 3] = offset
+    ct_data = __to_ct_storage_dtype(pat.ct_data) if ct_from is None else None
+    region_data = pat.region_data(only=region)
+    dose_data = pat.dose_data
+    return affine, ct_data, region_data, dose_data
+
+def __save_patient_nifti_data(
+    nifti_set: NIFTIDataset,
+    filename: str,
+    dirs: Set[str],
+    affine: np.ndarray,
+    ct_data: Optional[np.ndarray],
+    region_data: Dict[str, np.ndarray],
+    dose_data: Optional[np.ndarray]) -> None:
+    # Create CT NIFTI.
+    if ct_data is not None:
+        img = Nifti1Image(ct_data, affine)
+        dirpath = os.path.join(nifti_set.path, 'data', 'ct')
+        if dirpath not in dirs:
+            os.makedirs(dirpath, exist_ok=True)
+            dirs.add(dirpath)
+        filepath = os.path.join(dirpath, filename)
+        nib.save(img, filepath)
+
+    # Create region NIFTIs.
+    for r, data in region_data.items():
+        # Boolean masks are reinterpreted as uint8 without copying.
+        data = data.view(np.uint8) if data.dtype == bool else data.astype(np.uint8)
+        img = Nifti1Image(data, affine)
+        dirpath = os.path.join(nifti_set.path, 'data', 'regions', r)
+        if dirpath not in dirs:
+            os.makedirs(dirpath, exist_ok=True)
+            dirs.add(dirpath)
+        filepath = os.path.join(dirpath, filename)
+        nib.save(img, filepath)
+
+    # Create RTDOSE NIFTI.
+    if dose_data is not None:
+        img = Nifti1Image(dose_data, affine)
+        dirpath = os.path.join(nifti_set.path, 'data', 'dose')
+        if dirpath not in dirs:
+            os.makedirs(dirpath, exist_ok=True)
+            dirs.add(dirpath)
+        filepath = os.path.join(dirpath, filename)
+        nib.save(img, filepath)
+
+def __to_ct_storage_dtype(data: np.ndarray) -> np.ndarray:
+    # HU values are almost always integers, and storing them as int16 rather than float32
+    # halves the bytes that 'nib.save' has to gzip. Readers load with 'get_fdata', so are unaffected.
+    info = np.iinfo(np.int16)
+    if data.min() < info.min or data.max() > info.max:
+        return data
+    data_int = data.astype(np.int16)
+    if not np.array_equal(data_int, data):
+        return data
+    return data_int
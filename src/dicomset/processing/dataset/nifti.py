@@ -1,3 +1,5 @@
+from contextlib import nullcontext
+from joblib import Parallel, delayed
 import nibabel as nib
 from nibabel.nifti1 import Nifti1Image
 import numpy as np
@@ -9,7 +11,7 @@ from scipy.ndimage import binary_dilation
 import shutil
 from time import time
 from tqdm import tqdm
-from typing import Literal, List, Optional, Tuple, Union
+from typing import Dict, Literal, List, Optional, Tuple, Union
 
 <<<<<<< HEAD:mymi/processing/dataset/nifti.py
 from mymi import config
@@ -43,6 +45,7 @@ from dicomset.dataset.nifti import recreate as recreate_nifti
 from dicomset.dataset.training import TrainingDataset, exists
 from dicomset.dataset.training import create as create_training
 from dicomset.dataset.training import recreate as recreate_training
+from dicomset.dataset.training.packed import PackedFile, append_packed, write_packed
 from dicomset.loaders import Loader
 from dicomset import logging
 from dicomset.models import replace_ckpt_alias
@@ -67,7 +70,8 @@ def convert_replan_adaptive_to_training(
     recreate_dataset: bool = True,
     region: Optional[PatientRegions] = None,
     round_dp: Optional[int] = None,
-    spacing: Optional[ImageSpacing3D] = None) -> None:
+    spacing: Optional[ImageSpacing3D] = None,
+    use_compression: bool = True) -> None:
     logging.arg_log('Converting NIFTI dataset to adaptive brain crop TRAINING_ADAPTIVE', ('dataset', 'region'), (dataset, region))
     regions = region_to_list(region)
 
@@ -203,11 +207,11 @@ def convert_replan_adaptive_to_training(
                 region_data_pt = dict((r, crop_3D(d, crop)) for r, d in region_data_pt.items())
 
             # Save input.
-            __create_training_input(set_t, f'{i}-0', input_mt)
-            __create_training_input(set_t, f'{i}-1', input_pt)
+            __create_training_input(set_t, f'{i}-0', input_mt, use_compression=use_compression)
+            __create_training_input(set_t, f'{i}-1', input_pt, use_compression=use_compression)
             for j, region in enumerate(regions):
                 if region in region_data_pt:
-                    __create_training_input(set_t, i, region_data_pt[region], region=region)
+                    __create_training_input(set_t, i, region_data_pt[region], region=region, use_compression=use_compression)
 
             for region in regions:
                 # Skip if patient doesn't have region.
@@ -242,7 +246,7 @@ def convert_replan_adaptive_to_training(
                 # Save label. Filter out labels with no foreground voxels, e.g. from resampling small OARs.
                 if label.sum() != 0:
                     empty = False
-                    __create_training_label(set_t, i, label, region=region)
+                    __create_training_label(set_t, i, label, region=region, use_compression=use_compression)
                 else:
                     empty = True
 
@@ -292,7 +296,8 @@ def convert_replan_adaptive_mirror_to_training(
     recreate_dataset: bool = True,
     region: Optional[PatientRegions] = None,
     round_dp: Optional[int] = None,
-    spacing: Optional[ImageSpacing3D] = None) -> None:
+    spacing: Optional[ImageSpacing3D] = None,
+    use_compression: bool = True) -> None:
     logging.arg_log('Converting NIFTI dataset to adaptive mirror brain crop TRAINING ADAPTIVE', ('dataset', 'region'), (dataset, region))
     regions = region_to_list(region)
 
@@ -433,17 +438,17 @@ def convert_replan_adaptive_mirror_to_training(
                 region_data_input = dict((r, crop_3D(d, crop)) for r, d in region_data_input.items())
 
             # Save input.
-            __create_training_input(set_t, f'{i}-0', input_mt if is_mt else input_pt)
-            __create_training_input(set_t, f'{i}-1', input_pt if is_mt else input_mt)
+            __create_training_input(set_t, f'{i}-0', input_mt if is_mt else input_pt, use_compression=use_compression)
+            __create_training_input(set_t, f'{i}-1', input_pt if is_mt else input_mt, use_compression=use_compression)
             for j, region in enumerate(regions):
                 if region in region_data_input:
-                    __create_training_input(set_t, i, region_data_input[region], region=region)
+                    __create_training_input(set_t, i, region_data_input[region], region=region, use_compression=use_compression)
 
-            pat_label = set.patient(pat_id_label)
-            regions_label = pat_label.list_regions(only=regions)
+            # Label regions are those that were loaded, rather than listing the patient's regions again.
+            regions_label = list(region_data_label.keys())
             for region in regions:
                 # Skip if patient doesn't have region.
-                if not pat_label.has_region(region):
+                if region not in region_data_label:
                     continue
 
                 # Skip if region in 'excluded-labels.csv'.
@@ -474,7 +479,7 @@ def convert_replan_adaptive_mirror_to_training(
                 # Save label. Filter out labels with no foreground voxels, e.g. from resampling small OARs.
                 if label.sum() != 0:
                     empty = False
-                    __create_training_label(set_t, i, label, region=region)
+                    __create_training_label(set_t, i, label, region=region, use_compression=use_compression)
                 else:
                     empty = True
 
@@ -1084,7 +1089,7 @@ def convert_replan_to_lens_crop(
             data = crop_3D(data, crop)
             
             # Save NIFTI label.
-            img = Nifti1Image(data.astype(np.int32), affine)
+            img = Nifti1Image(data.astype(np.uint8), affine)
             filepath = os.path.join(dset.path, 'data', 'regions', region, f'{pat_id}.nii.gz')
             os.makedirs(os.path.dirname(filepath), exist_ok=True)
             nib.save(img, filepath)
@@ -1303,12 +1308,17 @@ def convert_to_training(
     dilate_iter: int = 3,
     dilate_regions: List[str] = [],
     log_warnings: bool = False,
+    n_jobs: int = 1,
     output_size: Optional[ImageSize3D] = None,
     output_spacing: Optional[ImageSpacing3D] = None,
+    pack_data: bool = False,
+    pack_label_bits: bool = False,
     recreate_dataset: bool = True,
     region: Optional[PatientRegions] = None,
     round_dp: Optional[int] = None) -> None:
     logging.arg_log('Converting NIFTI dataset to TRAINING', ('dataset', 'region'), (dataset, region))
+    if pack_data and pack_label_bits:
+        raise ValueError(f"Can't use 'pack_label_bits' with 'pack_data', packed labels are stored as unpacked booleans.")
     regions = arg_to_list(region, str)
 
     # Use all regions if region is 'None'.
@@ -1381,96 +1391,40 @@ def convert_to_training(
     # Load patient grouping if present.
     group_df = set.group_index
 
+    # Open packed data files - one per input/region, each with a sample offset index. Failed
+    # conversions remove the partially written files.
+    if create_data and pack_data:
+        dirpaths = { None: os.path.join(set_t.path, 'data', 'inputs') }
+        for region in regions:
+            dirpaths[region] = os.path.join(set_t.path, 'data', 'labels', region)
+        packed_context = write_packed(dirpaths)
+    else:
+        packed_context = nullcontext()
+
     # Write each patient to dataset.
     start = time()
-    if create_data:
-        for i, pat_id in enumerate(tqdm(pat_ids)):
-            # Load input data.
-            patient = set.patient(pat_id)
-            spacing = patient.ct_spacing
-            input = patient.ct_data
-
-            # Resample input.
-            if output_spacing:
-                input = resample_3D(input, spacing=spacing, output_spacing=output_spacing)
-
-            # Crop/pad.
-            if output_size:
-                # Log warning if we're cropping the FOV as we're losing information.
-                if log_warnings:
-                    if output_spacing:
-                        fov_spacing = output_spacing
-                    else:
-                        fov_spacing = spacing
-                    fov = np.array(input.shape) * fov_spacing
-                    new_fov = np.array(output_size) * fov_spacing
-                    for axis in range(len(output_size)):
-                        if fov[axis] > new_fov[axis]:
-                            logging.warning(f"Patient '{patient}' had FOV '{fov}', larger than new FOV after crop/pad '{new_fov}' for axis '{axis}'.")
-
-                # Perform crop/pad.
-                input = top_crop_or_pad_3D(input, output_size, fill=input.min())
-
-            # Save input.
-            __create_training_input(set_t, i, input)
-
-            for region in regions:
-                # Skip if patient doesn't have region.
-                if not set.patient(pat_id).has_region(region):
-                    continue
-
-                # Skip if region in 'excluded-labels.csv'.
-                if exc_df is not None:
-                    pr_df = exc_df[(exc_df['patient-id'] == pat_id) & (exc_df['region'] == region)]
-                    if len(pr_df) == 1:
-                        continue
-
-                # Load label data.
-                label = patient.region_data(region=region)[region]
-
-                # Resample data.
-                if output_spacing:
-                    label = resample_3D(label, spacing=spacing, output_spacing=output_spacing)
-
-                # Crop/pad.
-                if output_size:
-                    label = top_crop_or_pad_3D(label, output_size)
-
-                # Round data after resampling to save on disk space.
-                if round_dp is not None:
-                    input = np.around(input, decimals=round_dp)
-
-                # Dilate the labels if requested.
-                if region in dilate_regions:
-                    label = binary_dilation(label, iterations=dilate_iter)
-
-                # Save label. Filter out labels with no foreground voxels, e.g. from resampling small OARs.
-                if label.sum() != 0:
-                    empty = False
-                    __create_training_label(set_t, i, label, region=region)
-                else:
-                    empty = True
-
-                # Add index entry.
-                if group_df is not None:
-                    tdf = group_df[group_df['patient-id'] == pat_id]
-                    if len(tdf) == 0:
-                        group_id = np.nan
-                    else:
-                        assert len(tdf) == 1
-                        group_id = tdf.iloc[0]['group-id']
-                else:
-                    group_id = np.nan
-                data = {
-                    'dataset': set_t.name,
-                    'sample-id': i,
-                    'group-id': group_id,
-                    'origin-dataset': set.name,
-                    'origin-patient-id': pat_id,
-                    'region': region,
-                    'empty': empty
-                }
-                index = append_row(index, data)
+    with packed_context as packed:
+        if create_data:
+            kwargs = {
+                'dilate_iter': dilate_iter,
+                'dilate_regions': dilate_regions,
+                'exc_df': exc_df,
+                'group_df': group_df,
+                'log_warnings': log_warnings,
+                'output_size': output_size,
+                'output_spacing': output_spacing,
+                'pack_label_bits': pack_label_bits,
+                'round_dp': round_dp
+            }
+            if pack_data or n_jobs == 1:
+                # Packed files are appended in sample order, so must be written by a single process.
+                rows = [__convert_to_training_sample(set, set_t, i, pat_id, regions, packed=packed, **kwargs) for i, pat_id in enumerate(tqdm(pat_ids))]
+            else:
+                # Each sample writes to its own files, so patients can be processed in parallel. Workers
+                # reopen the NIFTI dataset by name.
+                rows = Parallel(n_jobs=n_jobs, backend='loky', batch_size='auto')(delayed(__convert_to_training_sample)(dataset, set_t, i, pat_id, regions, **kwargs) for i, pat_id in enumerate(tqdm(pat_ids)))
+            rows = [r for pat_rows in rows for r in pat_rows]
+            index = pd.DataFrame(rows, columns=cols.keys())
 
     end = time()
 
@@ -1520,7 +1474,7 @@ def create_excluded_brainstem(
             [0, ct_spacing[1], 0, ct_offset[1]],
             [0, 0, ct_spacing[2], ct_offset[2]],
             [0, 0, 0, 1]])
-        img = Nifti1Image(brain_data.astype(np.int32), affine)
+        img = Nifti1Image(brain_data.astype(np.uint8), affine)
         filepath = os.path.join(dest_set.path, 'data', 'regions', 'Brain', f'{pat_id}.nii.gz')
         nib.save(img, filepath)
 
@@ -1807,7 +1761,7 @@ def __create_training_input(
     if use_compression:
         filepath = os.path.join(filepath, f'{index}.npz')
     else:
-        filepath = os.path.join(filepath, f'{index}.np')
+        filepath = os.path.join(filepath, f'{index}.npy')
 
     if not os.path.exists(os.path.dirname(filepath)):
         os.makedirs(os.path.dirname(filepath))
@@ -1818,26 +1772,147 @@ def __create_training_input(
     else:
         np.save(filepath, data)
 
+def __convert_to_training_sample(
+    dataset: Union[str, NIFTIDataset],
+    set_t: TrainingDataset,
+    i: int,
+    pat_id: PatientID,
+    regions: List[PatientRegion],
+    dilate_iter: int = 3,
+    dilate_regions: List[str] = [],
+    exc_df: Optional[pd.DataFrame] = None,
+    group_df: Optional[pd.DataFrame] = None,
+    log_warnings: bool = False,
+    output_size: Optional[ImageSize3D] = None,
+    output_spacing: Optional[ImageSpacing3D] = None,
+    pack_label_bits: bool = False,
+    packed: Optional[Dict[Optional[PatientRegion], PackedFile]] = None,
+    round_dp: Optional[int] = None) -> List[Dict]:
+    # Load input data. Parallel workers are passed the dataset name, as they reopen the dataset.
+    set = NIFTIDataset(dataset) if isinstance(dataset, str) else dataset
+    patient = set.patient(pat_id)
+    spacing = patient.ct_spacing
+    input = patient.ct_data
+
+    # Resample input.
+    if output_spacing:
+        input = resample_3D(input, spacing=spacing, output_spacing=output_spacing)
+
+    # Crop/pad.
+    if output_size:
+        # Log warning if we're cropping the FOV as we're losing information.
+        if log_warnings:
+            if output_spacing:
+                fov_spacing = output_spacing
+            else:
+                fov_spacing = spacing
+            fov = np.array(input.shape) * fov_spacing
+            new_fov = np.array(output_size) * fov_spacing
+            for axis in range(len(output_size)):
+                if fov[axis] > new_fov[axis]:
+                    logging.warning(f"Patient '{patient}' had FOV '{fov}', larger than new FOV after crop/pad '{new_fov}' for axis '{axis}'.")
+
+        # Perform crop/pad.
+        input = top_crop_or_pad_3D(input, output_size, fill=input.min())
+
+    # Save input.
+    if packed is not None:
+        append_packed(packed[None], i, input)
+    else:
+        __create_training_input(set_t, i, input)
+
+    rows = []
+    for region in regions:
+        # Skip if patient doesn't have region.
+        if not set.patient(pat_id).has_region(region):
+            continue
+
+        # Skip if region in 'excluded-labels.csv'.
+        if exc_df is not None:
+            pr_df = exc_df[(exc_df['patient-id'] == pat_id) & (exc_df['region'] == region)]
+            if len(pr_df) == 1:
+                continue
+
+        # Load label data.
+        label = patient.region_data(region=region)[region]
+
+        # Resample data.
+        if output_spacing:
+            label = resample_3D(label, spacing=spacing, output_spacing=output_spacing)
+
+        # Crop/pad.
+        if output_size:
+            label = top_crop_or_pad_3D(label, output_size)
+
+        # Round data after resampling to save on disk space.
+        if round_dp is not None:
+            input = np.around(input, decimals=round_dp)
+
+        # Dilate the labels if requested.
+        if region in dilate_regions:
+            label = binary_dilation(label, iterations=dilate_iter)
+
+        # Save label. Filter out labels with no foreground voxels, e.g. from resampling small OARs.
+        if label.sum() != 0:
+            empty = False
+            if packed is not None:
+                append_packed(packed[region], i, label.astype(bool, copy=False))
+            else:
+                __create_training_label(set_t, i, label, pack_bits=pack_label_bits, region=region)
+        else:
+            empty = True
+
+        # Add index entry.
+        if group_df is not None:
+            tdf = group_df[group_df['patient-id'] == pat_id]
+            if len(tdf) == 0:
+                group_id = np.nan
+            else:
+                assert len(tdf) == 1
+                group_id = tdf.iloc[0]['group-id']
+        else:
+            group_id = np.nan
+        data = {
+            'dataset': set_t.name,
+            'sample-id': i,
+            'group-id': group_id,
+            'origin-dataset': set.name,
+            'origin-patient-id': pat_id,
+            'region': region,
+            'empty': empty
+        }
+        rows.append(data)
+
+    return rows
+
 def __create_training_label(
     dataset: 'Dataset',
     index: int,
     data: np.ndarray,
     region: Optional[str] = None,
+    pack_bits: bool = False,
     use_compression: bool = True) -> None:
     if region is not None:
         filepath = os.path.join(dataset.path, 'data', 'labels', region)
     else:
         filepath = os.path.join(dataset.path, 'data', 'labels')
 
+    # Labels are binary masks, store with one byte per voxel.
+    data = np.ascontiguousarray(data, dtype=bool)
+
     if use_compression:
         filepath = os.path.join(filepath, f'{index}.npz')
     else:
-        filepath = os.path.join(filepath, f'{index}.np')
+        filepath = os.path.join(filepath, f'{index}.npy')
 
     if not os.path.exists(os.path.dirname(filepath)):
         os.makedirs(os.path.dirname(filepath))
 
     if use_compression:
-        np.savez_compressed(filepath, data=data)
+        if pack_bits:
+            # Store one bit per voxel, with the shape required to unpack.
+            np.savez_compressed(filepath, data=np.packbits(data), shape=data.shape)
+        else:
+            np.savez_compressed(filepath, data=data)
     else:
         np.save(filepath, data)
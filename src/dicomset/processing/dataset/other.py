@@ -35,14 +35,11 @@ def convert_to_training(
         n_validation = len(samples) - n_train
     else:
         n_validation = int(np.floor(p_val * len(samples)))
-    train_samples = samples[:n_train]
-    validation_samples = samples[n_train:(n_train + n_validation)]
-    test_samples = samples[(n_train + n_validation):]
-    logging.info(f"Num patients per partition: {len(train_samples)}/{len(validation_samples)}/{len(test_samples)} for train/validation/test.")
+    partition_samples = np.array_split(np.asarray(samples), [n_train, n_train + n_validation])
+    logging.info(f"Num patients per partition: {'/'.join(str(len(s)) for s in partition_samples)} for train/validation/test.")
 
     # Write data to each partition.
     partitions = ['train', 'validation', 'test']
-    partition_samples = [train_samples, validation_samples, test_samples]
     for partition, samples in zip(partitions, partition_samples):
         logging.info(f"Creating partition '{partition}'...")
         # TODO: implement normalisation.
@@ -54,7 +54,7 @@ def get_ct_summary(
         'spacing': float,
         'fov': float
     }
-    df = pd.DataFrame(columns=cols.keys())
+    rows = []
 
     for pat_id in tqdm(pat_ids):
         # Load values.
@@ -73,10 +73,10 @@ def get_ct_summary(
                 'spacing': spacing[axis],
                 'fov': fov[axis]
             }
-            df = append_row(df, data)
+            rows.append(data)
 
-    # Set column types as 'append' crushes them.
-    df = df.astype(cols)
+    # Create dataframe.
+    df = pd.DataFrame(rows, columns=cols.keys()).astype(cols)
 
     return df
 
@@ -272,7 +272,7 @@ def get_region_summary(
         'extent-mm': float,
         'spacing-mm': float
     }
-    df = pd.DataFrame(columns=cols.keys())
+    rows = []
 
     axes = [0, 1, 2]
 
@@ -310,9 +310,9 @@ def get_region_summary(
                     'extent-mm': extent_mm,
                     'spacing-mm': spacing[axis]
                 }
-                df = append_row(df, data)
+                rows.append(data)
 
-    # Set column types as 'append' crushes them.
+    df = pd.DataFrame(rows, columns=cols.keys())
     df = df.astype(cols)
 
     return df
@@ -78,7 +78,11 @@ def get_region_summary(
         'metric': str,
         'value': float
     }
-    df = pd.DataFrame(columns=cols.keys())
+    rows = []
+
+    # Buffers for 'largest_cc_3D', reused while patient image sizes match.
+    cc_labels = None
+    lcc_label = None
 
     for pat in tqdm(pats):
         spacing = set.patient(pat).ct_spacing
@@ -90,40 +94,44 @@ def get_region_summary(
         }
 
         # Add 'min/max' extent metrics.
-        min_extent_vox = np.argwhere(label).min(axis=0)
+        # The extent is found in a single pass and reused for the extent width below.
+        extent = get_extent(label)
+        min_extent_vox, max_extent_vox = np.array(extent)
         min_extent_mm = min_extent_vox * spacing
-        max_extent_vox = np.argwhere(label).max(axis=0)
         max_extent_mm = max_extent_vox * spacing
         for axis, min, max in zip(('x', 'y', 'z'), min_extent_mm, max_extent_mm):
             data['metric'] = f'min-extent-mm-{axis}'
             data['value'] = min
-            df = append_row(df, data)
+            rows.append(data.copy())
             data['metric'] = f'max-extent-mm-{axis}'
             data['value'] = max
-            df = append_row(df, data)
+            rows.append(data.copy())
 
         # Add 'connected' metrics.
-        lcc_label = largest_cc_3D(label)
+        if cc_labels is None or cc_labels.shape != label.shape:
+            cc_labels = np.empty(label.shape, dtype=np.int32)
+            lcc_label = np.empty(label.shape, dtype=bool)
+        largest_cc_3D(label, labels=cc_labels, out=lcc_label)
+        n_voxels = label.sum()
+        n_lcc_voxels = lcc_label.sum()
         data['metric'] = 'connected'
-        data['value'] = 1 if lcc_label.sum() == label.sum() else 0
-        df = append_row(df, data)
+        data['value'] = 1 if n_lcc_voxels == n_voxels else 0
+        rows.append(data.copy())
         data['metric'] = 'connected-largest-p'
-        data['value'] = lcc_label.sum() / label.sum()
-        df = append_row(df, data)
+        data['value'] = n_lcc_voxels / n_voxels
+        rows.append(data.copy())
 
         # Add OAR extent.
-        ext_width_mm = get_extent_width_mm(label, spacing)
-        if ext_width_mm is None:
-            ext_width_mm = (0, 0, 0)
+        ext_width_mm = (max_extent_vox - min_extent_vox) * spacing
         data['metric'] = 'extent-mm-x'
         data['value'] = ext_width_mm[0]
-        df = append_row(df, data)
+        rows.append(data.copy())
         data['metric'] = 'extent-mm-y'
         data['value'] = ext_width_mm[1]
-        df = append_row(df, data)
+        rows.append(data.copy())
         data['metric'] = 'extent-mm-z'
         data['value'] = ext_width_mm[2]
-        df = append_row(df, data)
+        rows.append(data.copy())
 
         # Add extent of largest connected component.
         extent = get_extent(lcc_label)
@@ -135,21 +143,21 @@ def get_region_summary(
             extent_mm = (0, 0, 0)
         data['metric'] = 'connected-extent-mm-x'
         data['value'] = extent_mm[0]
-        df = append_row(df, data)
+        rows.append(data.copy())
         data['metric'] = 'connected-extent-mm-y'
         data['value'] = extent_mm[1]
-        df = append_row(df, data)
+        rows.append(data.copy())
         data['metric'] = 'connected-extent-mm-z'
         data['value'] = extent_mm[2]
-        df = append_row(df, data)
+        rows.append(data.copy())
 
         # Add volume.
         vox_volume = reduce(np.multiply, spacing)
         data['metric'] = 'volume-mm3'
-        data['value'] = vox_volume * label.sum() 
-        df = append_row(df, data)
+        data['value'] = vox_volume * n_voxels
+        rows.append(data.copy())
 
-    # Set column types as 'append' crushes them.
+    df = pd.DataFrame(rows, columns=cols.keys())
     df = df.astype(cols)
 
     return df
@@ -350,7 +358,7 @@ def get_ct_summary(
         'spacing': float,
         'fov': float
     }
-    df = pd.DataFrame(columns=cols.keys())
+    rows = []
 
     for pat in tqdm(pats):
         # Load values.
@@ -370,10 +378,10 @@ def get_ct_summary(
                 'spacing': spacing[axis],
                 'fov': fov[axis]
             }
-            df = append_row(df, data)
+            rows.append(data)
 
-    # Set column types as 'append' crushes them.
-    df = df.astype(cols)
+    # Create dataframe.
+    df = pd.DataFrame(rows, columns=cols.keys()).astype(cols)
 
     return df
 
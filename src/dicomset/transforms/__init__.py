@@ -1,3 +1,4 @@
+from .batch_affine import BatchAffine
 from .crop import centre_crop_3D, centre_pad_3D, centre_pad_4D, crop_2D, crop_3D, crop_4D, crop_or_pad_box, crop_point, crop_or_pad_point, crop_or_pad_2D, centre_crop_or_pad_3D, centre_crop_or_pad_4D, crop_foreground_3D, crop_or_pad_3D, crop_or_pad_4D, pad_2D, pad_3D, pad_4D, point_crop_or_pad_3D, top_crop_or_pad_3D
 from .custom import Standardise
 from .dvf import apply_dvf
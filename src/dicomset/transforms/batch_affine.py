@@ -0,0 +1,83 @@
+import numpy as np
+import torch
+from torch.nn.functional import affine_grid, grid_sample
+from typing import Optional, Tuple
+
+from dicomset.types import ImageSize3D, ImageSpacing3D
+
+class BatchAffine:
+    def __init__(
+        self,
+        rotation: float = 0,
+        scale: float = 0,
+        spacing: Optional[ImageSpacing3D] = None,
+        translation: float = 0):
+        """
+        kwargs:
+            rotation: the maximum rotation in degrees about each axis.
+            scale: the maximum scale change, e.g. 0.2 samples scales in [0.8, 1.2].
+            spacing: the voxel spacing of the batch, rotations are applied in physical space when passed.
+            translation: the maximum translation in voxels along each axis.
+        """
+        self.rotation = rotation
+        self.scale = scale
+        self.spacing = spacing
+        self.translation = translation
+
+    def __call__(
+        self,
+        input: torch.Tensor,
+        label: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        returns: the transformed (input, label) pair.
+        args:
+            input: the (N, C, X, Y, Z) input batch.
+            label: the (N, C, X, Y, Z) label batch.
+        """
+        # Sample an affine per batch item and resample the whole batch at once.
+        theta = self.sample_theta(input.shape[0], input.shape[2:], input.device)
+        grid = affine_grid(theta, input.shape, align_corners=False)
+        input = grid_sample(input.float(), grid, align_corners=False, mode='bilinear', padding_mode='border').to(input.dtype)
+        label = grid_sample(label.float(), grid, align_corners=False, mode='nearest', padding_mode='zeros').to(label.dtype)
+
+        return input, label
+
+    def sample_theta(
+        self,
+        n: int,
+        size: ImageSize3D,
+        device: torch.device) -> torch.Tensor:
+        """
+        returns: the (n, 3, 4) affine matrices in 'affine_grid' normalised coordinates.
+        args:
+            n: the number of matrices.
+            size: the spatial size of the batch.
+            device: the device to create the matrices on.
+        """
+        # Sample parameters.
+        angles = (torch.rand(n, 3, device=device) * 2 - 1) * np.deg2rad(self.rotation)
+        scales = 1 + (torch.rand(n, 3, device=device) * 2 - 1) * self.scale
+        translations = (torch.rand(n, 3, device=device) * 2 - 1) * self.translation
+
+        # Create rotation matrices.
+        cos, sin = torch.cos(angles), torch.sin(angles)
+        zeros, ones = torch.zeros(n, device=device), torch.ones(n, device=device)
+        rot_x = torch.stack([ones, zeros, zeros, zeros, cos[:, 0], -sin[:, 0], zeros, sin[:, 0], cos[:, 0]], dim=1).view(n, 3, 3)
+        rot_y = torch.stack([cos[:, 1], zeros, sin[:, 1], zeros, ones, zeros, -sin[:, 1], zeros, cos[:, 1]], dim=1).view(n, 3, 3)
+        rot_z = torch.stack([cos[:, 2], -sin[:, 2], zeros, sin[:, 2], cos[:, 2], zeros, zeros, zeros, ones], dim=1).view(n, 3, 3)
+        matrix = rot_z @ rot_y @ rot_x @ torch.diag_embed(scales)
+
+        # 'affine_grid' orders coordinates from the last spatial axis, i.e. (z, y, x).
+        # Rotations are sampled in physical space, so conjugate with the spacing to get the
+        # voxel-space matrix, otherwise rotations become shears for anisotropic spacing.
+        if self.spacing is not None:
+            spacing = torch.tensor(tuple(reversed(self.spacing)), dtype=torch.float32, device=device)
+            matrix = matrix * spacing.view(1, 1, 3) / spacing.view(1, 3, 1)
+
+        # Convert from voxel to normalised coordinates.
+        half_size = torch.tensor(tuple(reversed(size)), dtype=torch.float32, device=device) / 2
+        matrix = matrix * half_size.view(1, 1, 3) / half_size.view(1, 3, 1)
+        translations = translations / half_size
+
+        theta = torch.cat((matrix, translations.unsqueeze(-1)), dim=2)
+        return theta
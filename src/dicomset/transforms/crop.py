@@ -50,8 +50,6 @@ def crop_or_pad_3D(
     data: np.ndarray,
     bounding_box: Box3D,
     fill: Union[float, Literal['min']] = 'min') -> np.ndarray:
-    if fill == 'min':
-        fill = np.min(data)
     assert len(data.shape) == 3, f"Input 'data' must have dimension 3."
 
     min, max = bounding_box
@@ -60,20 +58,35 @@ def crop_or_pad_3D(
         if width <= 0:
             raise ValueError(f"Crop width must be positive, got '{bounding_box}'.")
 
-    # Perform padding.
+    # Get the region of 'data' that overlaps the box.
     size = np.array(data.shape)
-    pad_min = (-np.array(min)).clip(0)
-    pad_max = (max - size).clip(0)
-    padding = tuple(zip(pad_min, pad_max))
-    data = np.pad(data, padding, constant_values=fill)
+    min = np.array(min)
+    max = np.array(max)
+    crop_min = min.clip(0)
+    crop_max = np.minimum(max, size)
+    crop_slices = tuple(slice(c_min, c_max) for c_min, c_max in zip(crop_min, crop_max))
 
-    # Perform cropping.
-    crop_min = np.array(min).clip(0)
-    crop_max = (size - max).clip(0)
-    slices = tuple(slice(min, s - max) for min, max, s in zip(crop_min, crop_max, data.shape))
-    data = data[slices]
+    # Perform cropping only.
+    if np.all(min >= 0) and np.all(max <= size):
+        return data[crop_slices].copy()
 
-    return data
+    # Copy the overlapping region into a filled output, rather than padding the whole volume and then cropping.
+    if fill == 'min':
+        fill = np.min(data)
+    if not np.all(crop_max > crop_min):
+        return np.full(max - min, fill, dtype=data.dtype)
+
+    # Fill only the border slabs around the overlap, so each output voxel is written once (slab corners aside).
+    output = np.empty(max - min, dtype=data.dtype)
+    output_slices = tuple(slice(c_min - m, c_max - m) for c_min, c_max, m in zip(crop_min, crop_max, min))
+    output[output_slices] = data[crop_slices]
+    for axis, s in enumerate(output_slices):
+        before = tuple(slice(0, s.start) if a == axis else slice(None) for a in range(3))
+        after = tuple(slice(s.stop, None) if a == axis else slice(None) for a in range(3))
+        output[before] = fill
+        output[after] = fill
+
+    return output
 
 def centre_pad_4D(
     data: np.ndarray,
@@ -118,7 +131,6 @@ def pad_2D(
     bounding_box: Box2D,
     fill: Union[float, Literal['min']] = 'min') -> np.ndarray:
     assert len(data.shape) == 2, f"Input 'data' must have dimension 2."
-    fill = np.min(data) if fill == 'min' else fill
 
     min, max = bounding_box
     for i in range(2):
@@ -126,11 +138,11 @@ def pad_2D(
         if width <= 0:
             raise ValueError(f"Pad width must be positive, got '{bounding_box}'.")
 
-    # Perform padding.
-    size = np.array(data.shape)
-    pad_min = (-np.array(min)).clip(0)
-    pad_max = (max - size).clip(0)
-    padding = tuple(zip(pad_min, pad_max))
+    # Perform padding. Only scan 'data' for the fill value if padding is required.
+    padding = tuple((int(-mn) if mn < 0 else 0, int(mx - s) if mx > s else 0) for mn, mx, s in zip(min, max, data.shape))
+    if not any(p_min or p_max for p_min, p_max in padding):
+        return data.copy()
+    fill = np.min(data) if fill == 'min' else fill
     data = np.pad(data, padding, constant_values=fill)
 
     return data
@@ -140,7 +152,6 @@ def pad_3D(
     bounding_box: Box3D,
     fill: Union[float, Literal['min']] = 'min') -> np.ndarray:
     assert len(data.shape) == 3, f"Input 'data' must have dimension 3."
-    fill = np.min(data) if fill == 'min' else fill
 
     min, max = bounding_box
     for i in range(3):
@@ -148,11 +159,11 @@ def pad_3D(
         if width <= 0:
             raise ValueError(f"Pad width must be positive, got '{bounding_box}'.")
 
-    # Perform padding.
-    size = np.array(data.shape)
-    pad_min = (-np.array(min)).clip(0)
-    pad_max = (max - size).clip(0)
-    padding = tuple(zip(pad_min, pad_max))
+    # Perform padding. Only scan 'data' for the fill value if padding is required.
+    padding = tuple((int(-mn) if mn < 0 else 0, int(mx - s) if mx > s else 0) for mn, mx, s in zip(min, max, data.shape))
+    if not any(p_min or p_max for p_min, p_max in padding):
+        return data.copy()
+    fill = np.min(data) if fill == 'min' else fill
     data = np.pad(data, padding, constant_values=fill)
 
     return data
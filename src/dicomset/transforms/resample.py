@@ -79,10 +79,10 @@ def resample(
     if output_spacing is not None:
         output_spacing = tuple(float(s) for s in output_spacing)
 
-    # Convert boolean data to sitk-friendly type.
+    # Convert boolean data to sitk-friendly type. Reinterpret rather than copy, as 'GetImageFromArray' copies anyway.
     boolean = data.dtype == bool
     if boolean:
-        data = data.astype('uint8') 
+        data = data.view(np.uint8)
 
     # Create 'sitk' image and set parameters.
     image = sitk.GetImageFromArray(data)
@@ -128,9 +128,9 @@ def resample(
     # Get output data.
     output = sitk.GetArrayFromImage(image)
 
-    # Convert back to boolean.
+    # Convert back to boolean. Nearest-neighbour output only contains 0/1, so can be reinterpreted.
     if boolean:
-        output = output.astype(bool)
+        output = output.view(bool)
 
     if return_transform:
         return output, resample.GetTransform()
@@ -178,10 +178,10 @@ def resample_3D(
     if output_spacing is not None:
         output_spacing = tuple(float(s) for s in output_spacing)
 
-    # Convert boolean data to sitk-friendly type.
+    # Convert boolean data to sitk-friendly type. Reinterpret rather than copy, as 'GetImageFromArray' copies anyway.
     boolean = data.dtype == bool
     if boolean:
-        data = data.astype('uint8') 
+        data = data.view(np.uint8)
 
     # Create 'sitk' image and set parameters.
     image = sitk.GetImageFromArray(data)
@@ -218,9 +218,9 @@ def resample_3D(
     # Get output data.
     output = sitk.GetArrayFromImage(image)
 
-    # Convert back to boolean.
+    # Convert back to boolean. Nearest-neighbour output only contains 0/1, so can be reinterpreted.
     if boolean:
-        output = output.astype(bool)
+        output = output.view(bool)
 
     if return_transform:
         return output, resample.GetTransform()
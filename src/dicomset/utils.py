@@ -96,9 +96,6 @@ def get_batch_centroids(label_batch, plane):
     """
     assert plane in ('axial', 'coronal', 'sagittal')
 
-    # Move data to CPU.
-    label_batch = label_batch.cpu()
-
     # Determine axes to sum over.
     if plane == 'axial':
         axes = (0, 1)
@@ -107,20 +104,14 @@ def get_batch_centroids(label_batch, plane):
     elif plane == 'sagittal':
         axes = (1, 2)
 
-    centroids = np.array([], dtype=np.int)
-
-    # Loop through batch and get centroid for each label.
-    for label_i in label_batch:
-        # Get weighting along 'plane' axis.
-        weights = label_i.sum(axes)
-
-        # Get average weighted sum.
-        indices = np.arange(len(weights))
-        avg_weighted_sum = (weights * indices).sum() /  weights.sum()
+    # Get weighting along 'plane' axis for the whole batch on the label's device, so only
+    # the (B, N) weights are copied to the CPU.
+    weights = label_batch.sum(tuple(a + 1 for a in axes)).cpu().numpy()
 
-        # Get centroid index.
-        centroid = np.round(avg_weighted_sum).long()
-        centroids = np.append(centroids, centroid)
+    # Get average weighted sum and centroid index per batch item.
+    indices = np.arange(weights.shape[1])
+    avg_weighted_sums = (weights * indices).sum(axis=1) / weights.sum(axis=1)
+    centroids = np.round(avg_weighted_sums).astype(np.int64)
 
     return centroids
 
@@ -0,0 +1,133 @@
+import numpy as np
+import os
+import pandas as pd
+import re
+import sys
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+sys.path.append(root_dir)
+from dicomset.dataset.dicom.region_map import RegionMap
+
+REGIONS = ['Brain', 'brain', 'BRAIN_1', 'Brainstem', 'BrainStem_PRV', 'Parotid_L', 'parotid_l', 'Parotid L', 'Parotid_R', 'Lens_L', 'GTV', 'Unknown']
+PATIENT_IDS = [None, '1', '2', '3']
+STUDY_IDS = [None, 'S1', 'S2']
+
+class TestRegionMap(TestCase):
+    def test_to_internal(self):
+        # Mixed prioritised/unprioritised rules, with case sensitivity and patient/study filters.
+        data = self._create_data(
+            before=['^brain$', '^brain.*', '^brainstem.*', '^parotid[_ ]l$', '^Parotid_R$', '^GTV$'],
+            after=['Brain', 'Brain', 'Brainstem', 'Parotid_L', 'Parotid_R', 'GTVp'],
+            case=[np.nan, np.nan, 0, np.nan, 1, np.nan],
+            priority=[1, np.nan, 2, np.nan, np.nan, 1],
+            excpt=['', '2', '', '', '', ''],
+            except_study=['', '', 'S2', '', '', ''],
+            only=['', '', '', '1,3', '', ''],
+            only_study=['', '', '', '', '', 'S1'])
+        self._assert_equal_baseline(data)
+
+    def test_to_internal_all_prioritised(self):
+        # All rules prioritised, so lookups stop at the first match. Ties are won by the earlier rule.
+        data = self._create_data(
+            before=['^brain.*', '^brain$', '^brainstem.*', '^parotid.*', '^parotid_l$'],
+            after=['Brain', 'Brain_exact', 'Brainstem', 'Parotid', 'Parotid_L'],
+            priority=[1, 2, 3, 1, 1],
+            excpt=['', '3', '', '', ''])
+        self._assert_equal_baseline(data)
+
+    def test_to_internal_groups(self):
+        # Rules with groups aren't combined into the prefilter regexp.
+        data = self._create_data(
+            before=['^(parotid)[_ ]l$', '^(brain)(stem)?$', r'^(lens)_(l)\b'],
+            after=['Parotid_L', 'Brain', 'Lens_L'],
+            priority=[np.nan, 1, np.nan])
+        self._assert_equal_baseline(data)
+
+    def test_load(self):
+        data = self._create_data(
+            before=['^brain$', '^parotid_l$'],
+            after=['Brain', 'Parotid_L'],
+            only=['1', ''])
+        with TemporaryDirectory() as tmp_dir:
+            filepath = os.path.join(tmp_dir, 'region-map.csv')
+            csv_data = data.copy()
+            for col in ['except', 'except-study', 'only', 'only-study']:
+                csv_data[col] = csv_data[col].apply(lambda l: ','.join(l) if len(l) > 0 else np.nan)
+            csv_data.to_csv(filepath, index=False)
+
+            region_map = RegionMap.load(filepath)
+            self.assertEqual(region_map.to_internal('BRAIN', pat_id='1'), ('Brain', -np.inf))
+            self.assertEqual(region_map.to_internal('brain', pat_id='2'), ('brain', -np.inf))
+
+            # Shared maps can't be modified through 'data'.
+            region_map.data.loc[0, 'after'] = 'Modified'
+            region_map.data.loc[0, 'only'].append('2')
+            self.assertIs(RegionMap.load(filepath), region_map)
+            self.assertEqual(region_map.to_internal('brain', pat_id='1'), ('Brain', -np.inf))
+            self.assertEqual(list(region_map.data.loc[0, 'only']), ['1'])
+
+        self.assertIsNone(RegionMap.load(filepath))
+
+    def _assert_equal_baseline(self, data):
+        region_map = RegionMap(data)
+        for region in REGIONS:
+            for pat_id in PATIENT_IDS:
+                for study_id in STUDY_IDS:
+                    with self.subTest(region=region, pat_id=pat_id, study_id=study_id):
+                        expected = self._to_internal_baseline(data, region, pat_id=pat_id, study_id=study_id)
+                        self.assertEqual(region_map.to_internal(region, pat_id=pat_id, study_id=study_id), expected)
+
+    def _create_data(self, before, after, case=None, priority=None, excpt=None, except_study=None, only=None, only_study=None):
+        def split(ids):
+            return [i.split(',') if i != '' else [] for i in ids] if ids is not None else [[]] * len(before)
+        data = {
+            'before': before,
+            'after': after,
+            'except': split(excpt),
+            'except-study': split(except_study),
+            'only': split(only),
+            'only-study': split(only_study),
+        }
+        if case is not None:
+            data['case'] = case
+        if priority is not None:
+            data['priority'] = priority
+        return pd.DataFrame(data)
+
+    def _to_internal_baseline(self, data, region, pat_id=None, study_id=None):
+        # Previous implementation, iterating dataframe rows.
+        pat_id = str(pat_id)
+        match = None
+        priority = -np.inf
+        for _, row in data.iterrows():
+            if pat_id is not None:
+                if pat_id in row['except']:
+                    continue
+                if study_id is not None and study_id in row['except-study']:
+                    continue
+                only = row['only']
+                if len(only) > 0 and pat_id not in only:
+                    continue
+                if study_id is not None:
+                    only_study = row['only-study']
+                    if len(only_study) > 0 and study_id not in only_study:
+                        continue
+            args = []
+            if 'case' in row:
+                case = row['case']
+                if not np.isnan(case) and not case:
+                    args += [re.IGNORECASE]
+            else:
+                args += [re.IGNORECASE]
+            if re.match(row['before'], region, *args):
+                if 'priority' in row and not np.isnan(row['priority']):
+                    if row['priority'] > priority:
+                        match = row['after']
+                        priority = row['priority']
+                else:
+                    match = row['after']
+        if match is None:
+            match = region
+        return match, priority
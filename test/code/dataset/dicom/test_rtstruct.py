@@ -0,0 +1,57 @@
+from contextlib import contextmanager
+import numpy as np
+import os
+import sys
+from unittest import TestCase
+from unittest.mock import patch
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+sys.path.append(root_dir)
+from dicomset.dataset.dicom.rtstruct import RTSTRUCT
+
+class TestRTSTRUCT(TestCase):
+    def test_region_volume(self):
+        # Overlapping synthetic regions, so voxels can have several bits set.
+        for n_regions, dtype in ((1, np.uint8), (8, np.uint8), (9, np.uint16), (20, np.uint32), (64, np.uint64)):
+            with self.subTest(n_regions=n_regions):
+                masks = self._create_masks(n_regions)
+                rtstruct = self._create_rtstruct()
+                with self._patch_regions(masks):
+                    region_data = rtstruct.region_data()
+                    names, volume = rtstruct.region_volume()
+
+                # Bit 'i' of the volume should equal the mask of region 'i', as returned by 'region_data'.
+                self.assertEqual(names, list(region_data.keys()))
+                self.assertEqual(volume.dtype, dtype)
+                for i, name in enumerate(names):
+                    np.testing.assert_array_equal(((volume >> dtype(i)) & dtype(1)).astype(bool), region_data[name])
+
+    def test_region_volume_too_many_regions(self):
+        rtstruct = self._create_rtstruct()
+        with self._patch_regions(self._create_masks(65)):
+            with self.assertRaises(ValueError):
+                rtstruct.region_volume()
+
+    def test_region_volume_no_regions(self):
+        rtstruct = self._create_rtstruct()
+        with self._patch_regions({}):
+            names, volume = rtstruct.region_volume()
+        self.assertEqual(names, [])
+        self.assertIsNone(volume)
+
+    def _create_masks(self, n_regions):
+        rng = np.random.default_rng(42)
+        names = sorted(f'Region_{i:02d}' for i in range(n_regions))
+        return dict((n, rng.random((6, 5, 4)) > 0.7) for n in names)
+
+    def _create_rtstruct(self):
+        # Region listing/loading is patched, so no DICOM files are needed.
+        rtstruct = RTSTRUCT.__new__(RTSTRUCT)
+        rtstruct._RTSTRUCT__region_map = None
+        return rtstruct
+
+    @contextmanager
+    def _patch_regions(self, masks):
+        with patch.object(RTSTRUCT, '_RTSTRUCT__list_requested_regions', lambda self, only, region, use_mapping: list(masks.keys())), \
+            patch.object(RTSTRUCT, '_RTSTRUCT__load_region_data', lambda self, pat_regions, use_mapping: ((r, masks[r]) for r in pat_regions)):
+            yield
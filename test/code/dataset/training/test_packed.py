@@ -0,0 +1,61 @@
+import numpy as np
+import os
+import sys
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+sys.path.append(root_dir)
+
+from dicomset.dataset.training.packed import append_packed, load_packed_offsets, read_packed, write_packed
+
+class TestPacked(TestCase):
+    def test_round_trip(self):
+        data = self._create_data()
+        with TemporaryDirectory() as tmp_dir:
+            dirpath = os.path.join(tmp_dir, 'inputs')
+            with write_packed({ None: dirpath }) as packed:
+                for sample_id, d in data.items():
+                    append_packed(packed[None], sample_id, d)
+
+            offsets = load_packed_offsets(dirpath)
+            self.assertEqual(sorted(offsets.keys()), sorted(data.keys()))
+            for sample_id, d in data.items():
+                offset, shape, dtype = offsets[sample_id]
+                self.assertEqual(shape, d.shape)
+                self.assertEqual(dtype, d.dtype)
+                for mmap in (True, False):
+                    loaded = read_packed(dirpath, offset, shape, dtype, mmap=mmap)
+                    np.testing.assert_array_equal(loaded, d)
+
+                # Loaded arrays are writeable, without modifying the packed file.
+                loaded = read_packed(dirpath, offset, shape, dtype)
+                loaded[...] = 0
+                np.testing.assert_array_equal(read_packed(dirpath, offset, shape, dtype), d)
+
+    def test_cleanup_on_failure(self):
+        data = self._create_data()
+        with TemporaryDirectory() as tmp_dir:
+            dirpaths = {
+                None: os.path.join(tmp_dir, 'inputs'),
+                'Brain': os.path.join(tmp_dir, 'labels', 'Brain')
+            }
+            with self.assertRaises(RuntimeError):
+                with write_packed(dirpaths) as packed:
+                    append_packed(packed[None], 0, data[0])
+                    raise RuntimeError('Conversion failed.')
+
+            # No partial data is left to be loaded.
+            for dirpath in dirpaths.values():
+                self.assertFalse(os.path.exists(os.path.join(dirpath, 'packed.bin')))
+                self.assertIsNone(load_packed_offsets(dirpath))
+
+    def _create_data(self):
+        # Mixed dtypes and dimensions, e.g. float inputs, multi-channel inputs and boolean labels.
+        rng = np.random.default_rng(42)
+        return {
+            0: rng.random((4, 5, 6), dtype=np.float32),
+            1: rng.random((2, 4, 5, 6)).astype(np.float16),
+            2: rng.random((3, 3, 3)) > 0.5,
+            3: rng.integers(0, 100, size=(5, 4, 3), dtype=np.int16)
+        }
@@ -0,0 +1,52 @@
+import numpy as np
+import os
+import sys
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+sys.path.append(root_dir)
+
+from dicomset.dataset.training.packed import append_packed, write_packed
+from dicomset.dataset.training.training_dataset import TrainingDataset
+
+class TestTrainingDataset(TestCase):
+    def test_class_frequencies(self):
+        # Packed and per-sample counts should both match a naive count over all labels.
+        labels = self._create_labels()
+        num_fore = sum(int(l.sum()) for l in labels.values())
+        num_back = sum(l.size for l in labels.values()) - num_fore
+        with TemporaryDirectory() as tmp_dir:
+            dataset = self._create_dataset(tmp_dir)
+            with write_packed({ 'Brain': os.path.join(tmp_dir, 'data', 'labels', 'Brain') }) as packed:
+                for sample_id, label in labels.items():
+                    append_packed(packed['Brain'], sample_id, label)
+
+            with self.subTest(path='packed'):
+                self.assertEqual(dataset.class_frequencies('Brain'), (num_back, num_fore))
+
+            with self.subTest(path='per-sample'):
+                sample = lambda self, sample_id: SimpleNamespace(label=lambda region: { region: labels[sample_id] })
+                with patch.object(TrainingDataset, 'packed_offsets', lambda self, dirpath: None), \
+                    patch.object(TrainingDataset, 'list_samples', lambda self, region=None: list(labels.keys())), \
+                    patch.object(TrainingDataset, 'sample', sample):
+                    self.assertEqual(dataset.class_frequencies('Brain'), (num_back, num_fore))
+
+    def _create_dataset(self, path):
+        # Bypass '__init__', which requires a dataset in the configured datasets folder.
+        dataset = TrainingDataset.__new__(TrainingDataset)
+        dataset._TrainingDataset__path = path
+        dataset._TrainingDataset__packed_offsets = {}
+        return dataset
+
+    def _create_labels(self):
+        # Labels of different sizes, including empty and full labels.
+        rng = np.random.default_rng(42)
+        return {
+            0: rng.random((4, 5, 6)) > 0.5,
+            1: rng.random((7, 3, 2)) > 0.9,
+            2: np.zeros((3, 3, 3), dtype=bool),
+            3: np.ones((2, 4, 3), dtype=bool)
+        }
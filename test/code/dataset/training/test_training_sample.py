@@ -0,0 +1,42 @@
+import numpy as np
+import os
+import sys
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from unittest import TestCase
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+sys.path.append(root_dir)
+
+from dicomset.dataset.training.training_sample import TrainingSample
+
+class TestTrainingSample(TestCase):
+    def test_label_bit_packing(self):
+        # Bit-packed labels should load identically to labels stored with one byte per voxel.
+        # Shapes aren't multiples of 8, so the final packed byte is padded.
+        rng = np.random.default_rng(42)
+        for shape in ((4, 5, 6), (3, 3, 3), (1, 1, 1), (7, 2, 9)):
+            with self.subTest(shape=shape):
+                label = rng.random(shape) > 0.5
+                with TemporaryDirectory() as tmp_dir:
+                    self._save_label(tmp_dir, 'Packed', data=np.packbits(label), shape=label.shape)
+                    self._save_label(tmp_dir, 'Unpacked', data=label)
+                    sample = self._create_sample(tmp_dir)
+
+                    labels = sample.label(region=['Packed', 'Unpacked'])
+                    self.assertEqual(labels['Packed'].dtype, np.bool_)
+                    self.assertEqual(labels['Packed'].shape, shape)
+                    np.testing.assert_array_equal(labels['Packed'], labels['Unpacked'])
+                    np.testing.assert_array_equal(labels['Packed'], label)
+
+    def _create_sample(self, path):
+        # Bypass '__init__', which requires a dataset in the configured datasets folder.
+        sample = TrainingSample.__new__(TrainingSample)
+        sample._TrainingSample__id = 0
+        sample._TrainingSample__dataset = SimpleNamespace(path=path, packed_offsets=lambda dirpath: None)
+        return sample
+
+    def _save_label(self, path, region, **kwargs):
+        dirpath = os.path.join(path, 'data', 'labels', region)
+        os.makedirs(dirpath)
+        np.savez_compressed(os.path.join(dirpath, '0.npz'), **kwargs)
@@ -0,0 +1,62 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+import os
+import SimpleITK as sitk
+import sys
+from unittest import TestCase
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.append(root_dir)
+from dicomset.metrics import all_distances, surface_distances
+
+class TestSurfaceDistances(TestCase):
+    def test_surface_distances_kd_tree(self):
+        # Cubes offset by 2 voxels along the anisotropic axis.
+        a, b, spacing = self._create_cubes()
+
+        a_to_b, b_to_a = surface_distances(a, b, spacing)
+        # 26 surface voxels per cube, 9 on each face layer perpendicular to the offset and 8 in the middle layer.
+        expected = np.array(9 * [0] + 8 * [2] + 9 * [4], dtype=np.float64)
+        assert_almost_equal(np.sort(a_to_b), expected, decimal=6)
+        assert_almost_equal(np.sort(b_to_a), expected, decimal=6)
+
+        metrics = all_distances(a, b, spacing)
+        assert_almost_equal(metrics['hd'], 4, decimal=6)
+        assert_almost_equal(metrics['msd'], 2, decimal=6)
+
+    def test_surface_distances_maurer(self):
+        # KD-tree distances should match an exact distance map to the other surface.
+        a, b, spacing = self._create_cubes()
+
+        a_to_b, b_to_a = surface_distances(a, b, spacing)
+        assert_almost_equal(a_to_b, self._maurer_surface_distances(a, b, spacing), decimal=5)
+        assert_almost_equal(b_to_a, self._maurer_surface_distances(b, a, spacing), decimal=5)
+
+    def _create_cubes(self):
+        a = np.zeros((10, 10, 10), dtype=bool)
+        a[2:5, 2:5, 2:5] = True
+        b = np.zeros((10, 10, 10), dtype=bool)
+        b[4:7, 2:5, 2:5] = True
+        spacing = (2, 1, 1)
+        return a, b, spacing
+
+    def _maurer_surface_distances(
+        self,
+        a: np.ndarray,
+        b: np.ndarray,
+        spacing: tuple) -> np.ndarray:
+        # Sample the distance map of b's surface at a's surface voxels, in 'argwhere' order.
+        a_surface = self._surface(a, spacing)
+        b_surface = self._surface(b, spacing)
+        b_dist_map = sitk.SignedMaurerDistanceMap(b_surface, useImageSpacing=True, squaredDistance=False, insideIsPositive=False)
+        b_dist_map = np.abs(sitk.GetArrayFromImage(b_dist_map))
+        a_points = np.argwhere(sitk.GetArrayFromImage(a_surface) == 1)
+        return b_dist_map[tuple(a_points.T)]
+
+    def _surface(
+        self,
+        a: np.ndarray,
+        spacing: tuple) -> sitk.Image:
+        a_itk = sitk.GetImageFromArray(a.view(np.uint8))
+        a_itk.SetSpacing(tuple(reversed(spacing)))
+        return sitk.LabelContour(a_itk, False)
@@ -0,0 +1,56 @@
+import numpy as np
+import os
+import sys
+import torch
+from unittest import TestCase
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.append(root_dir)
+from dicomset.geometry import get_extent_centre
+from dicomset.metrics import dice
+from mymi.models.systems import AdaptiveSegmenter
+
+class TestAdaptiveSegmenter(TestCase):
+    def test_batch_dice(self):
+        # On-device dice should match the previous per-item 'dice' on CPU one-hot predictions.
+        y_hat, y = self._create_batch()
+        model = AdaptiveSegmenter.__new__(AdaptiveSegmenter)
+        dice_scores = model._AdaptiveSegmenter__batch_dice(y_hat, y)
+
+        y_np = y.numpy().astype(bool)
+        y_hat_np = y_hat.numpy()[:, np.newaxis] == np.arange(y.shape[1]).reshape(1, -1, 1, 1, 1)
+        self.assertEqual(dice_scores.shape, y.shape[:2])
+        for b in range(y.shape[0]):
+            for c in range(y.shape[1]):
+                with self.subTest(b=b, c=c):
+                    self.assertAlmostEqual(dice_scores[b, c], dice(y_hat_np[b, c], y_np[b, c]), places=6)
+
+    def test_batch_extent_centres(self):
+        # On-device extent centres should match the previous per-volume 'get_extent_centre'.
+        _, y = self._create_batch()
+        model = AdaptiveSegmenter.__new__(AdaptiveSegmenter)
+        centres, present = model._AdaptiveSegmenter__batch_extent_centres(y)
+
+        y_np = y.numpy()
+        self.assertEqual(centres.shape, (*y.shape[:2], 3))
+        self.assertEqual(present.shape, y.shape[:2])
+        for b in range(y.shape[0]):
+            for c in range(y.shape[1]):
+                with self.subTest(b=b, c=c):
+                    centre = get_extent_centre(y_np[b, c])
+                    if centre is None:
+                        self.assertFalse(present[b, c])
+                    else:
+                        self.assertTrue(present[b, c])
+                        self.assertEqual(tuple(int(ci) for ci in centres[b, c]), tuple(int(ci) for ci in centre))
+
+    def _create_batch(self):
+        # Argmax predictions (B, X, Y, Z) and one-hot labels (B, C, X, Y, Z). Channel 3 is never
+        # predicted and is empty for the first item, covering empty and one-sided cases.
+        rng = np.random.default_rng(42)
+        n_channels = 4
+        y_hat = rng.integers(0, n_channels - 1, size=(2, 6, 5, 4))
+        y_labels = rng.integers(0, n_channels - 1, size=(2, 6, 5, 4))
+        y_labels[1, :2, :2, :2] = n_channels - 1
+        y = y_labels[:, np.newaxis] == np.arange(n_channels).reshape(1, -1, 1, 1, 1)
+        return torch.from_numpy(y_hat), torch.from_numpy(y)
@@ -0,0 +1,32 @@
+import os
+import sys
+from types import SimpleNamespace
+import torch
+from unittest import TestCase
+from unittest.mock import PropertyMock, patch
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.append(root_dir)
+from dicomset.transforms import BatchAffine
+from mymi.models.systems import RegSegModel
+
+class TestRegSegModel(TestCase):
+    def test_gpu_transform_shared(self):
+        # Fixed and moving data must get the same sampled affine.
+        torch.manual_seed(42)
+        model = RegSegModel(transform_gpu=BatchAffine(rotation=15, scale=0.2, spacing=(1, 1, 3), translation=2))
+        input = torch.rand(2, 1, 8, 10, 6)
+        label = torch.zeros(2, 2, 8, 10, 6, dtype=torch.bool)
+        label[:, 1, 2:6, 3:7, 1:5] = True
+        mask = torch.ones(2, 2, dtype=torch.bool)
+        weights = torch.ones(2, 2)
+        batch = (['a', 'b'], input, input.clone(), label, label.clone(), mask, mask.clone(), weights)
+
+        with patch.object(RegSegModel, 'trainer', new_callable=PropertyMock, return_value=SimpleNamespace(training=True)):
+            desc, fixed_input, moving_input, fixed_label, moving_label, _, _, _ = model.on_after_batch_transfer(batch, 0)
+
+        self.assertEqual(desc, ['a', 'b'])
+        self.assertEqual(fixed_input.shape, input.shape)
+        self.assertEqual(fixed_label.shape, label.shape)
+        torch.testing.assert_close(fixed_input, moving_input)
+        torch.testing.assert_close(fixed_label, moving_label)
@@ -0,0 +1,78 @@
+import numpy as np
+import os
+import sys
+from unittest import TestCase
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.append(root_dir)
+from dicomset.postprocessing import largest_cc_3D, largest_cc_4D, largest_cc_5D
+
+class TestLargestCC(TestCase):
+    def test_zero_components(self):
+        a = np.zeros((6, 6, 6), dtype=bool)
+        output = largest_cc_3D(a)
+        self.assertEqual(output.dtype, np.bool_)
+        np.testing.assert_array_equal(output, a)
+
+    def test_one_component(self):
+        a = self._create_components()[0]
+        output = largest_cc_3D(a)
+        np.testing.assert_array_equal(output, a)
+
+        # A single component is returned as a copy.
+        output[...] = False
+        self.assertTrue(a.any())
+
+    def test_several_components(self):
+        a, largest = self._create_components(several=True)
+        output = largest_cc_3D(a)
+        self.assertEqual(output.dtype, np.bool_)
+        np.testing.assert_array_equal(output, largest)
+
+    def test_full_connectivity(self):
+        # Voxels touching only at corners are the same component.
+        a = np.zeros((6, 6, 6), dtype=bool)
+        a[1, 1, 1] = True
+        a[2, 2, 2] = True
+        a[4:6, 4:6, 5] = True
+        expected = np.zeros_like(a)
+        expected[4:6, 4:6, 5] = True
+        np.testing.assert_array_equal(largest_cc_3D(a), expected)
+
+        a[3, 3, 3] = True
+        a[3, 3, 4] = True
+        expected = a.copy()
+        np.testing.assert_array_equal(largest_cc_3D(a), expected)
+
+    def test_out(self):
+        # Outputs are written into 'out', for zero, one and several components, overwriting stale values.
+        labels = np.empty((8, 8, 8), dtype=np.int32)
+        one, _ = self._create_components()
+        several, largest = self._create_components(several=True)
+        for a, expected in ((np.zeros_like(one), np.zeros_like(one)), (one, one), (several, largest)):
+            out = np.ones((8, 8, 8), dtype=bool)
+            output = largest_cc_3D(a, labels=labels, out=out)
+            self.assertIs(output, out)
+            np.testing.assert_array_equal(out, expected)
+
+    def test_batch(self):
+        one, _ = self._create_components()
+        several, largest = self._create_components(several=True)
+        a = np.stack((several, np.zeros_like(one), one))
+        expected = np.stack((largest, np.zeros_like(one), one))
+        np.testing.assert_array_equal(largest_cc_4D(a), expected)
+
+        out = np.ones_like(a)
+        self.assertIs(largest_cc_4D(a, out=out), out)
+        np.testing.assert_array_equal(out, expected)
+
+        np.testing.assert_array_equal(largest_cc_5D(np.stack((a, a[::-1]))), np.stack((expected, expected[::-1])))
+
+    def _create_components(self, several: bool = False):
+        a = np.zeros((8, 8, 8), dtype=bool)
+        a[1:4, 1:4, 1:4] = True
+        largest = a.copy()
+        if several:
+            a[6:8, 6:8, 6:8] = True
+            a[0, 6, 0] = True
+        return a, largest
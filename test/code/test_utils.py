@@ -0,0 +1,41 @@
+import numpy as np
+import os
+import sys
+import torch
+from unittest import TestCase
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(root_dir)
+from dicomset.utils import get_batch_centroids
+
+class TestUtils(TestCase):
+    def test_get_batch_centroids(self):
+        # Vectorised centroids should match the previous per-item loop.
+        rng = np.random.default_rng(42)
+        label_batch = torch.from_numpy(rng.random((3, 8, 6, 5)) > 0.8)
+        label_batch[1] = False
+        label_batch[1, 2:5, 1:3, 3] = True
+        for plane in ('axial', 'coronal', 'sagittal'):
+            with self.subTest(plane=plane):
+                centroids = get_batch_centroids(label_batch, plane)
+                self.assertEqual(centroids.dtype, np.int64)
+                np.testing.assert_array_equal(centroids, self._get_batch_centroids_baseline(label_batch, plane))
+
+    def _get_batch_centroids_baseline(self, label_batch, plane):
+        # Previous implementation, with the removed 'np.int' alias replaced.
+        label_batch = label_batch.cpu().numpy()
+        if plane == 'axial':
+            axes = (0, 1)
+        elif plane == 'coronal':
+            axes = (0, 2)
+        elif plane == 'sagittal':
+            axes = (1, 2)
+
+        centroids = np.array([], dtype=np.int64)
+        for label_i in label_batch:
+            weights = label_i.sum(axes)
+            indices = np.arange(len(weights))
+            avg_weighted_sum = (weights * indices).sum() / weights.sum()
+            centroid = np.round(avg_weighted_sum).astype(np.int64)
+            centroids = np.append(centroids, centroid)
+        return centroids
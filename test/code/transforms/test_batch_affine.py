@@ -0,0 +1,43 @@
+import os
+import sys
+import torch
+from unittest import TestCase
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.append(root_dir)
+from dicomset.transforms import BatchAffine
+
+class TestBatchAffine(TestCase):
+    def test_identity(self):
+        # Zero rotation/scale/translation should return the inputs unchanged.
+        input, label = self._create_batch()
+        transform = BatchAffine(spacing=(1, 1, 3))
+        input_t, label_t = transform(input, label)
+        torch.testing.assert_close(input_t, input, atol=1e-5, rtol=0)
+        torch.testing.assert_close(label_t, label)
+
+    def test_label_binary(self):
+        # Nearest-neighbour resampling shouldn't create new label values.
+        torch.manual_seed(42)
+        input, label = self._create_batch()
+        transform = BatchAffine(rotation=15, scale=0.2, spacing=(1, 1, 3), translation=2)
+        _, label_t = transform(input, label)
+        self.assertEqual(label_t.dtype, label.dtype)
+        self.assertTrue(torch.isin(label_t.unique(), torch.tensor([0, 1], dtype=label.dtype)).all())
+
+    def test_shared_channels(self):
+        # All channels of a batch item share the sampled affine.
+        torch.manual_seed(42)
+        input, label = self._create_batch()
+        input = torch.cat((input, input), dim=1)
+        label = torch.cat((label, label), dim=1)
+        transform = BatchAffine(rotation=15, scale=0.2, translation=2)
+        input_t, label_t = transform(input, label)
+        torch.testing.assert_close(input_t[:, 0], input_t[:, 1])
+        torch.testing.assert_close(label_t[:, 0], label_t[:, 1])
+
+    def _create_batch(self):
+        input = torch.rand(2, 1, 8, 10, 6)
+        label = torch.zeros(2, 1, 8, 10, 6, dtype=torch.bool)
+        label[:, :, 2:6, 3:7, 1:5] = True
+        return input, label
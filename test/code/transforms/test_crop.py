@@ -0,0 +1,65 @@
+import numpy as np
+import os
+import sys
+from unittest import TestCase
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.append(root_dir)
+from dicomset.transforms import crop_or_pad_3D
+
+# Bounding boxes for (10, 8, 6) data.
+BOXES = {
+    'crop-only': ((2, 1, 0), (7, 8, 4)),
+    'crop-full': ((0, 0, 0), (10, 8, 6)),
+    'pad-only': ((-3, -2, -1), (12, 9, 9)),
+    'mixed': ((-3, 2, 1), (5, 11, 5)),
+    'mixed-edges': ((4, -2, -5), (14, 6, 2)),
+    'disjoint-before': ((-8, -5, -4), (-2, -1, 0)),
+    'disjoint-after': ((12, 0, 0), (15, 8, 6)),
+    'disjoint-mixed': ((-4, 9, 2), (3, 12, 5)),
+}
+
+class TestCropOrPad3D(TestCase):
+    def test_crop_or_pad_3D(self):
+        # Compare against padding the whole volume and then cropping.
+        rng = np.random.default_rng(42)
+        data = rng.random((10, 8, 6)).astype(np.float32) + 1
+        for name, box in BOXES.items():
+            for fill in ('min', 0, -1.5):
+                with self.subTest(box=name, fill=fill):
+                    output = crop_or_pad_3D(data, box, fill=fill)
+                    expected = self._crop_or_pad_3D_baseline(data, box, fill=fill)
+                    self.assertEqual(output.shape, expected.shape)
+                    self.assertEqual(output.dtype, expected.dtype)
+                    np.testing.assert_array_equal(output, expected)
+
+    def test_crop_or_pad_3D_bool(self):
+        data = np.zeros((10, 8, 6), dtype=bool)
+        data[3:7, 2:5, 1:4] = True
+        for name, box in BOXES.items():
+            with self.subTest(box=name):
+                output = crop_or_pad_3D(data, box, fill=False)
+                expected = self._crop_or_pad_3D_baseline(data, box, fill=False)
+                np.testing.assert_array_equal(output, expected)
+
+    def test_crop_or_pad_3D_copy(self):
+        # Crops shouldn't share memory with the input.
+        data = np.ones((10, 8, 6), dtype=np.float32)
+        output = crop_or_pad_3D(data, BOXES['crop-only'])
+        output[...] = 0
+        np.testing.assert_array_equal(data, 1)
+
+    def _crop_or_pad_3D_baseline(self, data, bounding_box, fill='min'):
+        # Previous implementation.
+        if fill == 'min':
+            fill = np.min(data)
+        min, max = bounding_box
+        size = np.array(data.shape)
+        pad_min = (-np.array(min)).clip(0)
+        pad_max = (max - size).clip(0)
+        padding = tuple(zip(pad_min, pad_max))
+        data = np.pad(data, padding, constant_values=fill)
+        crop_min = np.array(min).clip(0)
+        crop_max = (size - max).clip(0)
+        slices = tuple(slice(min, s - max) for min, max, s in zip(crop_min, crop_max, data.shape))
+        return data[slices]